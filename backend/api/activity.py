@@ -0,0 +1,116 @@
+"""
+Daily activity rollup.
+
+DailyActivity holds one row per (user, date) with the minutes learned and
+concepts completed that day. It is bumped when a concept is completed so
+the progress chart and heatmap read a handful of rows instead of
+aggregating ConceptProgress on every request.
+
+record_progress() keeps the lifetime totals and the streak on UserProgress
+with F() updates, so concurrent completions from the same learner (two
+tabs, a retried request) never lose an increment.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import ConceptProgress, DailyActivity, UserProgress
+
+
+def record_completion(user, minutes, day=None):
+    """Add one completed concept (and its `minutes`) to the user's row for `day`."""
+    day = day or timezone.now().date()
+    changes = {
+        'minutes_learned': F('minutes_learned') + minutes,
+        'concepts_completed': F('concepts_completed') + 1,
+    }
+    if DailyActivity.objects.filter(user=user, date=day).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailyActivity.objects.create(
+                user=user, date=day, minutes_learned=minutes, concepts_completed=1
+            )
+    except IntegrityError:
+        # Another request created today's row first
+        DailyActivity.objects.filter(user=user, date=day).update(**changes)
+
+
+def record_progress(user, minutes, day=None):
+    """
+    Add a completed concept to the user's UserProgress totals and extend
+    the streak. Returns the new streak if this call was the day's first
+    activity, else None; only one request per day can get a streak back,
+    so milestone rewards fire once.
+    """
+    day = day or timezone.now().date()
+    UserProgress.objects.get_or_create(user=user)
+    rows = UserProgress.objects.filter(user=user)
+    rows.update(
+        total_concepts_completed=F('total_concepts_completed') + 1,
+        total_minutes_learned=F('total_minutes_learned') + minutes,
+    )
+
+    streak = Case(
+        When(last_activity_date=day - timedelta(days=1), then=F('current_streak') + 1),
+        default=Value(1),
+    )
+    # Only a newer day moves the streak: a second completion the same day,
+    # or a late one for an earlier day, leaves it and last_activity_date alone
+    advanced = rows.exclude(last_activity_date__gte=day).update(
+        current_streak=streak,
+        longest_streak=Greatest(F('longest_streak'), streak),
+        last_activity_date=day,
+    )
+    return rows.values_list('current_streak', flat=True).first() if advanced else None
+
+
+def get_range(user, start, end):
+    """{date: DailyActivity} for start..end inclusive, in one query."""
+    return {
+        row.date: row
+        for row in DailyActivity.objects.filter(user=user, date__gte=start, date__lte=end)
+    }
+
+
+def rebuild(users=None):
+    """
+    Recompute rollup rows from ConceptProgress for `users` (a User queryset
+    or list), or for everyone when omitted. Returns the number of rows written.
+    """
+    progress = ConceptProgress.objects.filter(completed=True, completed_at__isnull=False)
+    rollups = DailyActivity.objects.all()
+    if users is not None:
+        progress = progress.filter(user__in=users)
+        rollups = rollups.filter(user__in=users)
+
+    rows = (
+        progress.annotate(day=TruncDate('completed_at'))
+        .values('user_id', 'day')
+        .annotate(minutes=Sum('concept__duration'), count=Count('id'))
+    )
+    entries = [
+        DailyActivity(
+            user_id=row['user_id'],
+            date=row['day'],
+            minutes_learned=row['minutes'] or 0,
+            concepts_completed=row['count'],
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        rollups.delete()
+        DailyActivity.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def last_days(user, days=7):
+    """Oldest-first list of (date, DailyActivity or None) for the last `days` days."""
+    today = timezone.now().date()
+    start = today - timedelta(days=days - 1)
+    rows = get_range(user, start, today)
+    return [(start + timedelta(days=i), rows.get(start + timedelta(days=i))) for i in range(days)]
@@ -3,7 +3,9 @@ from .models import (
     LearnerProfile, Course, Chapter, Concept, Roadmap, ConceptProgress,
     Assessment, AssessmentResult, DailyTask, Notification, UserProgress, Lab,
     StudySession, NotificationLog, MentorProfile, MentorSlot, Booking,
-    AIInterviewSession, InterviewTranscriptEntry, AIPerformanceReport
+    AIInterviewSession, InterviewTranscriptEntry, AIPerformanceReport,
+    LeaderboardEntry, DailyActivity, BlockchainJob, YouTubeSearchCache,
+    GenerationLease, PrefetchJob, LLMCacheEntry, LearningEvent, ProjectionCheckpoint
 )
 
 @admin.register(LearnerProfile)
@@ -16,17 +18,26 @@ class ChapterInline(admin.StackedInline):
     model = Chapter
     extra = 1
 
+@admin.action(description='Duplicate selected courses (with chapters, concepts and quizzes)')
+def duplicate_courses(modeladmin, request, queryset):
+    from .course_import import export_course, import_course
+    for course in queryset:
+        import_course(export_course(course), title=f"{course.title} (copy)")
+
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ('title', 'difficulty', 'estimated_hours', 'created_at')
     list_editable = ('difficulty', 'estimated_hours')
     search_fields = ('title',)
     list_filter = ('difficulty',)
+    readonly_fields = ('chapter_sizes',)
     inlines = [ChapterInline]
+    actions = [duplicate_courses]
 
 class ConceptInline(admin.StackedInline):
     model = Concept
     extra = 1
+    readonly_fields = ('has_notes',)
 
 @admin.register(Chapter)
 class ChapterAdmin(admin.ModelAdmin):
@@ -37,10 +48,11 @@ class ChapterAdmin(admin.ModelAdmin):
 
 @admin.register(Concept)
 class ConceptAdmin(admin.ModelAdmin):
-    list_display = ('title', 'chapter', 'content_type', 'duration', 'order')
+    list_display = ('title', 'chapter', 'content_type', 'duration', 'order', 'has_notes')
     list_editable = ('duration', 'order', 'content_type')
-    list_filter = ('content_type',)
+    list_filter = ('content_type', 'has_notes')
     search_fields = ('title', 'chapter__title')
+    readonly_fields = ('has_notes',)
 
 @admin.register(Roadmap)
 class RoadmapAdmin(admin.ModelAdmin):
@@ -65,45 +77,13 @@ class AssessmentResultAdmin(admin.ModelAdmin):
     list_display = ('user', 'assessment', 'score', 'completed_at')
     list_editable = ('score',)
 
-from django.utils import timezone
-
-@admin.action(description='Backfill activity history to match streak')
-def backfill_streak_history(modeladmin, request, queryset):
-    for user_progress in queryset:
-        user = user_progress.user
-        streak = user_progress.current_streak
-        
-        # Get all concepts (potential tasks to mark complete)
-        all_concepts = list(Concept.objects.all())
-        if not all_concepts:
-            continue
-            
-        # Iterate backwards to fill history
-        for i in range(streak):
-            target_date = timezone.now().date() - timezone.timedelta(days=i)
-            target_time = timezone.now() - timezone.timedelta(days=i)
-            
-            # Check if any progress exists for this date
-            exists = ConceptProgress.objects.filter(
-                user=user, 
-                completed_at__date=target_date
-            ).exists()
-            
-            if not exists:
-                # Find a concept to mark complete. 
-                # Use modulo to cycle through concepts if streak > concept_count
-                concept = all_concepts[i % len(all_concepts)]
-                
-                # Create or Update progress for this concept to be on the target date
-                # Note: This might move a concept's completion date if it was already completed
-                ConceptProgress.objects.update_or_create(
-                    user=user,
-                    concept=concept,
-                    defaults={
-                        'completed': True,
-                        'completed_at': target_time
-                    }
-                )
+
+@admin.action(description='Rebuild stats and activity from the event log')
+def replay_learning_events(modeladmin, request, queryset):
+    from .events import replay
+    user_ids = list(queryset.values_list('user_id', flat=True))
+    for name in ('user_progress', 'daily_activity', 'leaderboard'):
+        replay(name, user_ids=user_ids)
 
 @admin.register(DailyTask)
 class DailyTaskAdmin(admin.ModelAdmin):
@@ -121,7 +101,84 @@ class NotificationAdmin(admin.ModelAdmin):
 class UserProgressAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_minutes_learned', 'current_streak')
     list_editable = ('total_minutes_learned', 'current_streak')
-    actions = [backfill_streak_history]
+    actions = [replay_learning_events]
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ('username', 'points', 'concepts_completed', 'roadmaps_count', 'updated_at')
+    search_fields = ('username',)
+    readonly_fields = ('updated_at',)
+
+@admin.register(DailyActivity)
+class DailyActivityAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'concepts_completed', 'minutes_learned')
+    list_filter = ('date',)
+    search_fields = ('user__username',)
+
+class StuckJobFilter(admin.SimpleListFilter):
+    title = 'needs attention'
+    parameter_name = 'stuck'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Stuck / retrying / failed'),)
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            from .blockchain_jobs import stuck_jobs
+            return queryset.filter(id__in=stuck_jobs().values('id'))
+        return queryset
+
+@admin.action(description='Retry selected failed or abandoned jobs now')
+def retry_blockchain_jobs(modeladmin, request, queryset):
+    from .blockchain_jobs import retry
+    modeladmin.message_user(request, f"Re-queued {retry(queryset)} job(s).")
+
+@admin.register(BlockchainJob)
+class BlockchainJobAdmin(admin.ModelAdmin):
+    list_display = ('idempotency_key', 'kind', 'user', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = (StuckJobFilter, 'status', 'kind')
+    search_fields = ('idempotency_key', 'user__username', 'wallet')
+    readonly_fields = ('created_at', 'updated_at', 'locked_at', 'result', 'last_error')
+    actions = [retry_blockchain_jobs]
+
+@admin.register(YouTubeSearchCache)
+class YouTubeSearchCacheAdmin(admin.ModelAdmin):
+    list_display = ('query', 'video_url', 'hits', 'fetched_at', 'last_used_at')
+    search_fields = ('query',)
+
+@admin.register(GenerationLease)
+class GenerationLeaseAdmin(admin.ModelAdmin):
+    list_display = ('key', 'owner', 'expires_at')
+    search_fields = ('key',)
+
+@admin.register(LLMCacheEntry)
+class LLMCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('call_site', 'model_name', 'key', 'hits', 'latency_ms', 'created_at', 'last_used_at')
+    list_filter = ('call_site', 'model_name')
+    search_fields = ('key', 'response')
+
+@admin.register(PrefetchJob)
+class PrefetchJobAdmin(admin.ModelAdmin):
+    list_display = ('concept', 'kind', 'status', 'outcome', 'started_at', 'created_at')
+    list_filter = ('status', 'kind', 'outcome')
+    search_fields = ('concept__title', 'last_error')
+
+@admin.register(LearningEvent)
+class LearningEventAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'object_id', 'occurred_at')
+    list_filter = ('kind',)
+    search_fields = ('user__username',)
+
+    # The log is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ProjectionCheckpoint)
+class ProjectionCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_user_id', 'updated_at')
 
 @admin.register(Lab)
 class LabAdmin(admin.ModelAdmin):
@@ -135,7 +192,8 @@ class StudySessionAdmin(admin.ModelAdmin):
 
 @admin.register(NotificationLog)
 class NotificationLogAdmin(admin.ModelAdmin):
-    list_display = ('user', 'notification_type', 'event_name', 'status', 'created_at')
+    list_display = ('user', 'notification_type', 'event_name', 'status', 'attempts', 'created_at', 'sent_at')
+    exclude = ('attachment',)
     list_filter = ('notification_type', 'status')
 
 @admin.register(MentorProfile)
@@ -0,0 +1,336 @@
+"""
+Shared Algorand client helpers.
+
+Kept free of Django imports so the standalone scripts under scripts/ can
+use it too (they put backend/ on sys.path).
+
+get_algod_client() / get_indexer_client(): one client per process for the
+configured network. The stock SDK clients open a new HTTPS connection
+(urllib) for every call; ours send everything through a pooled
+keep-alive requests.Session and time each call (see client_stats()).
+The network comes from ALGORAND_NETWORK (testnet, mainnet or localnet);
+ALGORAND_ALGOD_SERVER / ALGORAND_ALGOD_TOKEN and ALGORAND_INDEXER_SERVER /
+ALGORAND_INDEXER_TOKEN override the endpoints (e.g. a sandbox in tests).
+
+SuggestedParamsCache: every mint and transfer needs suggested params,
+which costs an algod round trip. Params stay valid for ~1000 rounds, so
+one fetch is shared by all threads for a short TTL; once the entry is
+half way through its TTL a hit triggers a single background refresh,
+so callers almost never wait on algod.
+"""
+import copy
+import json
+import logging
+import os
+import re
+import threading
+import time
+from urllib import parse
+
+import requests
+from requests.adapters import HTTPAdapter
+from algosdk import constants, error
+from algosdk.v2client import algod, indexer
+
+logger = logging.getLogger(__name__)
+
+PARAMS_TTL_SECONDS = float(os.environ.get('ALGORAND_PARAMS_TTL', '20'))
+POOL_SIZE = int(os.environ.get('ALGORAND_POOL_SIZE', '10'))
+
+LOCALNET_TOKEN = 'a' * 64
+NETWORKS = {
+    'testnet': {
+        'algod': ('https://testnet-api.algonode.cloud', ''),
+        'indexer': ('https://testnet-idx.algonode.cloud', ''),
+    },
+    'mainnet': {
+        'algod': ('https://mainnet-api.algonode.cloud', ''),
+        'indexer': ('https://mainnet-idx.algonode.cloud', ''),
+    },
+    'localnet': {
+        'algod': ('http://localhost:4001', LOCALNET_TOKEN),
+        'indexer': ('http://localhost:8980', LOCALNET_TOKEN),
+    },
+}
+
+
+def endpoint(service):
+    """(address, token) for 'algod' or 'indexer' from the environment."""
+    network = os.environ.get('ALGORAND_NETWORK', 'testnet').lower()
+    if network not in NETWORKS:
+        raise ValueError(f"Unknown ALGORAND_NETWORK {network!r} (expected one of {', '.join(NETWORKS)})")
+    address, token = NETWORKS[network][service]
+    prefix = f'ALGORAND_{service.upper()}'
+    return (
+        os.environ.get(f'{prefix}_SERVER', address).rstrip('/'),
+        os.environ.get(f'{prefix}_TOKEN', token),
+    )
+
+
+class CallStats:
+    """Per-endpoint call counts and latency for the pooled clients."""
+    # Collapse IDs and addresses so e.g. /v2/accounts/{address} is one bucket
+    _ID_RE = re.compile(r'/(\d+|[A-Z2-7]{52,58})(?=/|$)')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def record(self, service, method, path, seconds, failed=False):
+        key = f"{service} {method} {self._ID_RE.sub('/:id', path)}"
+        with self._lock:
+            entry = self._calls.setdefault(key, {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            ms = seconds * 1000
+            entry['calls'] += 1
+            entry['errors'] += int(failed)
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {
+                    'calls': e['calls'],
+                    'errors': e['errors'],
+                    'avg_ms': round(e['total_ms'] / e['calls'], 1),
+                    'max_ms': round(e['max_ms'], 1),
+                }
+                for key, e in sorted(self._calls.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+
+
+call_stats = CallStats()
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _request(session, service, method, url, path, headers, data, timeout):
+    start = time.perf_counter()
+    failed = True
+    try:
+        resp = session.request(method, url, headers=headers, data=data, timeout=timeout)
+        failed = resp.status_code >= 400
+        return resp
+    finally:
+        elapsed = time.perf_counter() - start
+        call_stats.record(service, method, path, elapsed, failed)
+        logger.debug(f"{service} {method} {path} took {elapsed * 1000:.1f}ms")
+
+
+class PooledAlgodClient(algod.AlgodClient):
+    """AlgodClient that reuses keep-alive connections and times every call."""
+
+    def __init__(self, algod_token, algod_address, headers=None, session=None):
+        super().__init__(algod_token, algod_address, headers)
+        self.session = session or _make_session()
+
+    def algod_request(self, method, requrl, params=None, data=None, headers=None,
+                      response_format='json', timeout=30):
+        header = {'User-Agent': 'py-algorand-sdk'}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header[constants.algod_auth_header] = self.algod_token
+
+        path = requrl if requrl in constants.unversioned_paths else algod.api_version_path_prefix + requrl
+        url = self.algod_address + path
+        if params:
+            url += '?' + parse.urlencode(params)
+
+        resp = _request(self.session, 'algod', method, url, path, header, data, timeout)
+        if resp.status_code >= 400:
+            body = {}
+            message = resp.text
+            try:
+                body = resp.json()
+                message = body['message']
+            except (ValueError, KeyError, TypeError):
+                pass
+            raise error.AlgodHTTPError(message, resp.status_code, body.get('data') if isinstance(body, dict) else None)
+
+        if response_format != 'json':
+            return resp.content
+        if not resp.content:
+            # Some algod endpoints answer 200 with an empty body
+            return {}
+        try:
+            return resp.json()
+        except ValueError as e:
+            raise error.AlgodResponseError('Failed to parse JSON response from algod') from e
+
+
+class PooledIndexerClient(indexer.IndexerClient):
+    """IndexerClient that reuses keep-alive connections and times every call."""
+
+    def __init__(self, indexer_token, indexer_address, headers=None, session=None):
+        super().__init__(indexer_token, indexer_address, headers)
+        self.session = session or _make_session()
+
+    def indexer_request(self, method, requrl, params=None, data=None, headers=None, timeout=30):
+        header = {'User-Agent': 'py-algorand-sdk'}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth and self.indexer_token:
+            header[constants.indexer_auth_header] = self.indexer_token
+
+        path = requrl if requrl in constants.unversioned_paths else indexer.api_version_path_prefix + requrl
+        url = self.indexer_address + path
+        if params:
+            url += '?' + parse.urlencode(params)
+
+        resp = _request(self.session, 'indexer', method, url, path, header, data, timeout)
+        if resp.status_code >= 400:
+            message = resp.text
+            try:
+                message = resp.json()['message']
+            except (ValueError, KeyError, TypeError):
+                pass
+            raise error.IndexerHTTPError(message)
+        # Same key ordering as the stock IndexerClient
+        return json.loads(resp.content.decode('utf-8'), object_hook=lambda d: dict(sorted(d.items())))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _shared(kind, factory):
+    address, token = endpoint(kind)
+    key = (kind, address, token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = factory(token, address)
+        return client
+
+
+def get_algod_client():
+    """Process-wide pooled AlgodClient for the configured network."""
+    return _shared('algod', PooledAlgodClient)
+
+
+def get_indexer_client():
+    """Process-wide pooled IndexerClient for the configured network."""
+    return _shared('indexer', PooledIndexerClient)
+
+
+def get_algorand_client():
+    """AlgoKit AlgorandClient on top of the shared pooled algod/indexer clients."""
+    from algokit_utils import AlgorandClient
+    return AlgorandClient.from_clients(algod=get_algod_client(), indexer=get_indexer_client())
+
+
+def client_stats():
+    """Per-endpoint latency of every algod/indexer call made by this process."""
+    return call_stats.snapshot()
+
+
+class SuggestedParamsCache:
+    def __init__(self, algod_client, ttl=PARAMS_TTL_SECONDS):
+        self.algod_client = algod_client
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._params = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.background_refreshes = 0
+        self.fetch_count = 0
+        self.fetch_seconds = 0.0
+
+    def _fetch(self):
+        start = time.perf_counter()
+        params = self.algod_client.suggested_params()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.fetch_count += 1
+            self.fetch_seconds += elapsed
+            # Never replace fresher params with an older round
+            if self._params is None or params.first >= self._params.first:
+                self._params = params
+                self._fetched_at = time.monotonic()
+        return params
+
+    def _background_refresh(self):
+        try:
+            self._fetch()
+            with self._lock:
+                self.background_refreshes += 1
+        except Exception as e:
+            logger.warning(f"SuggestedParamsCache: background refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self):
+        """Suggested params (a private copy, safe to mutate)."""
+        now = time.monotonic()
+        with self._lock:
+            params = self._params
+            age = now - self._fetched_at
+            fresh = params is not None and age < self.ttl
+            if fresh:
+                self.hits += 1
+                if age > self.ttl / 2 and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._background_refresh, daemon=True).start()
+            else:
+                self.misses += 1
+
+        if not fresh:
+            params = self._fetch()
+        return copy.copy(params)
+
+    def invalidate(self):
+        """Drop the cached params (e.g. after algod rejected them)."""
+        with self._lock:
+            self._params = None
+
+    @property
+    def last_round(self):
+        return self._params.first if self._params is not None else None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        avg_fetch = self.fetch_seconds / self.fetch_count if self.fetch_count else 0.0
+        return {
+            'lookups': lookups,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'background_refreshes': self.background_refreshes,
+            'avg_fetch_ms': round(avg_fetch * 1000, 1),
+            # Each hit skipped one synchronous suggested_params round trip
+            'latency_saved_ms': round(self.hits * avg_fetch * 1000, 1),
+            'last_round': self.last_round,
+        }
+
+
+_params_caches = {}
+_params_caches_lock = threading.Lock()
+
+
+def get_params_cache(algod_client):
+    """Process-wide SuggestedParamsCache for the algod node behind `algod_client`."""
+    key = getattr(algod_client, 'algod_address', id(algod_client))
+    with _params_caches_lock:
+        cache = _params_caches.get(key)
+        if cache is None:
+            cache = _params_caches[key] = SuggestedParamsCache(algod_client)
+        return cache
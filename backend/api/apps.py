@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connect the rank index to the leaderboard signals, leaderboard
+        # usernames to User renames and the roadmap counters to course
+        # content changes
+        from . import leaderboard, ranking, roadmap_progress  # noqa: F401
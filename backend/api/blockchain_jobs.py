@@ -0,0 +1,436 @@
+"""
+Blockchain outbox.
+
+Views call the enqueue_* helpers instead of AlgorandService directly, so a
+request only writes one BlockchainJob row. `manage.py run_blockchain_worker`
+claims due jobs, performs the on-chain action and writes the asset ID /
+txid back (AssessmentResult.badge_asset_id, Roadmap.nft_asset_id).
+
+Every job has an idempotency key of the form "user:reason:object", so
+retried requests or double clicks never mint or reward twice. Failed jobs
+are retried with exponential backoff; a reward that exhausts its retries
+is parked in LearnerProfile.pending_skill_tokens like before.
+
+A transaction's txid is stored on the job (BlockchainJob.submitted)
+before it is sent. If the attempt then fails without algod rejecting it
+(e.g. the confirmation wait timed out), the transaction may still land,
+so the next attempt asks the chain first: a confirmed txid completes the
+job, a dead one (dropped, past its last valid round) is replaced, and a
+pending one is checked again after CONFIRM_POLL_SECONDS. Waiting on the
+chain does not use up the job's attempts.
+
+Reward jobs are batched: the worker waits up to BATCH_WINDOW_SECONDS (or
+until GROUP_SIZE rewards are due), merges them into one transfer per
+wallet, adds any pending_skill_tokens owed to those learners, and sends
+everything as a single atomic group. If the group is rejected each job
+falls back to its own transfer so one bad wallet cannot block the rest.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import AssessmentResult, BlockchainJob, LearnerProfile, Roadmap
+from .services import AlgorandService, TransactionRejected
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 15
+BACKOFF_MAX_SECONDS = 3600
+# A RUNNING job whose worker has not finished it within this window is
+# considered abandoned (worker crashed) and becomes claimable again.
+LEASE_SECONDS = 300
+# Reward batching: at most one atomic group (16 transactions) per batch
+GROUP_SIZE = 16
+BATCH_WINDOW_SECONDS = 2
+# How soon to ask again about a sent transaction that may still confirm
+CONFIRM_POLL_SECONDS = 30
+
+
+class AwaitingConfirmation(Exception):
+    """An earlier attempt's transaction may still confirm; don't send another yet."""
+
+
+def idempotency_key(user, reason, obj):
+    return f"{user.id}:{reason}:{obj}"
+
+
+def _enqueue(user, kind, key, wallet, payload):
+    try:
+        with transaction.atomic():
+            job, _ = BlockchainJob.objects.get_or_create(
+                idempotency_key=key,
+                defaults={'user': user, 'kind': kind, 'wallet': wallet, 'payload': payload},
+            )
+    except IntegrityError:
+        job = BlockchainJob.objects.get(idempotency_key=key)
+    return job
+
+
+def enqueue_reward(user, wallet, reason, obj):
+    """Queue a $SKILL reward for `reason` on `obj` (e.g. concept id, date)."""
+    return _enqueue(user, 'reward', idempotency_key(user, reason, obj), wallet, {'reason': reason})
+
+
+def enqueue_badge(user, wallet, result):
+    """Queue a Skill Badge NFT mint for an AssessmentResult."""
+    concept = result.assessment.concept
+    return _enqueue(user, 'badge', idempotency_key(user, 'badge', result.id), wallet, {
+        'result_id': result.id,
+        'skill_name': concept.title[:30],
+        'score': result.score,
+        'topic': str(concept.id),
+    })
+
+
+def enqueue_certificate(user, wallet, roadmap):
+    """Queue a Certificate NFT mint for a completed Roadmap."""
+    return _enqueue(user, 'certificate', idempotency_key(user, 'certificate', roadmap.id), wallet, {
+        'roadmap_id': roadmap.id,
+        'course_title': roadmap.course.title,
+        'score': roadmap.progress,
+        'cert_id': roadmap.certificate_id,
+    })
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def release_abandoned():
+    """Return RUNNING jobs whose lease expired to the queue. Returns the count."""
+    cutoff = timezone.now() - timedelta(seconds=LEASE_SECONDS)
+    return BlockchainJob.objects.filter(status='RUNNING', locked_at__lt=cutoff).update(
+        status='PENDING', locked_at=None, next_attempt_at=timezone.now()
+    )
+
+
+def retry(jobs):
+    """
+    Re-queue FAILED jobs and RUNNING jobs whose lease expired from `jobs`
+    (a queryset), with a fresh set of attempts. A failed reward parked its
+    amount in pending_skill_tokens; that amount is taken back first, and a
+    reward whose parked tokens were already paid out with a later transfer
+    is left FAILED. Returns the number of jobs re-queued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=LEASE_SECONDS)
+    retryable = Q(status='FAILED') | Q(status='RUNNING', locked_at__lt=cutoff)
+    requeued = 0
+    for job in jobs.filter(retryable).order_by('id'):
+        with transaction.atomic():
+            if job.status == 'FAILED' and job.kind == 'reward':
+                amount = AlgorandService.REWARD_TABLE.get(job.payload.get('reason'), 0)
+                if amount and not LearnerProfile.objects.filter(
+                    user_id=job.user_id, pending_skill_tokens__gte=amount
+                ).update(pending_skill_tokens=F('pending_skill_tokens') - amount):
+                    logger.warning(f"BlockchainJob {job.idempotency_key}: parked tokens already paid out, not retrying")
+                    continue
+            updated = BlockchainJob.objects.filter(Q(id=job.id) & retryable).update(
+                status='PENDING', attempts=0, locked_at=None, next_attempt_at=timezone.now()
+            )
+            if not updated:
+                # A worker picked the job up meanwhile: keep the parked tokens
+                transaction.set_rollback(True)
+            requeued += updated
+    return requeued
+
+
+def stuck_jobs():
+    """Jobs that need attention: abandoned leases, retries in progress, and failures."""
+    cutoff = timezone.now() - timedelta(seconds=LEASE_SECONDS)
+    return BlockchainJob.objects.filter(
+        Q(status='RUNNING', locked_at__lt=cutoff) | Q(status='PENDING', attempts__gt=0) | Q(status='FAILED')
+        | (Q(status='PENDING') & ~Q(submitted={}))
+    )
+
+
+def _due(now, kind=None, exclude_kind=None):
+    qs = BlockchainJob.objects.filter(status='PENDING', next_attempt_at__lte=now)
+    if kind:
+        qs = qs.filter(kind=kind)
+    if exclude_kind:
+        qs = qs.exclude(kind=exclude_kind)
+    return qs
+
+
+def claim_due(limit=10, kind=None, exclude_kind=None):
+    """
+    Claim up to `limit` due jobs. Each claim is a conditional UPDATE, so two
+    workers can never run the same job.
+    """
+    now = timezone.now()
+    due_ids = list(
+        _due(now, kind, exclude_kind)
+        .order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+    )
+    claimed = [
+        job_id for job_id in due_ids
+        if BlockchainJob.objects.filter(id=job_id, status='PENDING').update(
+            status='RUNNING', locked_at=now, attempts=F('attempts') + 1
+        )
+    ]
+    return list(BlockchainJob.objects.filter(id__in=claimed).select_related('user'))
+
+
+def _settle_pending(user_id, amount):
+    """Tokens parked in pending_skill_tokens went out with a transfer."""
+    LearnerProfile.objects.filter(user_id=user_id).update(pending_skill_tokens=F('pending_skill_tokens') - amount)
+
+
+def _recorder(job):
+    """on_submit callback: store the txid on the job before it is sent."""
+    def record(txids, last_valid_round):
+        job.submitted = {'txid': txids[0], 'last_valid': last_valid_round}
+        job.save(update_fields=['submitted', 'updated_at'])
+    return record
+
+
+def _reward_result(job, service, txid):
+    reason = job.payload['reason']
+    return {'rewarded': True, 'amount': service.REWARD_TABLE.get(reason, 0), 'reason': reason, 'txid': txid}
+
+
+def _run_reward(job, service):
+    reason = job.payload['reason']
+    amount = service.REWARD_TABLE.get(reason, 0)
+    if amount == 0 or not service.rewards_enabled():
+        return {'rewarded': False, 'reason': reason}
+    txid = service.transfer_skill_tokens(job.wallet, amount, reason, on_submit=_recorder(job))
+    return _reward_result(job, service, txid)
+
+
+def _badge_minted(job, asset_id):
+    if asset_id:
+        AssessmentResult.objects.filter(id=job.payload['result_id']).update(badge_asset_id=asset_id)
+
+
+def _run_badge(job, service):
+    p = job.payload
+    badge = service.issue_skill_badge(job.wallet, p['skill_name'], p['score'], p['topic'], on_submit=_recorder(job))
+    if not badge or not badge.get('asset_id'):
+        raise RuntimeError(f"Badge mint returned no asset_id: {badge}")
+    _badge_minted(job, badge['asset_id'])
+    return badge
+
+
+def _certificate_minted(job, asset_id):
+    if asset_id:
+        Roadmap.objects.filter(id=job.payload['roadmap_id'], nft_asset_id__isnull=True).update(nft_asset_id=asset_id)
+
+
+def _run_certificate(job, service):
+    p = job.payload
+    # The learner may have minted it retroactively in the meantime
+    if Roadmap.objects.filter(id=p['roadmap_id'], nft_asset_id__isnull=False).exists():
+        return {'skipped': 'already minted'}
+    nft = service.issue_certificate_nft(
+        job.wallet, p['course_title'], p['score'], p['cert_id'], on_submit=_recorder(job)
+    )
+    if not nft or not nft.get('asset_id'):
+        raise RuntimeError(f"Certificate mint returned no asset_id: {nft}")
+    _certificate_minted(job, nft['asset_id'])
+    return nft
+
+
+def _confirmed_reward(job, service, info):
+    if job.submitted.get('settles'):
+        _settle_pending(job.user_id, job.submitted['settles'])
+    return _reward_result(job, service, job.submitted['txid'])
+
+
+def _confirmed_badge(job, service, info):
+    _badge_minted(job, info.get('asset-index'))
+    return {'asset_id': info.get('asset-index') or 0, 'txid': job.submitted['txid']}
+
+
+def _confirmed_certificate(job, service, info):
+    _certificate_minted(job, info.get('asset-index'))
+    return {'asset_id': info.get('asset-index') or 0, 'txid': job.submitted['txid']}
+
+
+HANDLERS = {
+    'reward': _run_reward,
+    'badge': _run_badge,
+    'certificate': _run_certificate,
+}
+
+# Completes a job whose earlier transaction turned out to be confirmed
+CONFIRMED = {
+    'reward': _confirmed_reward,
+    'badge': _confirmed_badge,
+    'certificate': _confirmed_certificate,
+}
+
+
+def reward_batch_ready(now=None):
+    """True once a full group is due or the oldest due reward waited out the window."""
+    now = now or timezone.now()
+    due = _due(now, kind='reward')
+    window_start = now - timedelta(seconds=BATCH_WINDOW_SECONDS)
+    return due.filter(next_attempt_at__lte=window_start).exists() or due.count() >= GROUP_SIZE
+
+
+def run_reward_batch(jobs, service):
+    """
+    Pay a batch of claimed reward jobs as one atomic group, one transfer per
+    wallet, settling any pending_skill_tokens owed to the same learners.
+    Falls back to per-job transfers only if nothing was submitted (algod
+    rejected the group, or it failed before sending). If the group was sent
+    but its confirmation is unknown, the jobs wait for it instead.
+    Jobs whose earlier group is outstanding are settled one by one first.
+    Returns (succeeded, failed).
+    """
+    if not service.rewards_enabled():
+        results = [run_job(job, service) for job in jobs]
+        return results.count(True), results.count(False)
+
+    outstanding = [job for job in jobs if job.submitted]
+    jobs = [job for job in jobs if not job.submitted]
+    results = [run_job(job, service) for job in outstanding]
+    if not jobs:
+        return results.count(True), results.count(False)
+
+    # (user_id, wallet) -> [jobs]
+    by_wallet = {}
+    for job in jobs:
+        by_wallet.setdefault((job.user_id, job.wallet), []).append(job)
+
+    pending = dict(
+        LearnerProfile.objects.filter(
+            user_id__in={user_id for user_id, _ in by_wallet}, pending_skill_tokens__gt=0
+        ).values_list('user_id', 'pending_skill_tokens')
+    )
+
+    transfers, settled = [], {}
+    for (user_id, wallet), wallet_jobs in by_wallet.items():
+        reasons = [job.payload['reason'] for job in wallet_jobs]
+        amount = sum(service.REWARD_TABLE.get(reason, 0) for reason in reasons)
+        if user_id in pending and user_id not in settled:
+            settled[user_id] = pending[user_id]
+            amount += pending[user_id]
+            reasons.append('pending')
+        transfers.append((wallet, amount, f"SkillMeter reward: {','.join(reasons)}"))
+
+    def record(txids, last_valid_round):
+        for txid, ((user_id, _), wallet_jobs) in zip(txids, by_wallet.items()):
+            for i, job in enumerate(wallet_jobs):
+                job.submitted = {'txid': txid, 'last_valid': last_valid_round}
+                if i == 0 and user_id in settled:
+                    job.submitted['settles'] = settled[user_id]
+        BlockchainJob.objects.bulk_update(jobs, ['submitted'])
+
+    try:
+        txids = service.transfer_skill_tokens_group(transfers, on_submit=record)
+    except Exception as e:
+        if jobs[0].submitted and not isinstance(e, TransactionRejected):
+            # The group may still confirm: re-sending any of it could pay twice
+            for job in jobs:
+                _await_confirmation(job, e)
+            return results.count(True), results.count(False) + len(jobs)
+        logger.warning(f"Reward group of {len(transfers)} failed, falling back to single transfers: {e}")
+        for job in jobs:
+            job.submitted = {}
+        BlockchainJob.objects.bulk_update(jobs, ['submitted'])
+        results += [run_job(job, service) for job in jobs]
+        return results.count(True), results.count(False)
+
+    for user_id, amount in settled.items():
+        _settle_pending(user_id, amount)
+    for txid, wallet_jobs in zip(txids, by_wallet.values()):
+        for job in wallet_jobs:
+            _mark_done(job, {**_reward_result(job, service, txid), 'grouped': len(txids) > 1})
+    return results.count(True) + len(jobs), results.count(False)
+
+
+def _mark_done(job, result):
+    job.status = 'DONE'
+    job.result = result or {}
+    job.last_error = ''
+    job.locked_at = None
+    job.submitted = {}
+    job.save(update_fields=['status', 'result', 'last_error', 'locked_at', 'submitted', 'updated_at'])
+
+
+def _resolve_submitted(job, service):
+    """
+    Settle the transaction an earlier attempt sent. Returns the job's result
+    if it confirmed, or None if it is dead and a new one may be sent.
+    Raises AwaitingConfirmation while it may still confirm.
+    """
+    txid = job.submitted['txid']
+    state, info = service.transaction_status(txid, job.submitted['last_valid'])
+    if state == 'pending':
+        raise AwaitingConfirmation(f"transaction {txid} may still confirm")
+    if state == 'dead':
+        logger.info(f"BlockchainJob {job.idempotency_key}: transaction {txid} never confirmed, sending again")
+        job.submitted = {}
+        job.save(update_fields=['submitted', 'updated_at'])
+        return None
+    logger.info(f"BlockchainJob {job.idempotency_key}: transaction {txid} confirmed after all")
+    return CONFIRMED[job.kind](job, service, info)
+
+
+def _await_confirmation(job, error):
+    """Check the job's sent transaction again later; this is not a failed attempt."""
+    job.status = 'PENDING'
+    job.attempts -= 1
+    job.last_error = f"Awaiting confirmation of {job.submitted['txid']}: {error}"[:2000]
+    job.locked_at = None
+    job.next_attempt_at = timezone.now() + timedelta(seconds=CONFIRM_POLL_SECONDS)
+    job.save(update_fields=['status', 'attempts', 'last_error', 'locked_at', 'next_attempt_at', 'updated_at'])
+    logger.warning(f"BlockchainJob {job.idempotency_key}: {job.last_error}")
+
+
+def run_job(job, service):
+    """Execute one claimed job and record the outcome. Returns True on success."""
+    try:
+        result = _resolve_submitted(job, service) if job.submitted else None
+        if result is None:
+            result = HANDLERS[job.kind](job, service)
+    except Exception as e:
+        if isinstance(e, TransactionRejected):
+            job.submitted = {}  # algod refused it; nothing can confirm
+        if job.submitted:
+            # Sent but not known to be confirmed: never sign a replacement blindly
+            _await_confirmation(job, e)
+            return False
+
+        job.last_error = str(e)[:2000]
+        job.locked_at = None
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'FAILED'
+            if job.kind == 'reward':
+                amount = service.REWARD_TABLE.get(job.payload.get('reason'), 0)
+                if amount:
+                    service.add_pending_tokens(job.user, amount)
+            logger.error(f"BlockchainJob {job.idempotency_key} failed permanently: {e}")
+        else:
+            job.status = 'PENDING'
+            job.next_attempt_at = timezone.now() + _backoff(job.attempts)
+            logger.warning(f"BlockchainJob {job.idempotency_key} attempt {job.attempts} failed: {e}")
+        job.save(update_fields=['status', 'last_error', 'locked_at', 'next_attempt_at', 'submitted', 'updated_at'])
+        return False
+
+    _mark_done(job, result)
+    return True
+
+
+def drain(service, limit=10):
+    """Run one batch of due jobs. Returns (succeeded, failed)."""
+    release_abandoned()
+    succeeded = failed = 0
+
+    if reward_batch_ready():
+        rewards = claim_due(GROUP_SIZE, kind='reward')
+        if rewards:
+            succeeded, failed = run_reward_batch(rewards, service)
+
+    for job in claim_due(limit, exclude_kind='reward'):
+        if run_job(job, service):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
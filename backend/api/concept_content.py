@@ -0,0 +1,122 @@
+"""
+On-demand notes and quizzes for a concept.
+
+Generated courses are saved without notes or quizzes; the real content is
+written the first time it is needed, either when the learner opens the
+lesson (generate_concept_notes / generate_concept_quiz) or ahead of time
+by the prefetch worker. Both go through single_flight with the same keys,
+so a lesson is never generated twice even if the learner arrives while
+the prefetch is still running.
+
+Notes are stored in ConceptNotes, zlib-compressed when that is smaller,
+with a SHA-256 ETag of the Markdown. Concept.has_notes mirrors whether a
+row exists, so course trees can say so without touching the notes table.
+"""
+import hashlib
+import zlib
+
+from django.db import transaction
+
+from . import single_flight
+from .models import Assessment, Concept, ConceptNotes
+from .services import NotesGeneratorService, QuizGeneratorService
+
+COMPRESS_LEVEL = 6
+
+
+def _encode(concept_id, text):
+    raw = text.encode()
+    packed = zlib.compress(raw, COMPRESS_LEVEL)
+    compressed = len(packed) < len(raw)
+    return ConceptNotes(
+        concept_id=concept_id,
+        body=packed if compressed else raw,
+        compressed=compressed,
+        size=len(raw),
+        etag=hashlib.sha256(raw).hexdigest(),
+    )
+
+
+def _decode(row):
+    body = bytes(row.body)
+    return (zlib.decompress(body) if row.compressed else body).decode()
+
+
+def save_notes(concept_id, text):
+    """Store (or replace) a concept's notes and set Concept.has_notes."""
+    row = _encode(concept_id, text)
+    with transaction.atomic():
+        ConceptNotes.objects.update_or_create(
+            concept_id=concept_id,
+            defaults={'body': row.body, 'compressed': row.compressed, 'size': row.size, 'etag': row.etag},
+        )
+        Concept.objects.filter(id=concept_id).update(has_notes=True)
+
+
+def bulk_save_notes(notes_by_concept):
+    """Insert notes for new concepts ({concept_id: text}); callers set has_notes on the concepts."""
+    if notes_by_concept:
+        ConceptNotes.objects.bulk_create([_encode(cid, text) for cid, text in notes_by_concept.items()])
+
+
+def read_notes(concept_id):
+    """The concept's notes, or None if none have been generated."""
+    row = ConceptNotes.objects.filter(concept_id=concept_id).first()
+    return _decode(row) if row else None
+
+
+def read_notes_bulk(concept_ids):
+    """{concept_id: notes} for those of `concept_ids` that have notes, in one query."""
+    return {row.concept_id: _decode(row) for row in ConceptNotes.objects.filter(concept_id__in=concept_ids)}
+
+
+def stored_etag(concept_id):
+    """The ETag of the concept's notes without reading the body, or None."""
+    return ConceptNotes.objects.filter(concept_id=concept_id).values_list('etag', flat=True).first()
+
+
+def load_notes(concept):
+    return read_notes(concept.id)
+
+
+def get_notes(concept, wait_seconds=None):
+    """
+    Return (notes, outcome), generating them once if needed; see
+    single_flight.run. A failed generation raises and stores nothing, so
+    the next request or prefetch asks Gemini again.
+    """
+    def generate():
+        notes = NotesGeneratorService.generate_notes(concept.title, concept.description)
+        save_notes(concept.id, notes)
+        return notes
+
+    return single_flight.run(f'notes:{concept.id}', generate, lambda: load_notes(concept), wait_seconds)
+
+
+def load_quiz(concept):
+    """The concept's Assessment if it has questions, else None."""
+    assessment = Assessment.objects.filter(concept=concept).first()
+    return assessment if assessment and assessment.questions else None
+
+
+def get_quiz(concept, wait_seconds=None):
+    """
+    Return (assessment, outcome), generating the quiz once if needed.
+    assessment is None if the model returned no questions.
+    """
+    def generate():
+        context = read_notes(concept.id) or concept.description
+        quiz_data = QuizGeneratorService.generate_quiz(concept.title, context)
+        if not quiz_data:
+            return None
+
+        assessment, created = Assessment.objects.get_or_create(
+            concept=concept,
+            defaults={'questions': quiz_data, 'time_limit': 10}
+        )
+        if not created:
+            assessment.questions = quiz_data
+            assessment.save()
+        return assessment
+
+    return single_flight.run(f'quiz:{concept.id}', generate, lambda: load_quiz(concept), wait_seconds)
@@ -0,0 +1,46 @@
+"""
+Canonical AI-generated courses.
+
+generate_roadmap_ai used to call Gemini and build a new Course tree for
+every request, even when many learners ask for the same topic. Generated
+courses are now tagged with a canonical key derived from the normalized
+(topic, skill level), and later requests for the same key enroll the
+learner on that course instead, sharing its notes, quizzes and videos.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+
+from . import events
+from .models import Course, Roadmap
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def canonical_key(topic, skill_level):
+    """'  Python ', 'Beginner' -> 'python|beginner'."""
+    words = _WORD_RE.findall(topic.lower())
+    return f"{' '.join(words)}|{skill_level.strip().lower()}"[:255]
+
+
+def find_canonical(topic, skill_level):
+    """The newest generated course with chapters for (topic, skill_level), or None."""
+    return (
+        Course.objects.filter(canonical_key=canonical_key(topic, skill_level), chapters__isnull=False)
+        .order_by('-created_at').first()
+    )
+
+
+def enroll(user, course):
+    """Roadmap for `user` on `course`, creating it if needed. Returns (roadmap, created)."""
+    try:
+        with transaction.atomic():
+            roadmap, created = Roadmap.objects.get_or_create(
+                user=user, course=course, defaults={'current_chapter': 0, 'current_concept': 0}
+            )
+    except IntegrityError:
+        # Double submit: the other request enrolled first
+        return Roadmap.objects.get(user=user, course=course), False
+    if created:
+        events.record(user, 'roadmap_started', course.id, roadmap.started_at)
+    return roadmap, created
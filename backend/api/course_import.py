@@ -0,0 +1,119 @@
+"""
+Course tree import.
+
+Builds a Course with its chapters, concepts and assessments from a plain
+dict in one transaction, with one bulk INSERT per table instead of one
+INSERT per row, so a crash never leaves a half-built course behind.
+Used by generate_roadmap_ai, the streaming generator, the admin
+"duplicate" action and the seed scripts.
+
+Tree format (model field names; `duration_minutes` is accepted for
+`duration`; `notes` is stored in ConceptNotes):
+
+    {
+        "course": {"title": ..., "description": ..., ...},
+        "chapters": [
+            {"title": ..., "description": ..., "concepts": [
+                {"title": ..., "video_url": ..., "duration": 15,
+                 "assessments": [{"questions": [...], "time_limit": 10}]},
+            ]},
+        ],
+    }
+"""
+from django.db import transaction
+
+from . import concept_content, roadmap_progress
+from .models import Assessment, Chapter, Concept, Course
+
+COURSE_FIELDS = ('title', 'description', 'thumbnail', 'difficulty', 'estimated_hours', 'tags', 'canonical_key')
+CHAPTER_FIELDS = ('title', 'description', 'order')
+CONCEPT_FIELDS = ('title', 'description', 'duration', 'video_url', 'content_type', 'order')
+ASSESSMENT_FIELDS = ('questions', 'time_limit')
+
+
+def _pick(data, fields):
+    return {field: data[field] for field in fields if field in data}
+
+
+def add_chapters(course, chapters, start_order=1):
+    """
+    Bulk-insert `chapters` (tree format) into an existing course.
+    Chapters and concepts without an explicit order are numbered from
+    `start_order` / 1. Returns the created Chapter objects.
+    """
+    with transaction.atomic(savepoint=False):
+        chapter_objs = _insert_chapters(course, chapters, start_order)
+        # bulk_create sends no signals; learners already enrolled get the new total
+        roadmap_progress.course_changed(course.id)
+    return chapter_objs
+
+
+def _insert_chapters(course, chapters, start_order=1):
+    # Callers hold the transaction
+    chapter_objs = Chapter.objects.bulk_create([
+        Chapter(course=course, **{'order': start_order + i, **_pick(chapter, CHAPTER_FIELDS)})
+        for i, chapter in enumerate(chapters)
+    ])
+
+    concept_objs, concept_assessments, concept_notes = [], [], []
+    for chapter_obj, chapter in zip(chapter_objs, chapters):
+        for j, concept in enumerate(chapter.get('concepts', [])):
+            fields = {'order': j + 1, **_pick(concept, CONCEPT_FIELDS)}
+            if 'duration' not in fields and 'duration_minutes' in concept:
+                fields['duration'] = concept['duration_minutes']
+            concept_objs.append(Concept(chapter=chapter_obj, has_notes=bool(concept.get('notes')), **fields))
+            concept_assessments.append(concept.get('assessments', []))
+            concept_notes.append(concept.get('notes'))
+    Concept.objects.bulk_create(concept_objs)
+    concept_content.bulk_save_notes({
+        concept_obj.id: notes for concept_obj, notes in zip(concept_objs, concept_notes) if notes
+    })
+
+    assessments = [
+        Assessment(concept=concept_obj, **_pick(assessment, ASSESSMENT_FIELDS))
+        for concept_obj, items in zip(concept_objs, concept_assessments)
+        for assessment in items
+    ]
+    if assessments:
+        Assessment.objects.bulk_create(assessments)
+    return chapter_objs
+
+
+def import_course(tree, **overrides):
+    """Create a Course and its whole tree atomically. `overrides` set Course fields."""
+    with transaction.atomic():
+        chapters = tree.get('chapters', [])
+        # A new course has no roadmaps to recount yet; its chapter sizes come from the tree
+        order = [(chapter.get('order', i + 1), i) for i, chapter in enumerate(chapters)]
+        sizes = [len(chapters[i].get('concepts', [])) for _, i in sorted(order)]
+        course = Course.objects.create(
+            **{**_pick(tree.get('course', {}), COURSE_FIELDS), 'chapter_sizes': sizes, **overrides}
+        )
+        _insert_chapters(course, chapters)
+    return course
+
+
+def export_course(course):
+    """The tree for an existing course (inverse of import_course)."""
+    chapters = course.chapters.prefetch_related('concepts__assessments')
+    notes = concept_content.read_notes_bulk(Concept.objects.filter(chapter__course=course, has_notes=True).values('id'))
+    return {
+        'course': {field: getattr(course, field) for field in COURSE_FIELDS if field != 'canonical_key'},
+        'chapters': [
+            {
+                **{field: getattr(chapter, field) for field in CHAPTER_FIELDS},
+                'concepts': [
+                    {
+                        **{field: getattr(concept, field) for field in CONCEPT_FIELDS},
+                        **({'notes': notes[concept.id]} if concept.id in notes else {}),
+                        'assessments': [
+                            {field: getattr(a, field) for field in ASSESSMENT_FIELDS}
+                            for a in concept.assessments.all()
+                        ],
+                    }
+                    for concept in chapter.concepts.all()
+                ],
+            }
+            for chapter in chapters
+        ],
+    }
@@ -0,0 +1,142 @@
+"""
+Daily task planner.
+
+`manage.py plan_daily_tasks` runs nightly and writes every active
+learner's DailyTask rows for the day, so GET /tasks/ is a plain indexed
+read instead of planning inside the request.
+
+Users are planned in chunks. For each chunk one query streams the next
+uncompleted concepts of every unfinished roadmap, with completion checked
+by a NOT EXISTS anti-join against ConceptProgress and at most MAX_TASKS
+candidates per roadmap (a ROW_NUMBER window). Tasks are then picked
+round-robin across a learner's roadmaps, most recently used first, until
+LearnerProfile.daily_study_time minutes are filled (always at least one
+task), and saved with one bulk INSERT per chunk.
+
+A learner is active if they have an unfinished roadmap that they opened or
+studied within ACTIVE_DAYS. Anyone else gets planned on demand by the view
+the first time they ask for tasks that day (plan_users for one user).
+"""
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import ConceptProgress, DailyTask, LearnerProfile, Roadmap
+
+MAX_TASKS = getattr(settings, 'DAILY_TASK_MAX', 5)
+DEFAULT_STUDY_MINUTES = 30
+ACTIVE_DAYS = getattr(settings, 'DAILY_PLANNER_ACTIVE_DAYS', 30)
+CHUNK_SIZE = 500
+
+
+def active_user_ids(day):
+    """Users with an unfinished roadmap that they opened or studied within ACTIVE_DAYS."""
+    cutoff = day - timedelta(days=ACTIVE_DAYS)
+    return (
+        # One filter() call, so both conditions apply to the same roadmap row
+        User.objects.filter(
+            Q(roadmaps__completed_at__isnull=True)
+            & (Q(roadmaps__last_accessed_at__date__gte=cutoff) | Q(daily_activity__date__gte=cutoff))
+        )
+        .order_by('id').values_list('id', flat=True).distinct()
+    )
+
+
+def _candidates(user_ids):
+    """
+    (user_id, roadmap_id, concept_id, title, duration) rows: the next
+    uncompleted concepts of each unfinished roadmap, ordered per user by
+    roadmap recency and then learning order.
+    """
+    completed = ConceptProgress.objects.filter(
+        user_id=OuterRef('user_id'), concept_id=OuterRef('concept_id'), completed=True
+    )
+    return (
+        Roadmap.objects.filter(user_id__in=user_ids, completed_at__isnull=True)
+        # Annotate once so every reference below shares the same joins
+        .annotate(
+            chapter_order=F('course__chapters__order'),
+            concept_id=F('course__chapters__concepts__id'),
+            concept_order=F('course__chapters__concepts__order'),
+            concept_title=F('course__chapters__concepts__title'),
+            concept_duration=F('course__chapters__concepts__duration'),
+        )
+        .filter(concept_id__isnull=False)
+        .filter(~Exists(completed))
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=F('id'),
+            order_by=[F('chapter_order').asc(), F('concept_order').asc(), F('concept_id').asc()],
+        ))
+        .filter(position__lte=MAX_TASKS)
+        .order_by('user_id', '-last_accessed_at', 'id', 'position')
+        .values_list('user_id', 'id', 'concept_id', 'concept_title', 'concept_duration')
+    )
+
+
+def _pick(rows, budget):
+    """Round-robin over the user's roadmaps until `budget` minutes are used."""
+    queues = [list(group) for _, group in groupby(rows, key=lambda row: row[1])]
+    picked, minutes = [], 0
+    while queues and len(picked) < MAX_TASKS:
+        for queue in list(queues):
+            row = queue[0]
+            if picked and minutes + row[4] > budget:
+                queues.remove(queue)
+                continue
+            picked.append(row)
+            minutes += row[4]
+            queue.pop(0)
+            if not queue:
+                queues.remove(queue)
+            if len(picked) >= MAX_TASKS:
+                break
+    return picked
+
+
+def plan_users(user_ids, day=None):
+    """
+    Create `day`'s tasks for users who have none yet. Returns the number of
+    rows inserted, which leaves out tasks that another planner (the nightly
+    run or the view's fallback) inserted first.
+    """
+    day = day or timezone.now().date()
+    user_ids = set(user_ids) - set(
+        DailyTask.objects.filter(user_id__in=user_ids, scheduled_date=day).values_list('user_id', flat=True)
+    )
+    if not user_ids:
+        return 0
+    budgets = dict(LearnerProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'daily_study_time'))
+
+    tasks = []
+    for user_id, rows in groupby(_candidates(user_ids).iterator(chunk_size=2000), key=lambda row: row[0]):
+        budget = budgets.get(user_id) or DEFAULT_STUDY_MINUTES
+        tasks.extend(
+            DailyTask(
+                user_id=user_id, concept_id=concept_id, task_type='video',
+                title=f"Complete: {title}"[:200], scheduled_date=day,
+            )
+            for _, _, concept_id, title, _ in _pick(list(rows), budget)
+        )
+    if not tasks:
+        return 0
+    # ignore_conflicts hides which rows were skipped, so count the day's rows around the INSERT
+    planned = DailyTask.objects.filter(user_id__in=user_ids, scheduled_date=day)
+    before = planned.count()
+    DailyTask.objects.bulk_create(tasks, ignore_conflicts=True)
+    return planned.count() - before
+
+
+def plan_day(day=None, chunk_size=CHUNK_SIZE):
+    """Plan `day` for every active user. Returns (users, tasks inserted)."""
+    day = day or timezone.now().date()
+    user_ids = list(active_user_ids(day))
+    created = 0
+    for start in range(0, len(user_ids), chunk_size):
+        created += plan_users(user_ids[start:start + chunk_size], day)
+    return len(user_ids), created
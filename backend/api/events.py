@@ -0,0 +1,229 @@
+"""
+Learning event log and its projections.
+
+Progress endpoints append a LearningEvent with record() instead of each
+updating its own summary tables. The event is then folded into every
+projection that cares about its kind:
+
+- daily_activity: DailyActivity rows (progress chart, heatmap)
+- user_progress: UserProgress totals and streaks
+- leaderboard: LeaderboardEntry scores
+
+Projectors apply one event at a time with the same F() updates the views
+used to make directly. A projector that fails is logged and skipped (its
+savepoint is rolled back); the event is already stored, so a replay brings
+the table back in line.
+
+replay() (`manage.py replay_events`) rebuilds a projection from the log one
+learner at a time. Each learner is reset and refolded in a single
+transaction that holds a row lock on the user, and record() takes the same
+lock after inserting its event, so for any learner:
+
+- other readers see the old numbers until the rebuild commits, never a
+  zeroed or half-folded row;
+- a live event either commits before the rebuild reads the log (and is
+  folded by it) or waits for the rebuild and is applied on top of it, so
+  order-dependent state such as streaks is never folded out of order.
+
+The projection's ProjectionCheckpoint records the last learner rebuilt, so
+an interrupted replay continues with resume=True where it stopped.
+"""
+import logging
+import threading
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import activity, leaderboard
+from .models import DailyActivity, LeaderboardEntry, LearningEvent, ProjectionCheckpoint, UserProgress
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+_lock = threading.Lock()
+_counters = {'recorded': 0, 'projector_errors': 0}
+
+
+def _count(**deltas):
+    with _lock:
+        for name, delta in deltas.items():
+            _counters[name] += delta
+
+
+class Projector:
+    """Folds events of `kinds` into a summary table."""
+    name = ''
+    kinds = ()
+
+    def apply(self, event):
+        raise NotImplementedError
+
+    def reset(self, user_ids=None):
+        """Empty the projection for `user_ids`, or for everyone."""
+        raise NotImplementedError
+
+    def finish(self):
+        """Called after a full replay."""
+
+
+class DailyActivityProjector(Projector):
+    name = 'daily_activity'
+    kinds = ('concept_completed',)
+
+    def apply(self, event):
+        activity.record_completion(event.user, event.data.get('minutes', 0), event.occurred_at.date())
+
+    def reset(self, user_ids=None):
+        rows = DailyActivity.objects.all()
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        rows.delete()
+
+
+class UserProgressProjector(Projector):
+    name = 'user_progress'
+    kinds = ('concept_completed',)
+
+    def apply(self, event):
+        """Returns the new streak if the event was the day's first activity."""
+        return activity.record_progress(event.user, event.data.get('minutes', 0), event.occurred_at.date())
+
+    def reset(self, user_ids=None):
+        rows = UserProgress.objects.all()
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        rows.update(
+            total_minutes_learned=0, total_concepts_completed=0,
+            current_streak=0, longest_streak=0, last_activity_date=None,
+        )
+
+
+class LeaderboardProjector(Projector):
+    name = 'leaderboard'
+    kinds = ('concept_completed', 'roadmap_started', 'roadmap_removed')
+
+    def apply(self, event):
+        if event.kind == 'concept_completed':
+            leaderboard.record_concept_completed(event.user)
+        elif event.kind == 'roadmap_started':
+            leaderboard.record_roadmap_created(event.user)
+        else:
+            leaderboard.record_roadmap_deleted(event.user)
+
+    def reset(self, user_ids=None):
+        # Zero rows for everyone in the log, so replayed deltas never fall
+        # back to seeding an entry from the source tables
+        events = LearningEvent.objects.filter(kind__in=self.kinds)
+        entries = LeaderboardEntry.objects.all()
+        if user_ids is not None:
+            events = events.filter(user_id__in=user_ids)
+            entries = entries.filter(user_id__in=user_ids)
+        entries.delete()
+        users = User.objects.filter(id__in=events.values('user_id')).values_list('id', 'username')
+        LeaderboardEntry.objects.bulk_create(
+            [LeaderboardEntry(user_id=user_id, username=username) for user_id, username in users],
+            batch_size=1000,
+        )
+
+    def finish(self):
+        leaderboard.leaderboard_rebuilt.send(sender=LeaderboardEntry)
+
+
+PROJECTORS = {
+    projector.name: projector
+    for projector in (DailyActivityProjector(), UserProgressProjector(), LeaderboardProjector())
+}
+
+
+def record(user, kind, object_id=None, occurred_at=None, **data):
+    """
+    Append an event and project it. `data` holds what the projections
+    need (e.g. minutes=concept.duration). Returns {projection: result};
+    'user_progress' is the new streak when the event started a new day.
+    """
+    with transaction.atomic():
+        event = LearningEvent.objects.create(
+            user=user, kind=kind, object_id=object_id, data=data, occurred_at=occurred_at or timezone.now(),
+        )
+        # Insert first, then lock: a replay holding the lock cannot see
+        # this event yet, so it is applied exactly once, after the rebuild
+        _lock_user(user.id)
+        results = project(event)
+    _count(recorded=1)
+    return results
+
+
+def _lock_user(user_id):
+    """Serialize projection writes for one learner until the transaction ends."""
+    list(User.objects.select_for_update().filter(id=user_id).values_list('id', flat=True))
+
+
+def project(event):
+    results = {}
+    for projector in PROJECTORS.values():
+        if event.kind not in projector.kinds:
+            continue
+        try:
+            with transaction.atomic():
+                results[projector.name] = projector.apply(event)
+        except Exception as e:
+            _count(projector_errors=1)
+            logger.error(f"Projection {projector.name} failed for event {event.id}: {e}")
+    return results
+
+
+def _fold(projector, events, batch_size):
+    """Apply `events` in id order, loading batch_size at a time."""
+    applied = after = 0
+    while True:
+        batch = list(events.filter(id__gt=after).select_related('user').order_by('id')[:batch_size])
+        if not batch:
+            return applied
+        for event in batch:
+            projector.apply(event)
+        after = batch[-1].id
+        applied += len(batch)
+
+
+def _rebuild_user(projector, user_id, batch_size, checkpoint=None):
+    """Reset and refold one learner in one transaction. Returns events applied."""
+    with transaction.atomic():
+        _lock_user(user_id)
+        projector.reset([user_id])
+        applied = _fold(projector, LearningEvent.objects.filter(user_id=user_id, kind__in=projector.kinds), batch_size)
+        if checkpoint is not None:
+            checkpoint.last_user_id = user_id
+            checkpoint.save(update_fields=['last_user_id', 'updated_at'])
+    return applied
+
+
+def replay(name, batch_size=BATCH_SIZE, resume=False, user_ids=None):
+    """
+    Rebuild projection `name` from the log. Returns the number of events
+    applied. With `user_ids` only those users are rebuilt (no checkpoint);
+    with resume=True a previous full replay continues after the last
+    learner it finished.
+    """
+    projector = PROJECTORS[name]
+    if user_ids is not None:
+        return sum(_rebuild_user(projector, user_id, batch_size) for user_id in user_ids)
+
+    checkpoint, created = ProjectionCheckpoint.objects.get_or_create(name=name)
+    if created or not resume:
+        checkpoint.last_user_id = 0
+        checkpoint.save()
+
+    applied = 0
+    remaining = User.objects.filter(id__gt=checkpoint.last_user_id).order_by('id').values_list('id', flat=True)
+    for user_id in remaining.iterator():
+        applied += _rebuild_user(projector, user_id, batch_size, checkpoint)
+    projector.finish()
+    return applied
+
+
+def stats():
+    """Counters for this process."""
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,260 @@
+"""
+Process-wide Gemini rate limiter.
+
+A burst of roadmap generations used to fire every Gemini call at once and
+hit the provider's requests-per-minute / tokens-per-minute quotas, so
+interview turns failed with 429s alongside the background work that
+caused them. Every call now takes a slot() first:
+
+- Two token buckets, GEMINI_RPM requests and GEMINI_TPM estimated tokens
+  per minute, plus at most GEMINI_MAX_CONCURRENCY calls in flight.
+- The buckets live in a small JSON file (GEMINI_LIMITER_PATH) guarded by
+  flock, so every worker process on the host shares one budget. In-flight
+  calls are leases with an expiry, so a killed worker's slots come back.
+- Priorities: interview calls (0) may use the whole budget, user-facing
+  generations (1) leave RESERVE[1] of it free, and background work such
+  as the prefetch worker (2, see background()) leaves RESERVE[2] free. An
+  interview turn therefore still gets through while prefetch is throttled.
+- A caller waits for capacity until its deadline (DEADLINES by priority)
+  and then gets RateLimitTimeout instead of piling onto the provider.
+- A 429 from Gemini empties the request bucket for everyone.
+
+stats() returns wait-time histograms per call site.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: the limit is per process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'GEMINI_LIMITER_ENABLED', True)
+RPM = getattr(settings, 'GEMINI_RPM', 60)
+TPM = getattr(settings, 'GEMINI_TPM', 250_000)
+MAX_CONCURRENCY = getattr(settings, 'GEMINI_MAX_CONCURRENCY', 8)
+STATE_PATH = getattr(
+    settings, 'GEMINI_LIMITER_PATH', os.path.join(tempfile.gettempdir(), 'skillmeter-gemini-limiter.json')
+)
+# A call still "in flight" after this long belongs to a dead worker
+LEASE_SECONDS = 120
+
+PRIORITIES = {
+    'interview_question': 0,
+    'interview_analysis': 0,
+    'interview_feedback': 0,
+    'course': 1,
+    'notes': 1,
+    'quiz': 1,
+}
+BACKGROUND = 2
+# Share of each bucket (and of the concurrency cap) a priority must leave free
+RESERVE = {0: 0.0, 1: 0.1, 2: 0.5}
+# Seconds a caller waits for capacity before giving up
+DEADLINES = {0: 10, 1: 30, 2: 120}
+WAIT_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+MAX_POLL_SECONDS = 0.5
+
+_background = contextvars.ContextVar('gemini_background', default=False)
+
+
+class RateLimitTimeout(Exception):
+    """No Gemini capacity became available before the caller's deadline."""
+
+
+def estimate_tokens(prompt, generation_config=None):
+    """Rough prompt + response size: ~4 characters per token plus the output cap."""
+    max_output = (generation_config or {}).get('max_output_tokens', 1024)
+    return len(str(prompt)) // 4 + max_output
+
+
+@contextlib.contextmanager
+def background():
+    """Run the enclosed Gemini calls at background priority."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+def is_rate_limited(exc):
+    return type(exc).__name__ in ('ResourceExhausted', 'TooManyRequests') or '429' in str(exc)
+
+
+class Limiter:
+    def __init__(self, path=None, rpm=None, tpm=None, max_concurrency=None):
+        self.path = path or STATE_PATH
+        self.rpm = RPM if rpm is None else rpm
+        self.tpm = TPM if tpm is None else tpm
+        self.max_concurrency = MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._waits = {}
+        self._counters = {'acquired': 0, 'timeouts': 0, 'throttled': 0}
+
+    # --- shared state ---
+
+    @contextlib.contextmanager
+    def _state(self):
+        """Load, yield and save the shared bucket state under an exclusive lock."""
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                with os.fdopen(os.dup(fd), 'r+') as f:
+                    try:
+                        state = json.loads(f.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    now = _now()
+                    self._refill(state, now)
+                    yield state, now
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+            finally:
+                os.close(fd)
+
+    def _refill(self, state, now):
+        elapsed = max(now - state.get('updated', now), 0)
+        state['requests'] = min(state.get('requests', self.rpm) + elapsed * self.rpm / 60, self.rpm)
+        state['tokens'] = min(state.get('tokens', self.tpm) + elapsed * self.tpm / 60, self.tpm)
+        state['updated'] = now
+        state['inflight'] = {lease: expiry for lease, expiry in state.get('inflight', {}).items() if expiry > now}
+
+    def _try_take(self, state, tokens, priority):
+        """Consume capacity if `priority` may; otherwise return seconds until it might."""
+        reserve = RESERVE[priority]
+        tokens = min(tokens, self.tpm * (1 - reserve))
+        concurrency = max(int(self.max_concurrency * (1 - reserve)), 1)
+        need_requests = min(1 + self.rpm * reserve, self.rpm)
+        need_tokens = min(tokens + self.tpm * reserve, self.tpm)
+
+        if len(state['inflight']) >= concurrency:
+            return MAX_POLL_SECONDS
+        missing = max(
+            (need_requests - state['requests']) * 60 / self.rpm,
+            (need_tokens - state['tokens']) * 60 / self.tpm,
+        )
+        if missing > 0:
+            return missing
+        state['requests'] -= 1
+        state['tokens'] -= tokens
+        return 0
+
+    # --- public API ---
+
+    def acquire(self, call_site, tokens=1, priority=None, deadline=None):
+        """Block until a call may start; returns a lease id for release()."""
+        if priority is None:
+            priority = BACKGROUND if _background.get() else PRIORITIES.get(call_site, 1)
+        deadline = DEADLINES[priority] if deadline is None else deadline
+        start = _monotonic()
+        lease = uuid.uuid4().hex
+        while True:
+            with self._state() as (state, now):
+                wait = self._try_take(state, tokens, priority)
+                if wait == 0:
+                    state['inflight'][lease] = now + LEASE_SECONDS
+            waited = _monotonic() - start
+            if wait == 0:
+                self._record(call_site, waited)
+                return lease
+            if waited >= deadline:
+                with self._stats_lock:
+                    self._counters['timeouts'] += 1
+                logger.warning(f"Gemini limiter: {call_site} gave up after {waited:.1f}s")
+                raise RateLimitTimeout(call_site)
+            _sleep(min(wait, MAX_POLL_SECONDS, deadline - waited))
+
+    def release(self, lease):
+        with self._state() as (state, _):
+            state['inflight'].pop(lease, None)
+
+    def throttled(self):
+        """Gemini answered 429: stop everyone until the request bucket refills a little."""
+        with self._state() as (state, _):
+            state['requests'] = min(state['requests'], 0)
+        with self._stats_lock:
+            self._counters['throttled'] += 1
+
+    @contextlib.contextmanager
+    def slot(self, call_site, tokens=1, priority=None, deadline=None):
+        lease = self.acquire(call_site, tokens, priority, deadline)
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limited(e):
+                self.throttled()
+            raise
+        finally:
+            self.release(lease)
+
+    def _record(self, call_site, waited):
+        waited_ms = waited * 1000
+        label = next((f'<={b}ms' for b in WAIT_BUCKETS_MS if waited_ms <= b), f'>{WAIT_BUCKETS_MS[-1]}ms')
+        with self._stats_lock:
+            self._counters['acquired'] += 1
+            histogram = self._waits.setdefault(call_site, {})
+            histogram[label] = histogram.get(label, 0) + 1
+
+    def stats(self):
+        """Acquired/timeout/429 counts and wait-time histograms per call site (this process)."""
+        with self._stats_lock:
+            counters = dict(self._counters)
+            counters['wait_ms'] = {site: dict(histogram) for site, histogram in self._waits.items()}
+        return counters
+
+
+def _now():
+    return time.time()
+
+
+def _monotonic():
+    return time.monotonic()
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = Limiter()
+    return _limiter
+
+
+def slot(call_site, prompt='', generation_config=None, priority=None, deadline=None):
+    """
+    Context manager around one Gemini call:
+
+        with gemini_limiter.slot('notes', prompt):
+            response = model.generate_content(prompt)
+    """
+    if not ENABLED:
+        return contextlib.nullcontext()
+    return get_limiter().slot(call_site, estimate_tokens(prompt, generation_config), priority, deadline)
+
+
+def stats():
+    return get_limiter().stats() if ENABLED else {}
@@ -4,31 +4,26 @@ Feedback Generator using Gemini API
 Generates structured interview feedback based on conversation transcript.
 """
 
+import importlib.util
 import logging
 import json
 from typing import Dict, List, Any
 
 logger = logging.getLogger(__name__)
 
-# Try to import google.generativeai (fallback for feedback generation)
-try:
-    import google.generativeai as genai
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
+# google.generativeai (fallback for feedback generation) is heavy to import,
+# so only check that it is installed here and import it on first use.
+GENAI_AVAILABLE = importlib.util.find_spec("google.generativeai") is not None
+if not GENAI_AVAILABLE:
     logger.warning("google-generativeai not available for feedback generation")
 
 
-def generate_interview_feedback(
-    summary_prompt: str,
-    api_key: str = None
-) -> Dict[str, Any]:
+def generate_interview_feedback(summary_prompt: str) -> Dict[str, Any]:
     """
     Generate structured interview feedback using Gemini.
     
     Args:
         summary_prompt: Complete prompt with transcript and instructions
-        api_key: Optional Gemini API key (uses env var GEMINI_API_KEY if not provided)
     
     Returns:
         Dictionary with parsed feedback:
@@ -41,33 +36,32 @@ def generate_interview_feedback(
             'problem_solving_score': int (1-10)
         }
     """
-    import os
-    
     if not GENAI_AVAILABLE:
         logger.warning("google-generativeai not available, using defaults")
         return _get_default_feedback()
     
     try:
-        # Configure Gemini
-        api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        from django.conf import settings
+
+        if not settings.GEMINI_API_KEY:
             logger.warning("GEMINI_API_KEY not found, using default feedback")
             return _get_default_feedback()
         
-        genai.configure(api_key=api_key)
-        
-        # Use Gemini Flash for cost-effective text generation
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Generate feedback
-        response = model.generate_content(summary_prompt)
-        
-        if not response or not response.text:
-            logger.error("Empty response from Gemini")
-            return _get_default_feedback()
+        # Use Gemini Flash for cost-effective text generation, through the
+        # shared handle and the SDK client configured once with the settings key
+        from ..services import get_model
+
+        model = get_model('gemini-1.5-flash')
         
-        # Parse the response
-        feedback_text = response.text.strip()
+        # Generate feedback (identical transcripts share a cached response)
+        from ..llm_cache import generate
+
+        def non_empty(text):
+            if not text or not text.strip():
+                raise ValueError("Empty response from Gemini")
+            return text
+
+        feedback_text = generate('interview_feedback', model, summary_prompt, parse=non_empty).strip()
         parsed = _parse_feedback_response(feedback_text)
         
         logger.info("Generated AI feedback successfully")
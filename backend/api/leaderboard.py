@@ -0,0 +1,120 @@
+"""
+Materialized leaderboard.
+
+Scores live in LeaderboardEntry and are adjusted incrementally whenever a
+learner completes a concept or enrolls in / leaves a roadmap, so the
+leaderboard and "my rank" are index lookups instead of per-user COUNTs.
+Ranks themselves are served by api.ranking, which follows these entries.
+The username is copied onto the entry for the (points, username) index
+and follows renames through a User post_save receiver.
+"""
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.db.models import Count, F
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import ConceptProgress, LeaderboardEntry, Roadmap
+
+CONCEPT_POINTS = 10
+ROADMAP_POINTS = 50
+
+# Sent with `entry` (a LeaderboardEntry) whenever a user's score changes.
+points_changed = Signal()
+# Sent after rebuild_all() replaced the whole table.
+leaderboard_rebuilt = Signal()
+
+
+def _adjust(user, concepts=0, roadmaps=0):
+    """Atomically apply a delta to the user's leaderboard entry."""
+    points = concepts * CONCEPT_POINTS + roadmaps * ROADMAP_POINTS
+    updated = LeaderboardEntry.objects.filter(user=user).update(
+        concepts_completed=F('concepts_completed') + concepts,
+        roadmaps_count=F('roadmaps_count') + roadmaps,
+        points=F('points') + points,
+        updated_at=timezone.now(),  # update() skips auto_now; ranking syncs on it
+    )
+    if not updated:
+        # First activity for this user: seed the row from the source tables
+        # so a missed event can never leave the entry permanently behind.
+        rebuild_user(user)
+    elif points_changed.has_listeners():
+        entry = LeaderboardEntry.objects.get(user=user)
+        points_changed.send(sender=LeaderboardEntry, entry=entry)
+
+
+def record_concept_completed(user):
+    _adjust(user, concepts=1)
+
+
+def record_roadmap_created(user):
+    _adjust(user, roadmaps=1)
+
+
+def record_roadmap_deleted(user):
+    _adjust(user, roadmaps=-1)
+
+
+def rebuild_user(user):
+    """Recompute a single user's entry from ConceptProgress and Roadmap."""
+    concepts = ConceptProgress.objects.filter(user=user, completed=True).count()
+    roadmaps = Roadmap.objects.filter(user=user).count()
+    defaults = {
+        'username': user.username,
+        'concepts_completed': concepts,
+        'roadmaps_count': roadmaps,
+        'points': concepts * CONCEPT_POINTS + roadmaps * ROADMAP_POINTS,
+    }
+    try:
+        entry, _ = LeaderboardEntry.objects.update_or_create(user=user, defaults=defaults)
+    except IntegrityError:
+        # A concurrent first activity created the row between our lookup
+        # and insert; it was seeded from the same tables, so just update it
+        entry, _ = LeaderboardEntry.objects.update_or_create(user=user, defaults=defaults)
+    points_changed.send(sender=LeaderboardEntry, entry=entry)
+    return entry
+
+
+def rebuild_all():
+    """
+    Rebuild the whole table from scratch (reconciliation).
+    Uses two grouped queries instead of two COUNTs per user.
+    Returns the number of entries written.
+    """
+    concept_counts = dict(
+        ConceptProgress.objects.filter(completed=True)
+        .values_list('user_id').annotate(n=Count('id'))
+    )
+    roadmap_counts = dict(
+        Roadmap.objects.values_list('user_id').annotate(n=Count('id'))
+    )
+
+    user_ids = set(concept_counts) | set(roadmap_counts)
+    entries = []
+    for user_id, username in User.objects.filter(id__in=user_ids).values_list('id', 'username'):
+        concepts = concept_counts.get(user_id, 0)
+        roadmaps = roadmap_counts.get(user_id, 0)
+        entries.append(LeaderboardEntry(
+            user_id=user_id,
+            username=username,
+            concepts_completed=concepts,
+            roadmaps_count=roadmaps,
+            points=concepts * CONCEPT_POINTS + roadmaps * ROADMAP_POINTS,
+        ))
+
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+    leaderboard_rebuilt.send(sender=LeaderboardEntry)
+    return len(entries)
+
+
+@receiver(post_save, sender=User)
+def _follow_rename(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    renamed = LeaderboardEntry.objects.filter(user=instance).exclude(username=instance.username).update(
+        username=instance.username, updated_at=timezone.now(),
+    )
+    if renamed and points_changed.has_listeners():
+        points_changed.send(sender=LeaderboardEntry, entry=LeaderboardEntry.objects.get(user=instance))
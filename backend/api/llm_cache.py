@@ -0,0 +1,369 @@
+"""
+Content-addressed cache for Gemini responses.
+
+Every Gemini call site (course generation, notes, quizzes, interview
+analysis and feedback) goes through generate() or stream(). The key is a
+SHA-256 of (model name, prompt, generation config), so two requests that
+would send the model exactly the same thing share one response, whichever
+view or worker sends them.
+
+- Storage is pluggable (LLM_CACHE_BACKEND): 'db' (LLMCacheEntry rows,
+  shared by every process; the default), 'file' (one JSON file per key
+  under LLM_CACHE_DIR), 'memory' (per-process LRU) or 'off'.
+- Entries expire after LLM_CACHE_TTL_SECONDS; each backend keeps at most
+  LLM_CACHE_MAX_ENTRIES, evicting the least recently used.
+- bypass=True skips the lookup but stores the new response, so a forced
+  regeneration refreshes the cache. LLM_CACHE_ENABLED=False turns
+  everything off.
+- A response is only stored if `parse` accepts it, so a malformed JSON
+  answer is retried next time instead of being served forever.
+- Each entry remembers how long the model took to produce it; stats()
+  reports hits, misses and the latency saved per call site.
+
+Misses go through gemini_limiter, so cache hits never wait for quota.
+stream() pulls chunks from Gemini on a helper thread that holds the
+limiter slot only until the model is done; the caller can take as long as
+it likes over each chunk (YouTube lookups, DB writes) without keeping a
+slot, or its lease, tied up.
+
+Callers pass the model object, so tests can hand in a fake with a
+`model_name` and a `generate_content` method.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import gemini_limiter
+from .models import LLMCacheEntry
+
+ENABLED = getattr(settings, 'LLM_CACHE_ENABLED', True)
+BACKEND = getattr(settings, 'LLM_CACHE_BACKEND', 'db')
+TTL_SECONDS = getattr(settings, 'LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600)
+MAX_ENTRIES = getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 5000)
+CACHE_DIR = getattr(settings, 'LLM_CACHE_DIR', os.path.join(settings.BASE_DIR, '.llm_cache'))
+
+_lock = threading.Lock()
+_counters = {}
+_backend = None
+
+
+def cache_key(model_name, prompt, generation_config=None):
+    payload = json.dumps([model_name, prompt, generation_config or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MemoryBackend:
+    """Per-process LRU; lost on restart."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = MAX_ENTRIES if max_entries is None else max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict(self, max_entries=None):
+        with self._lock:
+            deleted = 0
+            limit = self.max_entries if max_entries is None else max_entries
+            while len(self._entries) > limit:
+                self._entries.popitem(last=False)
+                deleted += 1
+            return deleted
+
+    def count(self):
+        return len(self._entries)
+
+
+class FileBackend:
+    """One JSON file per key; recency is the file's mtime, refreshed on every hit."""
+
+    def __init__(self, directory=None, max_entries=None):
+        self.directory = directory or CACHE_DIR
+        self.max_entries = MAX_ENTRIES if max_entries is None else max_entries
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def set(self, key, entry):
+        # Write to a temp file and rename, so readers never see half a file
+        tmp = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _files(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+
+    def evict(self, max_entries=None):
+        limit = self.max_entries if max_entries is None else max_entries
+        files = self._files()
+        if len(files) <= limit:
+            return 0
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        deleted = 0
+        for entry in files[:len(files) - limit]:
+            try:
+                os.remove(entry.path)
+                deleted += 1
+            except OSError:
+                pass
+        return deleted
+
+    def count(self):
+        return len(self._files())
+
+
+class DatabaseBackend:
+    """LLMCacheEntry rows, shared by all workers."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = MAX_ENTRIES if max_entries is None else max_entries
+
+    def get(self, key):
+        row = LLMCacheEntry.objects.filter(key=key).first()
+        if row is None:
+            return None
+        LLMCacheEntry.objects.filter(id=row.id).update(last_used_at=timezone.now(), hits=F('hits') + 1)
+        return {'text': row.response, 'latency_ms': row.latency_ms, 'created': row.created_at.timestamp()}
+
+    def set(self, key, entry):
+        values = {
+            'model_name': entry['model'],
+            'call_site': entry['call_site'],
+            'response': entry['text'],
+            'latency_ms': entry['latency_ms'],
+            'created_at': timezone.now(),
+            'last_used_at': timezone.now(),
+        }
+        try:
+            with transaction.atomic():
+                LLMCacheEntry.objects.update_or_create(key=key, defaults=values)
+        except IntegrityError:
+            # A concurrent request stored the same response first
+            LLMCacheEntry.objects.filter(key=key).update(**values)
+        self.evict()
+
+    def delete(self, key):
+        LLMCacheEntry.objects.filter(key=key).delete()
+
+    def evict(self, max_entries=None):
+        limit = self.max_entries if max_entries is None else max_entries
+        deleted, _ = LLMCacheEntry.objects.filter(
+            created_at__lt=timezone.now() - timedelta(seconds=TTL_SECONDS)
+        ).delete()
+        overflow = LLMCacheEntry.objects.count() - limit
+        if overflow > 0:
+            oldest = LLMCacheEntry.objects.order_by('last_used_at').values_list('id', flat=True)[:overflow]
+            deleted += LLMCacheEntry.objects.filter(id__in=list(oldest)).delete()[0]
+        return deleted
+
+    def count(self):
+        return LLMCacheEntry.objects.count()
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'file': FileBackend,
+    'db': DatabaseBackend,
+}
+
+
+def get_backend():
+    """The configured backend, or None when caching is off."""
+    global _backend
+    if _backend is None and ENABLED and BACKEND in BACKENDS:
+        with _lock:
+            if _backend is None:
+                _backend = BACKENDS[BACKEND]()
+    return _backend
+
+
+def _count(call_site, **deltas):
+    with _lock:
+        counters = _counters.setdefault(
+            call_site, {'hits': 0, 'misses': 0, 'bypassed': 0, 'saved_ms': 0, 'model_ms': 0}
+        )
+        for name, delta in deltas.items():
+            counters[name] += delta
+
+
+def _lookup(backend, key):
+    entry = backend.get(key)
+    if entry is None:
+        return None
+    if time.time() - entry['created'] > TTL_SECONDS:
+        backend.delete(key)
+        return None
+    return entry
+
+
+def _store(backend, key, call_site, model_name, text, latency_ms):
+    backend.set(key, {
+        'text': text,
+        'model': model_name,
+        'call_site': call_site,
+        'latency_ms': latency_ms,
+        'created': time.time(),
+    })
+
+
+def generate(call_site, model, prompt, generation_config=None, request_options=None, parse=None, bypass=False):
+    """
+    model.generate_content(prompt, ...) through the cache. Returns the
+    response text, or parse(text) if `parse` is given. Exceptions from the
+    model or from `parse` propagate and nothing is stored.
+    """
+    parse = parse or (lambda text: text)
+    backend = get_backend()
+    key = cache_key(model.model_name, prompt, generation_config)
+
+    if backend and not bypass:
+        entry = _lookup(backend, key)
+        if entry is not None:
+            try:
+                result = parse(entry['text'])
+            except Exception:
+                backend.delete(key)
+            else:
+                _count(call_site, hits=1, saved_ms=entry['latency_ms'])
+                return result
+
+    kwargs = {}
+    if generation_config is not None:
+        kwargs['generation_config'] = generation_config
+    if request_options is not None:
+        kwargs['request_options'] = request_options
+    with gemini_limiter.slot(call_site, prompt, generation_config):
+        start = time.perf_counter()
+        text = model.generate_content(prompt, **kwargs).text
+    latency_ms = int((time.perf_counter() - start) * 1000)
+    result = parse(text)
+
+    _count(call_site, **{'bypassed' if bypass else 'misses': 1, 'model_ms': latency_ms})
+    if backend:
+        _store(backend, key, call_site, model.model_name, text, latency_ms)
+    return result
+
+
+def _pull(call_site, model, prompt, generation_config, kwargs, pulled, cancelled):
+    """Feed ('chunk', text)... then ('done', latency_ms) or ('error', exc) into `pulled`."""
+    try:
+        with gemini_limiter.slot(call_site, prompt, generation_config):
+            start = time.perf_counter()
+            for chunk in model.generate_content(prompt, **kwargs):
+                if cancelled.is_set():
+                    break
+                pulled.put(('chunk', chunk.text))
+        pulled.put(('done', int((time.perf_counter() - start) * 1000)))
+    except Exception as e:
+        pulled.put(('error', e))
+
+
+def stream(call_site, model, prompt, generation_config=None, request_options=None, validate=None, bypass=False):
+    """
+    Streaming variant of generate(): yields text chunks. A cached response
+    is yielded as one chunk. A streamed response is stored only if the
+    stream ran to the end and validate(text) (if given) does not raise.
+    """
+    backend = get_backend()
+    key = cache_key(model.model_name, prompt, generation_config)
+
+    if backend and not bypass:
+        entry = _lookup(backend, key)
+        if entry is not None:
+            _count(call_site, hits=1, saved_ms=entry['latency_ms'])
+            yield entry['text']
+            return
+
+    kwargs = {'stream': True}
+    if generation_config is not None:
+        kwargs['generation_config'] = generation_config
+    if request_options is not None:
+        kwargs['request_options'] = request_options
+    pulled = queue.Queue()
+    cancelled = threading.Event()
+    # copy_context() carries gemini_limiter.background() over to the thread
+    threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(_pull, call_site, model, prompt, generation_config, kwargs, pulled, cancelled),
+        name=f'gemini-stream-{call_site}', daemon=True,
+    ).start()
+    chunks = []
+    try:
+        while True:
+            kind, value = pulled.get()
+            if kind == 'error':
+                raise value
+            if kind == 'done':
+                latency_ms = value
+                break
+            chunks.append(value)
+            yield value
+    finally:
+        cancelled.set()  # the caller stopped early: stop pulling
+
+    _count(call_site, **{'bypassed' if bypass else 'misses': 1, 'model_ms': latency_ms})
+    text = ''.join(chunks)
+    if validate:
+        try:
+            validate(text)
+        except Exception:
+            return
+    if backend:
+        _store(backend, key, call_site, model.model_name, text, latency_ms)
+
+
+def stats():
+    """Per call site: hits, misses, hit ratio and model time saved (ms), for this process."""
+    with _lock:
+        sites = {site: dict(counters) for site, counters in _counters.items()}
+    for counters in sites.values():
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / lookups, 3) if lookups else 0.0
+    return sites
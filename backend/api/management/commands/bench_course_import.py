@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from api import course_import
+from api.models import Chapter, Concept, Course
+
+
+def _tree(chapters, concepts):
+    return {
+        'course': {'title': 'bench-course-import', 'description': 'benchmark'},
+        'chapters': [
+            {'title': f'Chapter {i}', 'concepts': [
+                {'title': f'Concept {i}.{j}', 'description': 'x' * 200,
+                 'video_url': 'https://www.youtube.com/embed/abc', 'duration': 15}
+                for j in range(concepts)
+            ]}
+            for i in range(chapters)
+        ],
+    }
+
+
+def _per_row(tree):
+    """The previous generate_roadmap_ai path: one autocommitted INSERT per row."""
+    course = Course.objects.create(**tree['course'])
+    for i, chapter in enumerate(tree['chapters']):
+        chapter_obj = Chapter.objects.create(course=course, title=chapter['title'], order=i + 1)
+        for j, concept in enumerate(chapter['concepts']):
+            Concept.objects.create(chapter=chapter_obj, order=j + 1, **concept)
+    return course
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-row vs bulk course tree persistence on the configured database (SQLite or Postgres)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chapters', type=int, default=6)
+        parser.add_argument('--concepts', type=int, default=5, help='Concepts per chapter')
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        tree = _tree(options['chapters'], options['concepts'])
+        rows = 1 + options['chapters'] * (1 + options['concepts'])
+        self.stdout.write(f"{connection.vendor}: {options['runs']} courses of {rows} rows each")
+        self.stdout.write(f"{'mode':>10} {'per course':>11} {'inserts':>8}")
+        try:
+            for mode, fn in (('per-row', _per_row), ('bulk', course_import.import_course)):
+                start = time.perf_counter()
+                for _ in range(options['runs']):
+                    fn(tree)
+                elapsed = (time.perf_counter() - start) / options['runs']
+                self.stdout.write(f'{mode:>10} {elapsed * 1000:>9.1f}ms {self._queries(fn, tree):>8}')
+        finally:
+            Course.objects.filter(title='bench-course-import').delete()
+
+    @staticmethod
+    def _queries(fn, tree):
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            fn(tree)
+        return sum(1 for q in ctx.captured_queries if q['sql'].lstrip().upper().startswith('INSERT'))
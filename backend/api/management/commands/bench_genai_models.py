@@ -0,0 +1,55 @@
+import time
+import warnings
+
+from django.core.management.base import BaseCommand
+from api.services import _models, get_genai, get_model
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-call cost of building a GenerativeModel vs the shared handle registry (no network)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=500)
+        parser.add_argument('--model', default='gemini-3-flash-preview')
+
+    def handle(self, *args, **options):
+        warnings.simplefilter('ignore', FutureWarning)
+        genai = get_genai()
+
+        calls, name = options['calls'], options['model']
+
+        def configure_and_build():
+            # What feedback_generator did on every call
+            genai.configure(api_key='bench-key')
+            genai.GenerativeModel(name)
+
+        def build():
+            # What the services did on every call
+            genai.GenerativeModel(name)
+
+        def registry():
+            get_model(name)
+
+        _models.clear()
+        rows = [(label, self._time(fn, calls)) for label, fn in (
+            ('configure + build', configure_and_build),
+            ('build per call', build),
+            ('shared handle', registry),
+        )]
+
+        self.stdout.write(f"{calls} calls to {name} (model setup only, no network)")
+        self.stdout.write(f"{'mode':>18} {'per call':>10}")
+        for label, seconds in rows:
+            self.stdout.write(f'{label:>18} {seconds / calls * 1e6:>8.1f}µs')
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Shared handles save {(rows[1][1] - rows[2][1]) / calls * 1e6:.1f}µs per call "
+            f"({(rows[0][1] - rows[2][1]) / calls * 1e6:.1f}µs vs configure on every call)"
+        ))
+
+    @staticmethod
+    def _time(fn, calls):
+        fn()  # warm up
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        return time.perf_counter() - start
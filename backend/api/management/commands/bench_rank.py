@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from api.ranking import RankIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the in-process rank index (rank / top K / around / update latency)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                            help='Number of synthetic users per run')
+        parser.add_argument('--queries', type=int, default=10_000, help='Operations timed per measurement')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        queries = options['queries']
+
+        self.stdout.write(f"{'users':>10} {'load':>9} {'rank':>9} {'top10':>9} {'around':>9} {'update':>9}")
+        for size in options['sizes']:
+            usernames = [f'user{i}' for i in range(size)]
+            pairs = [(username, rng.randrange(0, 50_000, 10)) for username in usernames]
+
+            index = RankIndex()
+            start = time.perf_counter()
+            index.load(pairs)
+            load_s = time.perf_counter() - start
+
+            sample = [rng.choice(usernames) for _ in range(queries)]
+            rank_us = self._per_op(lambda: [index.rank(u) for u in sample], queries)
+            top_us = self._per_op(lambda: [index.top(10) for _ in range(queries)], queries)
+            around_us = self._per_op(lambda: [index.around(u, 2) for u in sample], queries)
+            update_us = self._per_op(
+                lambda: [index.update(u, rng.randrange(0, 50_000, 10)) for u in sample], queries
+            )
+
+            self.stdout.write(
+                f'{size:>10,} {load_s:>8.2f}s {rank_us:>7.2f}us {top_us:>7.2f}us '
+                f'{around_us:>7.2f}us {update_us:>7.2f}us'
+            )
+
+    @staticmethod
+    def _per_op(fn, count):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) / count * 1e6
@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+from api.services import YouTubeService
+
+
+class _StubYouTubeHandler(BaseHTTPRequestHandler):
+    """Answers /youtube/v3/search like the Data API after a fixed delay."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        query = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+        body = json.dumps({'items': [{
+            'id': {'videoId': f'vid{abs(hash(query)) % 10**8}'},
+            'snippet': {'thumbnails': {'high': {'url': 'https://i.ytimg.com/stub.jpg'}}},
+        }]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark serial vs parallel YouTube enrichment against a local API stub'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concepts', type=int, default=30, help='Searches per roadmap (e.g. 6 chapters x 5)')
+        parser.add_argument('--latency', type=float, default=0.3, help='Stub response time in seconds')
+        parser.add_argument('--workers', type=int, nargs='+', default=[4, 8, 16])
+        parser.add_argument('--deadline', type=float, default=None,
+                            help='Overall deadline (default: YouTubeService.DEADLINE_SECONDS)')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _StubYouTubeHandler)
+        server.latency = options['latency']
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        url = f'http://127.0.0.1:{server.server_port}/youtube/v3/search'
+        queries = [f'concept {i} tutorial' for i in range(options['concepts'])]
+        try:
+            # Measure the API path, not the cache; search_video also prints one
+            # debug line per call, so keep the table readable
+            with mock.patch.object(YouTubeService, 'SEARCH_URL', url), \
+                    mock.patch.object(YouTubeService, 'CACHE_ENABLED', False), mock.patch('builtins.print'):
+                rows = [('serial', *self._time(lambda: [YouTubeService.search_video(q) for q in queries]))]
+                for workers in options['workers']:
+                    rows.append((f'{workers} workers', *self._time(
+                        lambda: YouTubeService.search_videos(queries, max_workers=workers, deadline=options['deadline'])
+                    )))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f"{len(queries)} searches, stub latency {options['latency'] * 1000:.0f}ms")
+        self.stdout.write(f"{'mode':>12} {'total':>9} {'embeds':>7}")
+        for mode, seconds, embeds in rows:
+            self.stdout.write(f'{mode:>12} {seconds:>8.2f}s {embeds:>7}')
+
+    @staticmethod
+    def _time(fn):
+        start = time.perf_counter()
+        results = fn()
+        elapsed = time.perf_counter() - start
+        if isinstance(results, dict):
+            results = list(results.values())
+        return elapsed, sum(1 for r in results if r and '/embed/' in r['video_url'])
@@ -0,0 +1,23 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from api import daily_planner
+
+
+class Command(BaseCommand):
+    help = "Plan the day's DailyTask rows for every active learner (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help='Day to plan, YYYY-MM-DD (default: today)')
+        parser.add_argument('--chunk-size', type=int, default=daily_planner.CHUNK_SIZE,
+                            help='Users planned per query batch')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        users, tasks = daily_planner.plan_day(options['date'], options['chunk_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Planned {tasks} tasks for {users} active users in {elapsed:.2f}s'
+        ))
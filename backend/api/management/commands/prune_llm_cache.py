@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from api import llm_cache
+
+
+class Command(BaseCommand):
+    help = 'Evict expired and least recently used cached Gemini responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-entries', type=int, default=None,
+                            help='Keep at most this many entries (default: LLM_CACHE_MAX_ENTRIES)')
+
+    def handle(self, *args, **options):
+        backend = llm_cache.get_backend()
+        if backend is None:
+            self.stdout.write(self.style.WARNING('LLM cache is disabled'))
+            return
+        deleted = backend.evict(options['max_entries'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Evicted {deleted} entries; {backend.count()} cached ({llm_cache.BACKEND} backend)"
+        ))
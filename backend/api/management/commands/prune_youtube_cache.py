@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from api import youtube_cache
+
+
+class Command(BaseCommand):
+    help = 'Evict expired negative and least recently used YouTube search cache entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-entries', type=int, default=None,
+                            help='Keep at most this many entries (default: YOUTUBE_CACHE_MAX_ENTRIES)')
+
+    def handle(self, *args, **options):
+        deleted = youtube_cache.evict(options['max_entries'])
+        stats = youtube_cache.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Evicted {deleted} entries; {stats['entries']} cached ({stats['negative_entries']} negative)"
+        ))
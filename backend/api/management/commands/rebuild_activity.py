@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from api import activity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyActivity rollup (progress chart / heatmap) from ConceptProgress'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding daily activity rollup...')
+        count = activity.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✅ Daily activity rebuilt: {count} rows'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from api import leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized leaderboard table from ConceptProgress and Roadmap'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding leaderboard...')
+        count = leaderboard.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'✅ Leaderboard rebuilt: {count} entries'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api import roadmap_progress
+from api.models import Course, Roadmap
+
+
+class Command(BaseCommand):
+    help = 'Recount every course\'s chapter sizes and every roadmap\'s completed/total concept counters, progress and resume point'
+
+    def handle(self, *args, **options):
+        before = {
+            roadmap_id: (completed, total)
+            for roadmap_id, completed, total in Roadmap.objects.values_list('id', 'completed_count', 'total_count')
+        }
+        for course_id in Course.objects.values_list('id', flat=True).iterator():
+            roadmap_progress.store_chapter_sizes(course_id)
+        count = roadmap_progress.recount()
+        drifted = sum(
+            1 for roadmap_id, completed, total in Roadmap.objects.values_list('id', 'completed_count', 'total_count')
+            if before.get(roadmap_id) != (completed, total)
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Reconciled {count} roadmaps; {drifted} had drifted'))
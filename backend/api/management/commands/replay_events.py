@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from api import events
+
+
+class Command(BaseCommand):
+    help = 'Rebuild projections (daily_activity, user_progress, leaderboard) from the learning event log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('projections', nargs='*',
+                            help=f"Projections to rebuild (default: all of {', '.join(events.PROJECTORS)})")
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue an interrupted replay after the last learner it rebuilt instead of starting over')
+        parser.add_argument('--batch-size', type=int, default=events.BATCH_SIZE,
+                            help='Events loaded per query while refolding a learner')
+
+    def handle(self, *args, **options):
+        names = options['projections'] or list(events.PROJECTORS)
+        unknown = set(names) - set(events.PROJECTORS)
+        if unknown:
+            raise CommandError(f"Unknown projection(s): {', '.join(sorted(unknown))}")
+
+        for name in names:
+            start = time.perf_counter()
+            applied = events.replay(name, options['batch_size'], options['resume'])
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {name}: replayed {applied} events in {time.perf_counter() - start:.2f}s'
+            ))
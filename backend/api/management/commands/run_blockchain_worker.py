@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from api import blockchain_jobs
+from api.algorand_client import client_stats
+from api.services import get_algorand_service
+
+
+class Command(BaseCommand):
+    help = 'Drain the BlockchainJob outbox (badge/certificate mints and $SKILL rewards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process one batch and exit')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        service = get_algorand_service()
+        if not service or not service.enabled:
+            self.stdout.write(self.style.WARNING('AlgorandService is not enabled — jobs stay queued until it is configured'))
+            return
+
+        self.stdout.write(f'Blockchain worker started (admin {service.admin_address[:8]}...)')
+        while True:
+            succeeded, failed = blockchain_jobs.drain(service, limit=options['batch_size'])
+            if succeeded or failed:
+                self.stdout.write(f'Processed batch: {succeeded} done, {failed} failed')
+                self.stdout.write(f'suggested_params cache: {service.params_cache.stats()}')
+                self.stdout.write(f'algod calls: {client_stats()}')
+            if options['once']:
+                return
+            if not succeeded and not failed:
+                time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from api import notification_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued email and WhatsApp notifications (NotificationLog rows in PENDING)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process one batch and exit')
+        parser.add_argument('--batch-size', type=int, default=50, help='Jobs claimed per channel per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Notification worker started (email x{notification_outbox.EMAIL_CONCURRENCY}, '
+            f'whatsapp x{notification_outbox.WHATSAPP_CONCURRENCY})'
+        )
+        while True:
+            sent, failed = notification_outbox.drain(limit=options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Processed batch: {sent} sent, {failed} failed')
+                self.stdout.write(f'notifications: {notification_outbox.stats()}')
+            if options['once']:
+                return
+            if not sent and not failed:
+                time.sleep(options['interval'])
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from api import gemini_limiter, llm_cache, prefetch, single_flight
+
+
+class Command(BaseCommand):
+    help = 'Generate notes and quizzes for the concepts learners will open next'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process one batch and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Prefetch worker started (concurrency {prefetch.MAX_CONCURRENCY}, '
+            f'daily budget {prefetch.DAILY_BUDGET}, {prefetch.AHEAD} concepts ahead)'
+        )
+        while True:
+            succeeded, failed = prefetch.drain()
+            if succeeded or failed:
+                self.stdout.write(f'Processed batch: {succeeded} done, {failed} failed')
+                self.stdout.write(f'prefetch: {prefetch.stats()}')
+                self.stdout.write(f'single_flight: {single_flight.stats()}')
+                self.stdout.write(f'llm cache: {llm_cache.stats()}')
+                self.stdout.write(f'gemini limiter: {gemini_limiter.stats()}')
+            if options['once']:
+                return
+            if not succeeded and not failed:
+                time.sleep(options['interval'])
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_leaderboard(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    ConceptProgress = apps.get_model('api', 'ConceptProgress')
+    Roadmap = apps.get_model('api', 'Roadmap')
+    LeaderboardEntry = apps.get_model('api', 'LeaderboardEntry')
+
+    concept_counts = dict(
+        ConceptProgress.objects.filter(completed=True).values_list('user_id').annotate(n=models.Count('id'))
+    )
+    roadmap_counts = dict(
+        Roadmap.objects.values_list('user_id').annotate(n=models.Count('id'))
+    )
+    user_ids = set(concept_counts) | set(roadmap_counts)
+    entries = []
+    for user_id, username in User.objects.filter(id__in=user_ids).values_list('id', 'username'):
+        concepts = concept_counts.get(user_id, 0)
+        roadmaps = roadmap_counts.get(user_id, 0)
+        entries.append(LeaderboardEntry(
+            user_id=user_id,
+            username=username,
+            concepts_completed=concepts,
+            roadmaps_count=roadmaps,
+            points=concepts * 10 + roadmaps * 50,
+        ))
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_learnerprofile_pending_skill_tokens'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=150)),
+                ('concepts_completed', models.IntegerField(default=0)),
+                ('roadmaps_count', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-points', 'username'],
+                'indexes': [models.Index(fields=['-points', 'username'], name='leaderboard_points_idx')],
+            },
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
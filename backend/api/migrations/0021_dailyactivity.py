@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_activity(apps, schema_editor):
+    ConceptProgress = apps.get_model('api', 'ConceptProgress')
+    DailyActivity = apps.get_model('api', 'DailyActivity')
+
+    rows = (
+        ConceptProgress.objects.filter(completed=True, completed_at__isnull=False)
+        .annotate(day=TruncDate('completed_at'))
+        .values('user_id', 'day')
+        .annotate(minutes=models.Sum('concept__duration'), count=models.Count('id'))
+    )
+    DailyActivity.objects.bulk_create([
+        DailyActivity(
+            user_id=row['user_id'],
+            date=row['day'],
+            minutes_learned=row['minutes'] or 0,
+            concepts_completed=row['count'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_leaderboardentry_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('minutes_learned', models.IntegerField(default=0)),
+                ('concepts_completed', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Activity',
+                'ordering': ['date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(populate_daily_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_blockchainjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YouTubeSearchCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255, unique=True)),
+                ('video_url', models.URLField(blank=True, max_length=500)),
+                ('thumbnail', models.URLField(blank=True, max_length=500)),
+                ('hits', models.IntegerField(default=0)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'YouTube Search Cache',
+                'ordering': ['-last_used_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_youtubesearchcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='canonical_key',
+            field=models.CharField(blank=True, db_index=True, help_text='Normalized topic|level of an AI-generated course, reused for later requests', max_length=255),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_generationlease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrefetchJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('notes', 'Notes'), ('quiz', 'Quiz')], max_length=10)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('outcome', models.CharField(blank=True, help_text='cached, leader (LLM called), coalesced or busy', max_length=20)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('concept', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prefetch_jobs', to='api.concept')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='prefetchjob_due_idx')],
+                'unique_together': {('concept', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:40
+
+import hashlib
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Stub notes saved with generated courses before real notes existed
+PLACEHOLDER = '*Notes will be generated when you start this lesson.*'
+
+
+def move_notes(apps, schema_editor):
+    Concept = apps.get_model('api', 'Concept')
+    ConceptNotes = apps.get_model('api', 'ConceptNotes')
+
+    rows, ids = [], []
+    for concept_id, notes in Concept.objects.exclude(notes='').values_list('id', 'notes').iterator():
+        if notes.endswith(PLACEHOLDER):
+            continue
+        raw = notes.encode()
+        packed = zlib.compress(raw, 6)
+        rows.append(ConceptNotes(
+            concept_id=concept_id,
+            body=packed if len(packed) < len(raw) else raw,
+            compressed=len(packed) < len(raw),
+            size=len(raw),
+            etag=hashlib.sha256(raw).hexdigest(),
+        ))
+        ids.append(concept_id)
+    ConceptNotes.objects.bulk_create(rows, batch_size=500)
+    Concept.objects.filter(id__in=ids).update(has_notes=True)
+
+
+def restore_notes(apps, schema_editor):
+    Concept = apps.get_model('api', 'Concept')
+    ConceptNotes = apps.get_model('api', 'ConceptNotes')
+
+    for row in ConceptNotes.objects.iterator():
+        body = bytes(row.body)
+        notes = (zlib.decompress(body) if row.compressed else body).decode()
+        Concept.objects.filter(id=row.concept_id).update(notes=notes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_llmcacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConceptNotes',
+            fields=[
+                ('concept', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notes_body', serialize=False, to='api.concept')),
+                ('body', models.BinaryField()),
+                ('compressed', models.BooleanField(default=True)),
+                ('size', models.IntegerField(default=0, help_text='Uncompressed size in bytes')),
+                ('etag', models.CharField(max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='concept',
+            name='has_notes',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(move_notes, restore_notes),
+        migrations.RemoveField(
+            model_name='concept',
+            name='notes',
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def drop_duplicate_tasks(apps, schema_editor):
+    DailyTask = apps.get_model('api', 'DailyTask')
+    keep = (
+        DailyTask.objects.values('user_id', 'concept_id', 'scheduled_date')
+        .annotate(keep_id=models.Min('id'), count=models.Count('id'))
+        .filter(count__gt=1)
+    )
+    for row in keep:
+        DailyTask.objects.filter(
+            user_id=row['user_id'], concept_id=row['concept_id'], scheduled_date=row['scheduled_date'],
+        ).exclude(id=row['keep_id']).delete()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_conceptnotes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_tasks, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='dailytask',
+            unique_together={('user', 'concept', 'scheduled_date')},
+        ),
+        migrations.AddIndex(
+            model_name='dailytask',
+            index=models.Index(fields=['user', 'scheduled_date', 'completed'], name='dailytask_user_day_idx'),
+        ),
+    ]
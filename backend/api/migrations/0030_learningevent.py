@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:51
+
+from datetime import datetime, time, timezone
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_events(apps, schema_editor):
+    """Turn the existing progress rows into events, oldest first, so a replay reproduces today's tables."""
+    ConceptProgress = apps.get_model('api', 'ConceptProgress')
+    AssessmentResult = apps.get_model('api', 'AssessmentResult')
+    Roadmap = apps.get_model('api', 'Roadmap')
+    DailyTask = apps.get_model('api', 'DailyTask')
+    LearningEvent = apps.get_model('api', 'LearningEvent')
+
+    events = [
+        LearningEvent(
+            user_id=user_id, kind='concept_completed', object_id=concept_id, occurred_at=completed_at,
+            data={'minutes': minutes, 'course': course_id},
+        )
+        for user_id, concept_id, completed_at, minutes, course_id in ConceptProgress.objects.filter(
+            completed=True, completed_at__isnull=False
+        ).values_list('user_id', 'concept_id', 'completed_at', 'concept__duration', 'concept__chapter__course_id')
+    ]
+    events += [
+        LearningEvent(
+            user_id=user_id, kind='assessment_submitted', object_id=result_id, occurred_at=completed_at,
+            data={'concept': concept_id, 'score': score},
+        )
+        for result_id, user_id, completed_at, concept_id, score in AssessmentResult.objects.values_list(
+            'id', 'user_id', 'completed_at', 'assessment__concept_id', 'score'
+        )
+    ]
+    events += [
+        LearningEvent(user_id=user_id, kind='roadmap_started', object_id=course_id, occurred_at=started_at)
+        for user_id, course_id, started_at in Roadmap.objects.values_list('user_id', 'course_id', 'started_at')
+    ]
+    # Tasks have no completion time; their scheduled day is the best we know
+    events += [
+        LearningEvent(
+            user_id=user_id, kind='task_completed', object_id=task_id,
+            occurred_at=datetime.combine(day, time.min, tzinfo=timezone.utc), data={'concept': concept_id},
+        )
+        for task_id, user_id, day, concept_id in DailyTask.objects.filter(completed=True).values_list(
+            'id', 'user_id', 'scheduled_date', 'concept_id'
+        )
+    ]
+    events.sort(key=lambda event: event.occurred_at)
+    LearningEvent.objects.bulk_create(events, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_dailytask_unique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('high_water_id', models.BigIntegerField(default=0, help_text='Replay stops at this event id')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LearningEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('concept_completed', 'Concept completed'), ('assessment_submitted', 'Assessment submitted'), ('task_completed', 'Daily task completed'), ('roadmap_started', 'Roadmap started'), ('roadmap_removed', 'Roadmap removed')], max_length=30)),
+                ('object_id', models.BigIntegerField(blank=True, help_text='Concept, AssessmentResult, DailyTask or Course id', null=True)),
+                ('data', models.JSONField(blank=True, default=dict, help_text='Values the projections need, e.g. minutes')),
+                ('occurred_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='learning_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['user', 'id'], name='learningevent_user_idx')],
+            },
+        ),
+        migrations.RunPython(seed_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:54
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+def count_concepts(apps, schema_editor):
+    Roadmap = apps.get_model('api', 'Roadmap')
+    Chapter = apps.get_model('api', 'Chapter')
+    Concept = apps.get_model('api', 'Concept')
+    ConceptProgress = apps.get_model('api', 'ConceptProgress')
+
+    total = (
+        Concept.objects.filter(chapter__course_id=OuterRef('course_id'))
+        .order_by().values('chapter__course_id').annotate(n=Count('id')).values('n')
+    )
+    completed = (
+        ConceptProgress.objects.filter(
+            user_id=OuterRef('user_id'), concept__chapter__course_id=OuterRef('course_id'), completed=True
+        )
+        .order_by().values('user_id').annotate(n=Count('id')).values('n')
+    )
+    Roadmap.objects.update(
+        total_count=Coalesce(Subquery(total, output_field=models.IntegerField()), 0),
+        completed_count=Coalesce(Subquery(completed, output_field=models.IntegerField()), 0),
+    )
+    Roadmap.objects.update(progress=Case(
+        When(total_count__gt=0, then=F('completed_count') * 100 / F('total_count')), default=Value(0)
+    ))
+
+    # Resume point: the completed_count-th concept in learning order
+    sizes_by_course = {}
+    for roadmap_id, course_id, completed_count in Roadmap.objects.values_list('id', 'course_id', 'completed_count'):
+        if course_id not in sizes_by_course:
+            sizes_by_course[course_id] = list(
+                Chapter.objects.filter(course_id=course_id).annotate(size=Count('concepts'))
+                .order_by('order', 'id').values_list('size', flat=True)
+            )
+        index, position = completed_count, None
+        for chapter_index, size in enumerate(sizes_by_course[course_id]):
+            if size:
+                position = (chapter_index, min(index, size - 1))
+                if index < size:
+                    break
+                index -= size
+        if position:
+            Roadmap.objects.filter(id=roadmap_id).update(current_chapter=position[0], current_concept=position[1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_learningevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roadmap',
+            name='completed_count',
+            field=models.IntegerField(default=0, help_text='Concepts of the course the user completed'),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='total_count',
+            field=models.IntegerField(default=0, help_text='Concepts in the course'),
+        ),
+        migrations.RunPython(count_concepts, migrations.RunPython.noop),
+    ]
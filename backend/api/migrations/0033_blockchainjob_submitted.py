@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockchainjob',
+            name='submitted',
+            field=models.JSONField(blank=True, default=dict, help_text='Transaction sent but not known to be confirmed: txid, last_valid round'),
+        ),
+    ]
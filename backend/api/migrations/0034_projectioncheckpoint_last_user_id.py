@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_blockchainjob_submitted'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='projectioncheckpoint',
+            name='high_water_id',
+        ),
+        migrations.RenameField(
+            model_name='projectioncheckpoint',
+            old_name='last_event_id',
+            new_name='last_user_id',
+        ),
+        migrations.AlterField(
+            model_name='projectioncheckpoint',
+            name='last_user_id',
+            field=models.BigIntegerField(default=0, help_text='Replay resumes after this user id'),
+        ),
+    ]
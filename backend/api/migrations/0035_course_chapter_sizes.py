@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def store_chapter_sizes(apps, schema_editor):
+    Course = apps.get_model('api', 'Course')
+    Chapter = apps.get_model('api', 'Chapter')
+
+    for course_id in Course.objects.values_list('id', flat=True).iterator():
+        sizes = list(
+            Chapter.objects.filter(course_id=course_id).annotate(size=Count('concepts'))
+            .order_by('order', 'id').values_list('size', flat=True)
+        )
+        Course.objects.filter(id=course_id).update(chapter_sizes=sizes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_projectioncheckpoint_last_user_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='chapter_sizes',
+            field=models.JSONField(blank=True, default=list, help_text='Concepts per chapter, in learning order'),
+        ),
+        migrations.RunPython(store_chapter_sizes, migrations.RunPython.noop),
+    ]
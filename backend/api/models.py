@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class LearnerProfile(models.Model):
@@ -57,6 +58,9 @@ class Course(models.Model):
     difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES, default='beginner')
     estimated_hours = models.IntegerField(default=10)
     tags = models.JSONField(default=list, blank=True)  # e.g., ['React', 'JavaScript']
+    canonical_key = models.CharField(max_length=255, blank=True, db_index=True, help_text="Normalized topic|level of an AI-generated course, reused for later requests")
+    # Kept in step by api.roadmap_progress
+    chapter_sizes = models.JSONField(default=list, blank=True, help_text="Concepts per chapter, in learning order")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -99,7 +103,7 @@ class Concept(models.Model):
     description = models.TextField(blank=True)
     duration = models.IntegerField(default=15)  # Minutes
     video_url = models.URLField(blank=True)
-    notes = models.TextField(blank=True)  # Markdown content
+    has_notes = models.BooleanField(default=False)  # Markdown notes live in ConceptNotes
     content_type = models.CharField(max_length=20, choices=CONTENT_TYPES, default='video')
     order = models.IntegerField(default=0)
 
@@ -110,6 +114,23 @@ class Concept(models.Model):
         ordering = ['order']
 
 
+class ConceptNotes(models.Model):
+    """
+    Markdown study notes for a concept, kept out of the Concept row so
+    course trees never read them. The body is zlib-compressed when that
+    makes it smaller. Read and written through api.concept_content.
+    """
+    concept = models.OneToOneField(Concept, on_delete=models.CASCADE, primary_key=True, related_name='notes_body')
+    body = models.BinaryField()
+    compressed = models.BooleanField(default=True)
+    size = models.IntegerField(default=0, help_text="Uncompressed size in bytes")
+    etag = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Notes for concept {self.concept_id} ({self.size} bytes)"
+
+
 class Roadmap(models.Model):
     """
     Represents a user's enrollment in a course with progress tracking.
@@ -117,6 +138,9 @@ class Roadmap(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='roadmaps')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='roadmaps')
     progress = models.IntegerField(default=0)  # Percentage 0-100
+    # Kept in step by api.roadmap_progress; progress = completed_count * 100 // total_count
+    completed_count = models.IntegerField(default=0, help_text="Concepts of the course the user completed")
+    total_count = models.IntegerField(default=0, help_text="Concepts in the course")
     current_chapter = models.IntegerField(default=0)
     current_concept = models.IntegerField(default=0)
     started_at = models.DateTimeField(auto_now_add=True)
@@ -198,6 +222,11 @@ class DailyTask(models.Model):
 
     class Meta:
         ordering = ['scheduled_date']
+        # The nightly planner and the on-demand fallback may both plan a user
+        unique_together = ['user', 'concept', 'scheduled_date']
+        indexes = [
+            models.Index(fields=['user', 'scheduled_date', 'completed'], name='dailytask_user_day_idx'),
+        ]
 
 
 class Notification(models.Model):
@@ -242,6 +271,225 @@ class UserProgress(models.Model):
         return f"{self.user.username}'s Progress"
 
 
+class LeaderboardEntry(models.Model):
+    """
+    Denormalized leaderboard score for a user.
+    points = concepts_completed * 10 + roadmaps_count * 50, kept up to date
+    incrementally by api.leaderboard (rebuild with `manage.py rebuild_leaderboard`).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='leaderboard_entry')
+    username = models.CharField(max_length=150)  # Copied from User for the (points, username) index
+    concepts_completed = models.IntegerField(default=0)
+    roadmaps_count = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Delta sync for api.ranking
+
+    def __str__(self):
+        return f"{self.username} - {self.points} pts"
+
+    class Meta:
+        ordering = ['-points', 'username']
+        indexes = [
+            models.Index(fields=['-points', 'username'], name='leaderboard_points_idx'),
+        ]
+
+
+class DailyActivity(models.Model):
+    """
+    Per-day learning rollup for a user, maintained at write time by
+    api.activity. Serves the 7-day progress chart and the activity heatmap.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+    date = models.DateField()
+    minutes_learned = models.IntegerField(default=0)
+    concepts_completed = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date}: {self.concepts_completed} concepts"
+
+    class Meta:
+        unique_together = ['user', 'date']
+        ordering = ['date']
+        verbose_name_plural = 'Daily Activity'
+
+
+class LearningEvent(models.Model):
+    """
+    Append-only log of learner progress, written by the progress endpoints.
+    The summary tables (DailyActivity, UserProgress, LeaderboardEntry) are
+    projections of it: updated per event by api.events and rebuildable
+    with `manage.py replay_events`. Rows are never updated or deleted.
+    """
+    KIND_CHOICES = [
+        ('concept_completed', 'Concept completed'),
+        ('assessment_submitted', 'Assessment submitted'),
+        ('task_completed', 'Daily task completed'),
+        ('roadmap_started', 'Roadmap started'),
+        ('roadmap_removed', 'Roadmap removed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='learning_events')
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField(null=True, blank=True, help_text="Concept, AssessmentResult, DailyTask or Course id")
+    data = models.JSONField(default=dict, blank=True, help_text="Values the projections need, e.g. minutes")
+    occurred_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind} {self.object_id} @ {self.occurred_at:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='learningevent_user_idx'),
+        ]
+
+
+class ProjectionCheckpoint(models.Model):
+    """Last user rebuilt by an interrupted or finished replay of a projection."""
+    name = models.CharField(max_length=50, unique=True)
+    last_user_id = models.BigIntegerField(default=0, help_text="Replay resumes after this user id")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ user {self.last_user_id}"
+
+
+class BlockchainJob(models.Model):
+    """
+    Outbox entry for an Algorand action (badge mint, certificate mint or
+    $SKILL reward). Views enqueue jobs; `manage.py run_blockchain_worker`
+    drains them so HTTP requests never wait for on-chain confirmation.
+    """
+    KIND_CHOICES = [
+        ('reward', '$SKILL Reward'),
+        ('badge', 'Skill Badge NFT'),
+        ('certificate', 'Certificate NFT'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blockchain_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    idempotency_key = models.CharField(max_length=150, unique=True, help_text="user:reason:object — one job per rewarded action")
+    wallet = models.CharField(max_length=58)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    submitted = models.JSONField(
+        default=dict, blank=True,
+        help_text="Transaction sent but not known to be confirmed: txid, last_valid round",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.idempotency_key} [{self.status}]"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='blockchainjob_due_idx'),
+        ]
+
+
+class YouTubeSearchCache(models.Model):
+    """
+    Cached YouTube Data API search for a normalized query (see
+    api.youtube_cache). An empty video_url is a negative entry: the
+    API returned no results for that query.
+    """
+    query = models.CharField(max_length=255, unique=True)
+    video_url = models.URLField(max_length=500, blank=True)
+    thumbnail = models.URLField(max_length=500, blank=True)
+    hits = models.IntegerField(default=0)
+    fetched_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.query} -> {self.video_url or '(no results)'}"
+
+    class Meta:
+        ordering = ['-last_used_at']
+        verbose_name_plural = 'YouTube Search Cache'
+
+
+class GenerationLease(models.Model):
+    """
+    Single-flight lock for an expensive on-demand generation, e.g. the
+    notes for one concept (see api.single_flight). Other requests for the
+    same key wait for the holder's result instead of calling the LLM too.
+    """
+    key = models.CharField(max_length=150, unique=True)
+    owner = models.CharField(max_length=64)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} ({self.owner})"
+
+
+class LLMCacheEntry(models.Model):
+    """
+    A cached Gemini response, keyed by a hash of (model, prompt, generation
+    config). Used by the 'db' backend of api.llm_cache.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    model_name = models.CharField(max_length=100)
+    call_site = models.CharField(max_length=50)
+    response = models.TextField()
+    latency_ms = models.IntegerField(default=0, help_text="How long the model took to produce this response")
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.call_site} {self.key[:12]} ({self.hits} hits)"
+
+
+class PrefetchJob(models.Model):
+    """
+    Speculative generation of a concept's notes or quiz before the learner
+    opens it. Enqueued by mark_concept_complete for the next few concepts;
+    `manage.py run_prefetch_worker` drains the queue (see api.prefetch).
+    """
+    KIND_CHOICES = [
+        ('notes', 'Notes'),
+        ('quiz', 'Quiz'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    concept = models.ForeignKey(Concept, on_delete=models.CASCADE, related_name='prefetch_jobs')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    outcome = models.CharField(max_length=20, blank=True, help_text="cached, leader (LLM called), coalesced or busy")
+    started_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} for concept {self.concept_id} [{self.status}]"
+
+    class Meta:
+        ordering = ['created_at']
+        unique_together = ['concept', 'kind']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='prefetchjob_due_idx'),
+        ]
+
+
 class Lab(models.Model):
     """
     Stores user's code labs (saved playgrounds).
@@ -283,12 +531,16 @@ class StudySession(models.Model):
 class NotificationLog(models.Model):
     """
     Logs backend notifications sent via Email or WhatsApp.
+    Queued notifications (api.notification_outbox) are PENDING rows that
+    the notification worker sends and marks SENT or FAILED.
     """
     TYPE_CHOICES = [
         ('EMAIL', 'Email'),
         ('WHATSAPP', 'WhatsApp')
     ]
     STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
         ('SENT', 'Sent'),
         ('FAILED', 'Failed')
     ]
@@ -299,11 +551,22 @@ class NotificationLog(models.Model):
     recipient = models.CharField(max_length=255)   # Email or Phone Number
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='SENT')
     error_message = models.TextField(blank=True, null=True)
+    payload = models.JSONField(default=dict, blank=True, help_text="Queued message: subject/body and attachment name/type")
+    attachment = models.BinaryField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.notification_type} - {self.event_name} - {self.user.username}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'notification_type', 'next_attempt_at'], name='notification_due_idx'),
+        ]
+
 
 class MentorProfile(models.Model):
     """
@@ -0,0 +1,242 @@
+"""
+Notification outbox.
+
+Views used to send the course-completion and certificate notifications
+inline: an SMTP login plus a Twilio API call (and a fresh Twilio client)
+inside the request. They now call queue_email() / queue_whatsapp(),
+which only write a PENDING NotificationLog row; `manage.py
+run_notification_worker` sends them.
+
+The worker drains each channel separately:
+
+- Email: claimed jobs are split into at most EMAIL_CONCURRENCY chunks and
+  each chunk is sent over one SMTP connection (get_connection()), so a
+  batch pays for the handshake/login once per chunk, not per message.
+  A message that fails closes the connection; the next one reopens it.
+- WhatsApp: at most WHATSAPP_CONCURRENCY messages are in flight, all
+  through the process-wide Twilio client (utils.notifications), which
+  keeps its HTTP session alive between messages.
+
+Threads only talk to the network; claiming and recording outcomes happen
+in the worker thread. Failed sends are retried with exponential backoff
+and marked FAILED after MAX_ATTEMPTS. A SENDING row whose worker died is
+released after LEASE_SECONDS, so a message can (rarely) go out twice but
+is never lost.
+
+For local runs point EMAIL_HOST/EMAIL_PORT at a debug SMTP server
+(EMAIL_USE_TLS=False) and TWILIO_API_URL at a fake Twilio endpoint.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import NotificationLog
+from .utils.notifications import deliver_email, deliver_whatsapp, whatsapp_number
+
+logger = logging.getLogger(__name__)
+
+EMAIL_CONCURRENCY = getattr(settings, 'NOTIFY_EMAIL_CONCURRENCY', 2)
+WHATSAPP_CONCURRENCY = getattr(settings, 'NOTIFY_WHATSAPP_CONCURRENCY', 4)
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# A SENDING row older than this belongs to a crashed worker
+LEASE_SECONDS = 300
+
+_lock = threading.Lock()
+_counters = {'queued': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'smtp_connections': 0}
+
+
+def _count(**deltas):
+    with _lock:
+        for name, delta in deltas.items():
+            _counters[name] += delta
+
+
+def queue_email(user, subject, message, attachment=None):
+    """
+    Queue an email to the user. Attachment format:
+    ('filename.pdf', content, 'application/pdf'). Returns the NotificationLog
+    row, or False if the user has no email address.
+    """
+    if not user.email:
+        logger.info(f"Not queueing email '{subject}' for {user}: no email address")
+        return False
+    payload = {'subject': subject, 'body': message}
+    content = None
+    if attachment:
+        name, content, mimetype = attachment
+        payload.update(attachment_name=name, attachment_type=mimetype)
+    job = NotificationLog.objects.create(
+        user=user,
+        notification_type='EMAIL',
+        event_name=subject[:100],
+        recipient=user.email,
+        status='PENDING',
+        payload=payload,
+        attachment=content,
+        next_attempt_at=timezone.now(),
+    )
+    _count(queued=1)
+    return job
+
+
+def queue_whatsapp(user, message_body):
+    """Queue a WhatsApp message. Returns the row, or False if the user has no number."""
+    phone_number = whatsapp_number(user)
+    if not phone_number:
+        logger.info(f"Not queueing WhatsApp message for {user}: no phone number")
+        return False
+    job = NotificationLog.objects.create(
+        user=user,
+        notification_type='WHATSAPP',
+        event_name="WhatsApp Message",
+        recipient=phone_number,
+        status='PENDING',
+        payload={'body': message_body},
+        next_attempt_at=timezone.now(),
+    )
+    _count(queued=1)
+    return job
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def release_abandoned():
+    """Return SENDING rows whose lease expired to the queue. Returns the count."""
+    cutoff = timezone.now() - timedelta(seconds=LEASE_SECONDS)
+    return NotificationLog.objects.filter(status='SENDING', locked_at__lt=cutoff).update(
+        status='PENDING', locked_at=None, next_attempt_at=timezone.now()
+    )
+
+
+def claim_due(channel, limit=50):
+    """
+    Claim up to `limit` due jobs of `channel` ('EMAIL' or 'WHATSAPP'). Each
+    claim is a conditional UPDATE, so two workers never send the same row.
+    """
+    now = timezone.now()
+    due_ids = list(
+        NotificationLog.objects.filter(status='PENDING', notification_type=channel, next_attempt_at__lte=now)
+        .order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+    )
+    claimed = [
+        job_id for job_id in due_ids
+        if NotificationLog.objects.filter(id=job_id, status='PENDING').update(
+            status='SENDING', locked_at=now, attempts=F('attempts') + 1
+        )
+    ]
+    return list(NotificationLog.objects.filter(id__in=claimed).order_by('id'))
+
+
+def _send_emails(jobs):
+    """Send a chunk of email jobs over one SMTP connection. Returns [(job, error)]."""
+    connection = get_connection()
+    results = []
+    try:
+        for job in jobs:
+            p = job.payload
+            attachment = None
+            if job.attachment is not None:
+                attachment = (p.get('attachment_name'), bytes(job.attachment), p.get('attachment_type'))
+            try:
+                # No-op while the session is up; reconnects after a failure
+                if connection.open():
+                    _count(smtp_connections=1)
+                deliver_email(job.recipient, p['subject'], p['body'], attachment, connection=connection)
+                results.append((job, None))
+            except Exception as e:
+                connection.close()
+                results.append((job, e))
+    finally:
+        connection.close()
+    return results
+
+
+def _send_whatsapps(jobs):
+    results = []
+    for job in jobs:
+        try:
+            deliver_whatsapp(job.recipient, job.payload['body'])
+            results.append((job, None))
+        except Exception as e:
+            results.append((job, e))
+    return results
+
+
+CHANNELS = {
+    'EMAIL': _send_emails,
+    'WHATSAPP': _send_whatsapps,
+}
+
+
+def _concurrency(channel):
+    return EMAIL_CONCURRENCY if channel == 'EMAIL' else WHATSAPP_CONCURRENCY
+
+
+def _record(job, error):
+    """Store the outcome of one send. Returns True if it was delivered."""
+    job.locked_at = None
+    if error is None:
+        job.status = 'SENT'
+        job.sent_at = timezone.now()
+        job.error_message = None
+        job.attachment = None  # sent; no need to keep the PDF
+        job.save(update_fields=['status', 'sent_at', 'error_message', 'attachment', 'locked_at'])
+        _count(sent=1)
+        return True
+
+    job.error_message = str(error)[:2000]
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = 'FAILED'
+        _count(failed=1)
+        logger.error(f"{job.notification_type} to {job.recipient} failed permanently: {error}")
+    else:
+        job.status = 'PENDING'
+        job.next_attempt_at = timezone.now() + _backoff(job.attempts)
+        _count(retried=1)
+        logger.warning(f"{job.notification_type} to {job.recipient} attempt {job.attempts} failed: {error}")
+    job.save(update_fields=['status', 'error_message', 'next_attempt_at', 'locked_at'])
+    return False
+
+
+def drain_channel(channel, limit=50):
+    """Send one batch of due jobs of `channel`. Returns (sent, failed)."""
+    send = CHANNELS[channel]
+    jobs = claim_due(channel, limit)
+    if not jobs:
+        return 0, 0
+    workers = max(1, min(_concurrency(channel), len(jobs)))
+    chunks = [jobs[i::workers] for i in range(workers)]
+    if workers == 1:
+        results = send(jobs)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'notify-{channel.lower()}') as pool:
+            results = [result for chunk in pool.map(send, chunks) for result in chunk]
+    outcomes = [_record(job, error) for job, error in results]
+    return outcomes.count(True), outcomes.count(False)
+
+
+def drain(limit=50):
+    """Send one batch per channel. Returns (sent, failed) over all channels."""
+    release_abandoned()
+    sent = failed = 0
+    for channel in CHANNELS:
+        channel_sent, channel_failed = drain_channel(channel, limit)
+        sent += channel_sent
+        failed += channel_failed
+    return sent, failed
+
+
+def stats():
+    """Counters for this process."""
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,218 @@
+"""
+Speculative prefetch of notes and quizzes.
+
+Notes and quizzes are generated on first open, which makes every new
+lesson start with a multi-second Gemini call. When a learner completes a
+concept, enqueue_after() queues PrefetchJob rows for the next
+PREFETCH_AHEAD concepts of the course (chapter order, then concept
+order); `manage.py run_prefetch_worker` generates them in the background
+so the next lesson opens straight from the database.
+
+Prefetching is speculative, so it is capped harder than the on-click path:
+
+- PREFETCH_MAX_CONCURRENCY: RUNNING jobs across all workers.
+- PREFETCH_DAILY_BUDGET: prefetch jobs that may call the model per day
+  (UTC). Jobs that did not call it (outcome 'cached', 'coalesced' or
+  'busy') do not count. Once the budget is spent jobs stay queued until tomorrow.
+- A failed job is not retried; the lesson simply generates on open.
+- A quiz is written from the concept's notes, so a quiz job is not
+  claimed while the same concept's notes job is still pending or running.
+- Its Gemini calls run at background priority in gemini_limiter, so
+  they leave half the quota to learners and interviews.
+
+Generation goes through concept_content, i.e. the same single_flight keys
+as the views, so a learner who opens the lesson while its prefetch runs
+waits for that result instead of calling the model again. Conversely the
+worker does not wait for a learner's generation in progress: the job is
+recorded with outcome 'busy'.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from . import concept_content, gemini_limiter, single_flight
+from .models import Assessment, Concept, PrefetchJob
+
+logger = logging.getLogger(__name__)
+
+AHEAD = getattr(settings, 'PREFETCH_AHEAD', 2)
+MAX_CONCURRENCY = getattr(settings, 'PREFETCH_MAX_CONCURRENCY', 2)
+DAILY_BUDGET = getattr(settings, 'PREFETCH_DAILY_BUDGET', 500)
+# A RUNNING job older than this belongs to a crashed worker
+LEASE_SECONDS = 300
+
+_lock = threading.Lock()
+_counters = {'enqueued': 0, 'generated': 0, 'cached': 0, 'busy': 0, 'failed': 0, 'budget_exhausted': 0}
+
+
+def _count(**deltas):
+    with _lock:
+        for name, delta in deltas.items():
+            _counters[name] += delta
+
+
+def upcoming_concepts(concept, k):
+    """The next `k` concepts of the course after `concept`, in learning order."""
+    chapter = concept.chapter
+    return list(
+        Concept.objects.filter(chapter__course_id=chapter.course_id)
+        .filter(
+            Q(chapter__order__gt=chapter.order)
+            | Q(chapter_id=chapter.id, order__gt=concept.order)
+        )
+        .only('id', 'has_notes')
+        .order_by('chapter__order', 'chapter_id', 'order', 'id')[:k]
+    )
+
+
+def enqueue_after(concept, k=None):
+    """
+    Queue notes/quiz generation for the `k` concepts following `concept`
+    that do not have them yet. Safe to call repeatedly. Returns the number
+    of jobs queued.
+    """
+    k = AHEAD if k is None else k
+    if k <= 0:
+        return 0
+    upcoming = upcoming_concepts(concept, k)
+    if not upcoming:
+        return 0
+
+    with_quiz = set(
+        Assessment.objects.filter(concept__in=upcoming).exclude(questions=[])
+        .values_list('concept_id', flat=True)
+    )
+    jobs = []
+    for next_concept in upcoming:
+        if not next_concept.has_notes:
+            jobs.append(PrefetchJob(concept=next_concept, kind='notes'))
+        if next_concept.id not in with_quiz:
+            jobs.append(PrefetchJob(concept=next_concept, kind='quiz'))
+    if not jobs:
+        return 0
+
+    existing = set(
+        PrefetchJob.objects.filter(concept__in=upcoming).values_list('concept_id', 'kind')
+    )
+    jobs = [job for job in jobs if (job.concept_id, job.kind) not in existing]
+    # A concurrent completion may queue the same job; the unique constraint keeps one
+    PrefetchJob.objects.bulk_create(jobs, ignore_conflicts=True)
+    _count(enqueued=len(jobs))
+    return len(jobs)
+
+
+def _today_start(now):
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def budget_left(now=None):
+    """Model calls the prefetcher may still make today."""
+    now = now or timezone.now()
+    spent = PrefetchJob.objects.filter(started_at__gte=_today_start(now)).exclude(
+        outcome__in=['cached', 'coalesced', 'busy']
+    ).count()
+    return max(DAILY_BUDGET - spent, 0)
+
+
+def release_abandoned():
+    """Give up on RUNNING jobs whose worker died. Returns the count."""
+    cutoff = timezone.now() - timedelta(seconds=LEASE_SECONDS)
+    return PrefetchJob.objects.filter(status='RUNNING', started_at__lt=cutoff).update(
+        status='FAILED', last_error='abandoned by worker'
+    )
+
+
+def claim(limit):
+    """
+    Claim up to `limit` pending jobs, oldest first, within the concurrency
+    and daily budget caps. Quiz jobs wait for their concept's notes job.
+    Each claim is a conditional UPDATE, so two workers can never run the
+    same job.
+    """
+    now = timezone.now()
+    running = PrefetchJob.objects.filter(status='RUNNING').count()
+    slots = min(limit, MAX_CONCURRENCY - running)
+    if slots <= 0:
+        return []
+    left = budget_left(now)
+    if left <= 0:
+        if PrefetchJob.objects.filter(status='PENDING').exists():
+            _count(budget_exhausted=1)
+        return []
+
+    notes_in_flight = PrefetchJob.objects.filter(
+        concept_id=OuterRef('concept_id'), kind='notes', status__in=['PENDING', 'RUNNING']
+    )
+    pending_ids = list(
+        PrefetchJob.objects.filter(status='PENDING')
+        .filter(~Q(kind='quiz') | ~Exists(notes_in_flight))
+        .order_by('created_at', 'id').values_list('id', flat=True)[:min(slots, left)]
+    )
+    claimed = [
+        job_id for job_id in pending_ids
+        if PrefetchJob.objects.filter(id=job_id, status='PENDING').update(status='RUNNING', started_at=now)
+    ]
+    return list(PrefetchJob.objects.filter(id__in=claimed).select_related('concept'))
+
+
+def run_job(job):
+    """Generate one claimed job's content and record the outcome. Returns True on success."""
+    try:
+        # Learners' own requests and interviews get Gemini quota first
+        with gemini_limiter.background():
+            if job.kind == 'notes':
+                _, outcome = concept_content.get_notes(job.concept, wait_seconds=0)
+            else:
+                assessment, outcome = concept_content.get_quiz(job.concept, wait_seconds=0)
+                if assessment is None:
+                    raise RuntimeError('model returned no quiz questions')
+    except single_flight.SingleFlightTimeout:
+        # A learner is generating it right now
+        outcome = 'busy'
+    except Exception as e:
+        job.status = 'FAILED'
+        job.last_error = str(e)[:2000]
+        job.save(update_fields=['status', 'last_error', 'updated_at'])
+        _count(failed=1)
+        logger.warning(f"Prefetch of {job.kind} for concept {job.concept_id} failed: {e}")
+        return False
+
+    job.status = 'DONE'
+    job.outcome = outcome
+    job.save(update_fields=['status', 'outcome', 'updated_at'])
+    _count(**{'generated' if outcome == 'leader' else 'busy' if outcome == 'busy' else 'cached': 1})
+    return True
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        connections.close_all()
+
+
+def drain(limit=None):
+    """Run one batch of pending jobs concurrently. Returns (succeeded, failed)."""
+    release_abandoned()
+    jobs = claim(MAX_CONCURRENCY if limit is None else limit)
+    if len(jobs) <= 1:
+        results = [run_job(job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix='prefetch') as pool:
+            results = list(pool.map(_run_in_thread, jobs))
+    return results.count(True), results.count(False)
+
+
+def stats():
+    """Counters for this process plus the queue depth and today's remaining budget."""
+    with _lock:
+        counters = dict(_counters)
+    counters['pending'] = PrefetchJob.objects.filter(status='PENDING').count()
+    counters['budget_left'] = budget_left()
+    return counters
@@ -0,0 +1,324 @@
+"""
+In-process rank service.
+
+Keeps every ranked (points, username) pair from LeaderboardEntry in an
+order-statistic index so "rank of user X", "top K" and "users around X"
+are answered in O(log N) without touching the database.
+
+Each worker process holds its own index. Changes made in this process
+arrive through the api.leaderboard signals; changes made by other workers
+are picked up by a cheap delta sync on LeaderboardEntry.updated_at, and
+the whole index is reloaded periodically to drop deleted users.
+
+updated_at comes from each worker's clock and is stamped before its
+transaction commits, so a row can become visible with a timestamp older
+than rows this process has already seen. The delta sync therefore reads
+back SYNC_OVERLAP seconds behind its watermark; re-applying a row is a
+no-op.
+"""
+import threading
+import time
+from datetime import timedelta
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import leaderboard
+from .models import LeaderboardEntry
+
+SYNC_INTERVAL = getattr(settings, 'RANK_INDEX_SYNC_SECONDS', 5)
+RELOAD_INTERVAL = getattr(settings, 'RANK_INDEX_RELOAD_SECONDS', 300)
+# Clock skew between workers plus the longest transaction that touches a score
+SYNC_OVERLAP = getattr(settings, 'RANK_INDEX_SYNC_OVERLAP_SECONDS', 60)
+
+
+class RankIndex:
+    """
+    Sorted (points DESC, username ASC) index with positional lookups.
+
+    Keys are stored in fixed-size sorted buckets; a Fenwick tree over the
+    bucket lengths turns "how many keys sort before this one" into
+    O(log N), while inserts only shift one small bucket.
+    """
+    LOAD = 1000
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._buckets = []
+            self._maxes = []
+            self._tree = [0]
+            self._keys = {}  # username -> key
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, username):
+        return username in self._keys
+
+    @staticmethod
+    def _key(username, points):
+        return (-points, username)
+
+    # --- Fenwick tree over bucket lengths ---
+
+    def _rebuild_tree(self):
+        tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets, start=1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, index, delta):
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, index):
+        """Number of keys in buckets[0:index]."""
+        total = 0
+        i = index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _tree_locate(self, position):
+        """Map a 0-based position to (bucket index, offset in bucket)."""
+        index = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = index + step
+            if nxt < len(self._tree) and self._tree[nxt] <= position:
+                index = nxt
+                position -= self._tree[nxt]
+            step >>= 1
+        return index, position
+
+    # --- Mutation ---
+
+    def load(self, pairs):
+        """Replace the contents with an iterable of (username, points)."""
+        keys = sorted(self._key(username, points) for username, points in pairs)
+        with self._lock:
+            self._keys = {key[1]: key for key in keys}
+            self._buckets = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+            self._maxes = [bucket[-1] for bucket in self._buckets]
+            self._rebuild_tree()
+
+    def update(self, username, points):
+        with self._lock:
+            key = self._key(username, points)
+            if self._keys.get(username) == key:
+                return
+            self._discard(username)
+            self._insert(key)
+
+    def remove(self, username):
+        with self._lock:
+            self._discard(username)
+
+    def _insert(self, key):
+        self._keys[key[1]] = key
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._rebuild_tree()
+            return
+
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+            self._buckets[i].append(key)
+            self._maxes[i] = key
+        else:
+            insort(self._buckets[i], key)
+
+        bucket = self._buckets[i]
+        if len(bucket) > 2 * self.LOAD:
+            self._buckets[i:i + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self._maxes[i:i + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def _discard(self, username):
+        key = self._keys.pop(username, None)
+        if key is None:
+            return
+        i = bisect_left(self._maxes, key)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._rebuild_tree()
+
+    # --- Queries ---
+
+    def _position(self, key):
+        """Number of keys that sort strictly before `key`."""
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return len(self._keys)
+        return self._tree_prefix(i) + bisect_left(self._buckets[i], key)
+
+    def rank(self, username, points=0):
+        """
+        1-based rank of `username`. Users not in the index are ranked where
+        they would sort with `points`.
+        """
+        with self._lock:
+            key = self._keys.get(username) or self._key(username, points)
+            return self._position(key) + 1
+
+    def slice(self, start, stop):
+        """[(rank, username, points), ...] for 0-based positions start..stop-1."""
+        with self._lock:
+            start = max(start, 0)
+            stop = min(stop, len(self._keys))
+            if start >= stop:
+                return []
+            result = []
+            b, offset = self._tree_locate(start)
+            position = start
+            while position < stop:
+                bucket = self._buckets[b]
+                for key in bucket[offset:offset + (stop - position)]:
+                    position += 1
+                    result.append((position, key[1], -key[0]))
+                b += 1
+                offset = 0
+            return result
+
+    def top(self, k):
+        return self.slice(0, k)
+
+    def around(self, username, radius=2, points=0):
+        position = self.rank(username, points) - 1
+        return self.slice(position - radius, position + radius + 1)
+
+
+class _RankService:
+    """Process-wide RankIndex kept in sync with LeaderboardEntry."""
+
+    def __init__(self):
+        self.index = RankIndex()
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._synced_at = None
+        self._watermark = None
+        self._usernames = {}  # user_id -> username in the index, to follow renames
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ranked(self):
+        return LeaderboardEntry.objects.filter(concepts_completed__gt=0)
+
+    def _reload(self, now):
+        rows = list(self._ranked().values_list('user_id', 'username', 'points', 'updated_at'))
+        self.index.load((username, points) for _, username, points, _ in rows)
+        self._usernames = {user_id: username for user_id, username, _, _ in rows}
+        self._watermark = max((row[3] for row in rows), default=None)
+        self._loaded_at = self._synced_at = now
+
+    def _sync(self, now):
+        # Rows from the last SYNC_OVERLAP seconds are re-applied on every
+        # sync, which is harmless because update() is idempotent.
+        qs = LeaderboardEntry.objects.all()
+        if self._watermark is not None:
+            qs = qs.filter(updated_at__gte=self._watermark - timedelta(seconds=SYNC_OVERLAP))
+        for user_id, username, points, concepts, updated_at in qs.values_list(
+            'user_id', 'username', 'points', 'concepts_completed', 'updated_at'
+        ):
+            self.apply(user_id, username, points, concepts)
+            if self._watermark is None or updated_at > self._watermark:
+                self._watermark = updated_at
+        self._synced_at = now
+
+    def ensure_fresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_at is None or now - self._loaded_at > RELOAD_INTERVAL:
+                self._reload(now)
+            elif now - self._synced_at > SYNC_INTERVAL:
+                self._sync(now)
+        return self.index
+
+    def apply(self, user_id, username, points, concepts_completed):
+        with self._lock:
+            previous = self._usernames.get(user_id)
+            if previous is not None and previous != username:
+                self.index.remove(previous)
+            if concepts_completed > 0:
+                self.index.update(username, points)
+                self._usernames[user_id] = username
+            else:
+                self.index.remove(username)
+                self._usernames.pop(user_id, None)
+
+
+_service = _RankService()
+
+
+@receiver(leaderboard.points_changed)
+def _on_points_changed(sender, entry, **kwargs):
+    # Only once the score is in the database: a rolled-back change must not
+    # linger in the index
+    def apply():
+        if _service._loaded_at is not None:
+            _service.apply(entry.user_id, entry.username, entry.points, entry.concepts_completed)
+    transaction.on_commit(apply)
+
+
+@receiver(leaderboard.leaderboard_rebuilt)
+def _on_leaderboard_rebuilt(sender, **kwargs):
+    _service.invalidate()
+
+
+def _points_of(user):
+    entry = LeaderboardEntry.objects.filter(user=user).only('points').first()
+    return entry.points if entry else 0
+
+
+def rank_of(user):
+    """
+    1-based rank of `user`, counting the user even if they have not
+    completed a concept yet, where they would sort with their points.
+    """
+    index = _service.ensure_fresh()
+    if user.username in index:
+        return index.rank(user.username)
+    return index.rank(user.username, _points_of(user))
+
+
+def top(k=5):
+    """[(rank, username, points), ...] for the best `k` users."""
+    return _service.ensure_fresh().top(k)
+
+
+def around(user, radius=2):
+    """[(rank, username, points), ...] for up to `radius` users either side of `user`."""
+    index = _service.ensure_fresh()
+    if user.username in index:
+        return index.around(user.username, radius)
+    # Not ranked yet: show the neighbourhood they would land in, plus themselves.
+    points = _points_of(user)
+    rank = index.rank(user.username, points)
+    rows = index.slice(rank - 1 - radius, rank - 1)
+    rows.append((rank, user.username, points))
+    rows.extend((r + 1, username, pts) for r, username, pts in index.slice(rank - 1, rank - 1 + radius))
+    return rows
@@ -0,0 +1,170 @@
+"""
+Roadmap progress counters.
+
+Every completion used to recompute Roadmap.progress with two COUNTs
+joined through chapter__course (all concepts of the course, and the
+learner's completed ones). Roadmap now carries total_count and
+completed_count and progress is plain arithmetic on them:
+
+- record_completion(): one F() UPDATE when a concept is newly completed.
+- recount(): recomputes both counters with correlated subqueries. It runs
+  when a roadmap is created, when chapters are bulk-added to a course
+  (course_import.add_chapters) and, through the signal receivers below,
+  when a concept or chapter is added or deleted one at a time (admin).
+- `manage.py reconcile_roadmaps` recounts everything to repair drift.
+
+current_chapter / current_concept are indexes into the course tree that
+Learn opens on. They follow completed_count: the resume point is the
+completed_count-th concept in learning order (the last one once the
+course is complete). Finding it needs the concept count of each chapter,
+which Course.chapter_sizes caches so a completion does not run a GROUP BY.
+store_chapter_sizes() refreshes the cache. course_changed() and the
+receivers call it whenever a chapter or concept of the course is saved or
+deleted, and reconcile_roadmaps calls it for every course; import_course
+fills it from the tree it inserts.
+"""
+from django.db.models import Case, Count, F, IntegerField, OuterRef, QuerySet, Subquery, Value, When
+from django.db.models.functions import Coalesce, Least
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Chapter, Concept, ConceptProgress, Course, Roadmap
+
+
+def _progress(completed, total):
+    """Percentage 0-100 from two integer expressions, 0 for an empty course."""
+    return Case(When(total_count__gt=0, then=completed * 100 / total), default=Value(0))
+
+
+def chapter_sizes(course_id):
+    """Concept counts of the course's chapters, in learning order."""
+    return list(
+        Chapter.objects.filter(course_id=course_id).annotate(size=Count('concepts'))
+        .order_by('order', 'id').values_list('size', flat=True)
+    )
+
+
+def store_chapter_sizes(course_id):
+    """Recompute the course's cached Course.chapter_sizes and return them."""
+    sizes = chapter_sizes(course_id)
+    Course.objects.filter(id=course_id).update(chapter_sizes=sizes)
+    return sizes
+
+
+def position(sizes, index):
+    """(chapter index, concept index) of the `index`-th concept, clamped to the last one."""
+    for chapter_index, size in enumerate(sizes):
+        if index < size:
+            return chapter_index, index
+        index -= size
+    last = max((i for i, size in enumerate(sizes) if size), default=None)
+    return (last, sizes[last] - 1) if last is not None else (0, 0)
+
+
+def _move_to(roadmaps, sizes):
+    """Point each (id, completed_count) roadmap at its resume concept."""
+    for roadmap_id, completed in roadmaps:
+        chapter_index, concept_index = position(sizes, completed)
+        Roadmap.objects.filter(id=roadmap_id).exclude(
+            current_chapter=chapter_index, current_concept=concept_index
+        ).update(current_chapter=chapter_index, current_concept=concept_index)
+
+
+def record_completion(user, course_id):
+    """
+    Count a newly completed concept on the user's roadmap for the course.
+    Returns the updated roadmap's progress, or None if not enrolled.
+    """
+    roadmaps = Roadmap.objects.filter(user=user, course_id=course_id)
+    completed = Least(F('completed_count') + 1, F('total_count'))
+    if not roadmaps.update(completed_count=completed, progress=_progress(completed, F('total_count'))):
+        return None
+    roadmap_id, completed_count, progress, sizes = roadmaps.values_list(
+        'id', 'completed_count', 'progress', 'course__chapter_sizes'
+    ).get()
+    _move_to([(roadmap_id, completed_count)], sizes)
+    return progress
+
+
+def recount(roadmaps=None):
+    """
+    Recompute the counters, progress and resume point of `roadmaps` (a
+    Roadmap queryset; default all) from the source tables. The resume
+    point uses the cached Course.chapter_sizes. Returns the number of
+    roadmaps updated.
+    """
+    roadmaps = Roadmap.objects.all() if roadmaps is None else roadmaps
+    total = (
+        Concept.objects.filter(chapter__course_id=OuterRef('course_id'))
+        .order_by().values('chapter__course_id').annotate(n=Count('id')).values('n')
+    )
+    completed = (
+        ConceptProgress.objects.filter(
+            user_id=OuterRef('user_id'), concept__chapter__course_id=OuterRef('course_id'), completed=True
+        )
+        .order_by().values('user_id').annotate(n=Count('id')).values('n')
+    )
+    updated = roadmaps.update(
+        total_count=Coalesce(Subquery(total, output_field=IntegerField()), 0),
+        completed_count=Coalesce(Subquery(completed, output_field=IntegerField()), 0),
+    )
+    roadmaps.update(progress=_progress(Least(F('completed_count'), F('total_count')), F('total_count')))
+
+    rows = roadmaps.values_list('id', 'completed_count', 'course__chapter_sizes')
+    for roadmap_id, completed_count, sizes in rows.iterator():
+        _move_to([(roadmap_id, completed_count)], sizes)
+    return updated
+
+
+def course_changed(course_id):
+    """Chapters or concepts were added to or removed from the course."""
+    store_chapter_sizes(course_id)
+    recount(Roadmap.objects.filter(course_id=course_id))
+
+
+@receiver(post_save, sender=Roadmap)
+def _on_roadmap_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        recount(Roadmap.objects.filter(id=instance.id))
+
+
+@receiver(post_save, sender=Concept)
+def _on_concept_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    course_id = Chapter.objects.filter(id=instance.chapter_id).values_list('course_id', flat=True).get()
+    if created:
+        course_changed(course_id)
+    else:
+        # May have moved to another chapter
+        store_chapter_sizes(course_id)
+
+
+@receiver(post_save, sender=Chapter)
+def _on_chapter_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        course_changed(instance.course_id)
+    else:
+        # May have been reordered
+        store_chapter_sizes(instance.course_id)
+
+
+def _deleted_directly(origin, model):
+    """True unless the delete cascaded from a parent (e.g. a whole course going away)."""
+    return (origin.model if isinstance(origin, QuerySet) else type(origin)) is model
+
+
+@receiver(post_delete, sender=Concept)
+def _on_concept_deleted(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, Concept):
+        course_id = Chapter.objects.filter(id=instance.chapter_id).values_list('course_id', flat=True).first()
+        if course_id is not None:
+            course_changed(course_id)
+
+
+@receiver(post_delete, sender=Chapter)
+def _on_chapter_deleted(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, Chapter):
+        course_changed(instance.course_id)
@@ -1,9 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
-from django.utils import timezone
-from django.db.models import Sum, Count
-from datetime import timedelta
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -79,6 +76,14 @@ from .models import (
     Assessment, AssessmentResult, DailyTask, Notification, UserProgress
 )
 
+def completed_concept_ids(user):
+    """Set of concept IDs the user has completed (one query), for ConceptSerializer context."""
+    if not user or not user.is_authenticated:
+        return set()
+    return set(
+        ConceptProgress.objects.filter(user=user, completed=True).values_list('concept_id', flat=True)
+    )
+
 class LearnerProfileSerializer(serializers.ModelSerializer):
     skillLevel = serializers.CharField(source='skill_level')
     learningGoals = serializers.JSONField(source='learning_goals')
@@ -95,14 +100,20 @@ class LearnerProfileSerializer(serializers.ModelSerializer):
 class ConceptSerializer(serializers.ModelSerializer):
     videoUrl = serializers.URLField(source='video_url')
     contentType = serializers.CharField(source='content_type')
+    # The notes body is served by concepts/<id>/notes/, not in course trees
+    hasNotes = serializers.BooleanField(source='has_notes', read_only=True)
 
     completed = serializers.SerializerMethodField()
 
     class Meta:
         model = Concept
-        fields = ('id', 'title', 'description', 'duration', 'videoUrl', 'notes', 'contentType', 'order', 'completed')
+        fields = ('id', 'title', 'description', 'duration', 'videoUrl', 'hasNotes', 'contentType', 'order', 'completed')
 
     def get_completed(self, obj):
+        # Views that render whole course trees load the user's completed IDs once
+        completed_ids = self.context.get('completed_concept_ids')
+        if completed_ids is not None:
+            return obj.id in completed_ids
         user = self.context.get('request').user if self.context.get('request') else None
         if user and user.is_authenticated:
             return ConceptProgress.objects.filter(user=user, concept=obj, completed=True).exists()
@@ -142,11 +153,13 @@ class RoadmapSerializer(serializers.ModelSerializer):
     startedAt = serializers.DateTimeField(source='started_at')
     lastAccessedAt = serializers.DateTimeField(source='last_accessed_at')
     completedAt = serializers.DateTimeField(source='completed_at', read_only=True)
+    completedCount = serializers.IntegerField(source='completed_count', read_only=True)
+    totalCount = serializers.IntegerField(source='total_count', read_only=True)
     course_title = serializers.CharField(source='course.title', read_only=True)
     
     class Meta:
         model = Roadmap
-        fields = ('id', 'user', 'course', 'course_id', 'progress', 'currentChapter', 'currentConcept', 'startedAt', 'lastAccessedAt', 'completedAt', 'certificate_id', 'nft_asset_id', 'course_title')
+        fields = ('id', 'user', 'course', 'course_id', 'progress', 'completedCount', 'totalCount', 'currentChapter', 'currentConcept', 'startedAt', 'lastAccessedAt', 'completedAt', 'certificate_id', 'nft_asset_id', 'course_title')
         read_only_fields = ('user', 'startedAt', 'lastAccessedAt', 'completedAt', 'certificate_id', 'nft_asset_id', 'course_title')
 
 class AssessmentSerializer(serializers.ModelSerializer):
@@ -204,28 +217,17 @@ class UserProgressSerializer(serializers.ModelSerializer):
         return obj.user.roadmaps.count()
 
     def get_dailyProgress(self, obj):
-        today = timezone.now().date()
-        daily_data = []
-        
-        for i in range(6, -1, -1):
-            date = today - timedelta(days=i)
-            # Find completed concepts for this user on this date
-            completed = ConceptProgress.objects.filter(
-                user=obj.user,
-                completed=True,
-                completed_at__date=date
-            ).aggregate(
-                minutes=Sum('concept__duration'),
-                count=Count('id')
-            )
-            
-            daily_data.append({
+        from .activity import last_days
+
+        # One range query over the DailyActivity rollup
+        return [
+            {
                 'date': date.isoformat(),
-                'minutesLearned': completed['minutes'] or 0,
-                'conceptsCompleted': completed['count'] or 0
-            })
-            
-        return daily_data
+                'minutesLearned': row.minutes_learned if row else 0,
+                'conceptsCompleted': row.concepts_completed if row else 0
+            }
+            for date, row in last_days(obj.user, 7)
+        ]
 
 from .models import Lab
 
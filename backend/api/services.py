@@ -1,64 +1,214 @@
 import os
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from django.conf import settings
 import requests
 import json
 import logging
 
-# Configure Gemini
-# Configure Gemini
-genai.configure(api_key=settings.GEMINI_API_KEY)
+from . import gemini_limiter, llm_cache
+
+logger = logging.getLogger(__name__)
+
+# Heavy SDKs (google.generativeai, algosdk/algokit_utils) are imported on
+# first use, not when Django loads the URLconf — importing this module must
+# stay cheap for worker boot, management commands and tests.
+_sdk_lock = threading.Lock()
+_genai = None
+_algorand_service = None
+# (model name, system instruction, generation config) -> GenerativeModel
+_models = {}
+
+
+def get_genai():
+    """google.generativeai, imported and configured on first call."""
+    global _genai
+    if _genai is None:
+        with _sdk_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=settings.GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+
+def get_model(model_name='gemini-3-flash-preview', system_instruction=None, generation_config=None):
+    """
+    A shared GenerativeModel handle. Handles are built once per (name,
+    system instruction, generation config) and reused by every request;
+    they all use the SDK's default client, so calls share its open
+    connection instead of each request building a model (and, before,
+    re-running genai.configure, which dropped the client).
+    """
+    key = (model_name, system_instruction, json.dumps(generation_config, sort_keys=True) if generation_config else None)
+    model = _models.get(key)
+    if model is None:
+        genai = get_genai()
+        with _sdk_lock:
+            model = _models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(
+                    model_name, system_instruction=system_instruction, generation_config=generation_config
+                )
+                _models[key] = model
+    return model
 
 class YouTubeService:
     API_KEY = settings.YOUTUBE_API_KEY
-    
+    SEARCH_URL = os.environ.get('YOUTUBE_API_URL', 'https://www.googleapis.com/youtube/v3/search')
+    # Parallel enrichment: pool size, (connect, read) timeout per search and
+    # the overall deadline after which unfinished searches fall back.
+    MAX_WORKERS = getattr(settings, 'YOUTUBE_MAX_WORKERS', 8)
+    REQUEST_TIMEOUT = (3, 10)
+    DEADLINE_SECONDS = getattr(settings, 'YOUTUBE_ENRICH_DEADLINE', 20)
+    # Results are cached per normalized query (api.youtube_cache)
+    CACHE_ENABLED = getattr(settings, 'YOUTUBE_CACHE_ENABLED', True)
+    QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded', 'rateLimitExceeded'}
+    QUOTA_BACKOFF_SECONDS = getattr(settings, 'YOUTUBE_QUOTA_BACKOFF_SECONDS', 3600)
+
+    _session = None
+    _quota_blocked_until = 0.0
+
+    @classmethod
+    def session(cls):
+        """Shared keep-alive session, sized for MAX_WORKERS concurrent searches."""
+        if cls._session is None:
+            with _sdk_lock:
+                if cls._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_maxsize=cls.MAX_WORKERS)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    cls._session = session
+        return cls._session
+
+    @staticmethod
+    def fetch_video(query):
+        """
+        One YouTube Data API search (no caching).
+        Returns {video_url, thumbnail}, None when there are no results,
+        and raises when the API call fails.
+        """
+        params = {
+            'part': 'snippet',
+            'q': query,
+            'type': 'video',
+            'maxResults': 1,
+            'key': YouTubeService.API_KEY
+        }
+        response = YouTubeService.session().get(
+            YouTubeService.SEARCH_URL, params=params, timeout=YouTubeService.REQUEST_TIMEOUT
+        )
+        data = response.json()
+
+        logger.debug(f"YouTube API for '{query}': status={response.status_code}")
+        if 'error' in data:
+            error = data['error']
+            reasons = {e.get('reason') for e in error.get('errors', [])} if isinstance(error, dict) else set()
+            if reasons & YouTubeService.QUOTA_REASONS:
+                # Stop calling the API for a while; cached and fallback results only
+                YouTubeService._quota_blocked_until = time.monotonic() + YouTubeService.QUOTA_BACKOFF_SECONDS
+            message = error.get('message', error) if isinstance(error, dict) else error
+            logger.warning(f"YouTube API error for '{query}': {message}")
+            raise RuntimeError(f"YouTube API error: {message}")
+
+        if 'items' in data and len(data['items']) > 0:
+            item = data['items'][0]
+            video_id = item['id']['videoId']
+            # Try to get high quality thumbnail, fallback to default
+            thumbnails = item['snippet']['thumbnails']
+            thumbnail = thumbnails.get('high', thumbnails.get('default'))['url']
+
+            embed_url = f"https://www.youtube.com/embed/{video_id}"
+            logger.debug(f"YouTube: found video {video_id} -> {embed_url}")
+
+            return {
+                'video_url': embed_url,
+                'thumbnail': thumbnail
+            }
+        logger.debug(f"YouTube: no results found for '{query}'")
+        return None
+
+    @staticmethod
+    def _try_fetch(query):
+        """(True, result) on a successful search, (False, None) on any error."""
+        try:
+            return True, YouTubeService.fetch_video(query)
+        except Exception as e:
+            logger.warning(f"YouTube search error for '{query}': {e}")
+            return False, None
+
+    @staticmethod
+    def quota_exhausted():
+        return time.monotonic() < YouTubeService._quota_blocked_until
+
     @staticmethod
     def search_video(query):
         """
         Searches YouTube for a video matching the query.
-        Returns {video_url, thumbnail} or None.
+        Returns {video_url, thumbnail}; a search URL when nothing was found.
         """
-        try:
-            url = "https://www.googleapis.com/youtube/v3/search"
-            params = {
-                'part': 'snippet',
-                'q': query,
-                'type': 'video',
-                'maxResults': 1,
-                'key': YouTubeService.API_KEY
-            }
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            
-            # Debug logging
-            print(f"DEBUG YouTube API for '{query}': Status={response.status_code}")
-            if 'error' in data:
-                print(f"DEBUG YouTube API ERROR: {data['error'].get('message', data['error'])}")
-                # Fallback: Return a YouTube search URL so user can find the video manually
-                return YouTubeService._create_fallback_url(query)
-            
-            if 'items' in data and len(data['items']) > 0:
-                item = data['items'][0]
-                video_id = item['id']['videoId']
-                # Try to get high quality thumbnail, fallback to default
-                thumbnails = item['snippet']['thumbnails']
-                thumbnail = thumbnails.get('high', thumbnails.get('default'))['url']
-                
-                embed_url = f"https://www.youtube.com/embed/{video_id}"
-                print(f"DEBUG YouTube: Found video {video_id} -> {embed_url}")
-                
-                return {
-                    'video_url': embed_url,
-                    'thumbnail': thumbnail
-                }
+        return YouTubeService.search_videos([query], max_workers=1)[query]
+
+    @staticmethod
+    def search_videos(queries, max_workers=None, deadline=None):
+        """
+        Resolve many queries: cached results first (one DB query), the rest
+        concurrently against the API. Returns {query: result}.
+        Searches still running when `deadline` seconds have passed, or that
+        fail, get the stale cached video if there is one and the fallback
+        search URL otherwise, so a slow API never holds up roadmap
+        generation for more than the deadline.
+        """
+        from . import youtube_cache
+
+        unique = list(dict.fromkeys(queries))
+        if not unique:
+            return {}
+        max_workers = max_workers or YouTubeService.MAX_WORKERS
+        deadline = YouTubeService.DEADLINE_SECONDS if deadline is None else deadline
+
+        start = time.monotonic()
+        fresh, stale = youtube_cache.lookup(unique) if YouTubeService.CACHE_ENABLED else ({}, {})
+        misses = [q for q in unique if q not in fresh]
+        fetched = {}
+        if misses and not YouTubeService.quota_exhausted():
+            pool = ThreadPoolExecutor(max_workers=min(max_workers, len(misses)), thread_name_prefix='youtube')
+            try:
+                futures = {pool.submit(YouTubeService._try_fetch, q): q for q in misses}
+                done, not_done = wait(futures, timeout=deadline)
+            finally:
+                # Don't wait for stragglers; their results are dropped
+                pool.shutdown(wait=False, cancel_futures=True)
+            for f in done:
+                ok, result = f.result()
+                if ok:
+                    fetched[futures[f]] = result
+            if not_done:
+                logger.warning(f"YouTube enrichment: {len(not_done)}/{len(misses)} searches missed the {deadline}s deadline")
+        elif misses:
+            logger.warning(f"YouTube enrichment: quota exhausted, {len(misses)} searches served from cache/fallback")
+
+        if YouTubeService.CACHE_ENABLED and fetched:
+            youtube_cache.store(fetched)
+
+        results = {}
+        stale_served = 0
+        for q in unique:
+            if q in fresh:
+                result = fresh[q]
+            elif q in fetched:
+                result = fetched[q]
             else:
-                print(f"DEBUG YouTube: No results found for '{query}'")
-                return YouTubeService._create_fallback_url(query)
-        except Exception as e:
-            print(f"YouTube Search Error for '{query}': {e}")
-            return YouTubeService._create_fallback_url(query)
-            
-        return None
+                result = stale.get(q)
+                stale_served += result is not None
+            results[q] = result or YouTubeService._create_fallback_url(q)
+        if stale_served:
+            youtube_cache.record_stale_served(stale_served)
+
+        logger.debug(f"YouTube: {len(unique)} searches ({len(fresh)} cached) in {time.monotonic() - start:.2f}s")
+        return results
     
     @staticmethod
     def _create_fallback_url(query):
@@ -72,18 +222,8 @@ class YouTubeService:
 
 class ContentDiscoveryService:
     @staticmethod
-    def search_videos(topic, skill_level):
-        """
-        Generates a full course structure using Gemini 3 Pro with JSON output.
-        """
-        # Using verified gemini-3-flash-preview as requested
-        model = genai.GenerativeModel('gemini-3-flash-preview') 
-        
-        # Debug API Key (safety first)
-        key_status = "Set" if settings.GEMINI_API_KEY else "Not Set"
-        print(f"DEBUG: GEMINI_API_KEY is {key_status}") 
-        
-        prompt = f"""
+    def _course_prompt(topic, skill_level):
+        return f"""
         You are an expert curriculum designer. Create a comprehensive video-based learning roadmap for "{topic}" suitable for a "{skill_level}" learner.
         
         Return the response in strictly valid JSON format with this exact structure:
@@ -110,45 +250,70 @@ class ContentDiscoveryService:
             ]
         }}
         """
+
+    @staticmethod
+    def enrich_concepts(concepts, topic):
+        """
+        Fill in video_url/thumbnail for generated concepts (searched in
+        parallel). Returns the first thumbnail found, for the course.
+        """
+        course_thumbnail = None
+        # Append topic to query for better context
+        queries = [
+            f"{concept.get('video_search_query', concept['title'])} {topic} tutorial"
+            for concept in concepts
+        ]
+        videos = YouTubeService.search_videos(queries)
+
+        for concept, query in zip(concepts, queries):
+            yt_data = videos.get(query)
+            if yt_data:
+                concept['video_url'] = yt_data['video_url']
+                concept['thumbnail'] = yt_data['thumbnail']
+
+                # Use first found thumbnail for the course if not set
+                if not course_thumbnail:
+                    course_thumbnail = yt_data['thumbnail']
+            else:
+                # Fallback if API fail/limit
+                concept['video_url'] = ""
+        return course_thumbnail
+
+    @staticmethod
+    def _parse_course(text):
+        return json.loads(text.replace('```json', '').replace('```', '').strip())
+
+    @staticmethod
+    def search_videos(topic, skill_level, fresh=False):
+        """
+        Generates a full course structure using Gemini 3 Pro with JSON output.
+        fresh=True skips the LLM response cache (forceRegenerate).
+        """
+        # Using verified gemini-3-flash-preview as requested
+        model = get_model('gemini-3-flash-preview')
+        
+        if not settings.GEMINI_API_KEY:
+            logger.warning("GEMINI_API_KEY is not set")
+        
+        prompt = ContentDiscoveryService._course_prompt(topic, skill_level)
         
         try:
-            print(f"DEBUG: Calling Gemini {model.model_name} for topic: {topic}")
-            response = model.generate_content(
-                prompt, 
+            logger.debug(f"Calling Gemini {model.model_name} for topic: {topic}")
+            data = llm_cache.generate(
+                'course', model, prompt,
                 generation_config={"response_mime_type": "application/json"},
-                request_options={"timeout": 60}  # 60 second timeout
+                request_options={"timeout": 60},  # 60 second timeout
+                parse=ContentDiscoveryService._parse_course,
+                bypass=fresh,
             )
-            print("DEBUG: Gemini response received. Length:", len(response.text))
-            raw_response = response.text.replace('```json', '').replace('```', '').strip()
-            # print(f"DEBUG: Raw response: {raw_response[:500]}...") # Optional debug
-            
-            data = json.loads(raw_response)
-            print("DEBUG: JSON parsed successfully")
             
             # Enrich with Real YouTube Data
-            course_thumbnail = None
-            
-            if 'chapters' in data:
-                for chapter in data['chapters']:
-                    if 'concepts' in chapter:
-                        for concept in chapter['concepts']:
-                            query = concept.get('video_search_query', concept['title'])
-                            # Append topic to query for better context
-                            full_query = f"{query} {topic} tutorial"
-                            
-                            print(f"DEBUG: Searching YouTube for: {full_query}")
-                            yt_data = YouTubeService.search_video(full_query)
-                            
-                            if yt_data:
-                                concept['video_url'] = yt_data['video_url']
-                                concept['thumbnail'] = yt_data['thumbnail']
-                                
-                                # Use first found thumbnail for the course if not set
-                                if not course_thumbnail:
-                                    course_thumbnail = yt_data['thumbnail']
-                            else:
-                                # Fallback if API fail/limit
-                                concept['video_url'] = "" 
+            concepts = [
+                concept
+                for chapter in data.get('chapters', [])
+                for concept in chapter.get('concepts', [])
+            ]
+            course_thumbnail = ContentDiscoveryService.enrich_concepts(concepts, topic)
             
             if course_thumbnail and 'course' in data:
                  data['course']['thumbnail'] = course_thumbnail
@@ -157,13 +322,46 @@ class ContentDiscoveryService:
             
         except Exception as e:
             error_msg = str(e)
-            print(f"Gemini API Error: {error_msg}")
+            logger.error(f"Gemini API error: {error_msg}")
             return {"error": error_msg}
 
+    @staticmethod
+    def stream_course(topic, skill_level, fresh=False):
+        """
+        Streaming variant of search_videos. Yields ('course', dict) when the
+        course metadata is complete and ('chapter', dict) for every chapter,
+        with its concepts already enriched with YouTube videos, while Gemini
+        is still generating the rest. Errors propagate to the caller.
+        Shares its LLM cache entries with search_videos.
+        """
+        from .streaming import CourseStreamParser
+
+        model = get_model('gemini-3-flash-preview')
+        prompt = ContentDiscoveryService._course_prompt(topic, skill_level)
+        parser = CourseStreamParser()
+
+        logger.debug(f"Streaming Gemini {model.model_name} for topic: {topic}")
+        chunks = llm_cache.stream(
+            'course', model, prompt,
+            generation_config={"response_mime_type": "application/json"},
+            request_options={"timeout": 60},
+            validate=ContentDiscoveryService._parse_course,
+            bypass=fresh,
+        )
+        for chunk in chunks:
+            for kind, obj in parser.feed(chunk):
+                if kind == 'chapter':
+                    obj['thumbnail'] = ContentDiscoveryService.enrich_concepts(obj.get('concepts', []), topic)
+                yield kind, obj
+
+        if not parser.complete:
+            raise ValueError("Gemini stream ended before the course JSON was complete")
+
+
 class NotesGeneratorService:
     @staticmethod
     def generate_notes(video_title, extra_context=""):
-        model = genai.GenerativeModel('gemini-3-flash-preview')  # Use working model
+        model = get_model('gemini-3-flash-preview')  # Use working model
         
         prompt = f"""
         Create structured study notes for a video titled "{video_title}".
@@ -177,17 +375,18 @@ class NotesGeneratorService:
         ## Summary
         """
         
-        try:
-            response = model.generate_content(prompt, request_options={"timeout": 30})
-            return response.text
-        except Exception as e:
-            print(f"Notes generation error: {e}")
-            return f"# {video_title}\n\nNotes will be generated when you watch this video."
+        # Errors propagate: callers store notes, and must never store placeholder()
+        return llm_cache.generate('notes', model, prompt, request_options={"timeout": 30})
+
+    @staticmethod
+    def placeholder(video_title):
+        """Shown instead of notes when generation failed; never stored."""
+        return f"# {video_title}\n\nNotes will be generated when you watch this video."
 
 class QuizGeneratorService:
     @staticmethod
     def generate_quiz(topic, context_notes):
-        model = genai.GenerativeModel('gemini-3-flash-preview')  # Use working model
+        model = get_model('gemini-3-flash-preview')  # Use working model
         
         prompt = f"""
         Generate 3 multiple-choice questions based on these notes about "{topic}":
@@ -203,14 +402,16 @@ class QuizGeneratorService:
         """
         
         try:
-            response = model.generate_content(
-                prompt,
+            return llm_cache.generate(
+                'quiz', model, prompt,
                 generation_config={'response_mime_type': 'application/json'},
-                request_options={"timeout": 30}
+                request_options={"timeout": 30},
+                parse=json.loads
             )
-            return json.loads(response.text)
+        except gemini_limiter.RateLimitTimeout:
+            raise
         except Exception as e:
-            print(f"Quiz generation error: {e}")
+            logger.warning(f"Quiz generation error: {e}")
             return []
 
 
@@ -251,7 +452,7 @@ Your goal: Conduct a realistic {duration}-minute {topic} interview for a {level}
         """
         Generates the next interview question based on conversation history.
         """
-        model = genai.GenerativeModel('gemini-3-flash-preview')
+        model = get_model('gemini-3-flash-preview')
         
         # Build context from history
         context = "\n".join([
@@ -267,17 +468,20 @@ Your goal: Conduct a realistic {duration}-minute {topic} interview for a {level}
         )
         
         try:
-            response = model.generate_content(
-                system_prompt + "\n\nGenerate your next question:",
-                generation_config={
-                    'temperature': 0.7,
-                    'max_output_tokens': 150
-                },
-                request_options={"timeout": 15}
-            )
+            prompt = system_prompt + "\n\nGenerate your next question:"
+            generation_config = {
+                'temperature': 0.7,
+                'max_output_tokens': 150
+            }
+            with gemini_limiter.slot('interview_question', prompt, generation_config):
+                response = model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={"timeout": 15}
+                )
             return response.text.strip()
         except Exception as e:
-            logging.error(f"GeminiInterviewService error: {e}")
+            logger.error(f"GeminiInterviewService error: {e}")
             return "Can you tell me more about your experience with that?"
     
     @staticmethod
@@ -285,7 +489,7 @@ Your goal: Conduct a realistic {duration}-minute {topic} interview for a {level}
         """
         Analyzes the full interview transcript and returns a performance report.
         """
-        model = genai.GenerativeModel('gemini-3-flash-preview')
+        model = get_model('gemini-3-flash-preview')
         
         prompt = f"""
         Analyze this {topic} interview transcript and provide a detailed evaluation.
@@ -304,14 +508,14 @@ Your goal: Conduct a realistic {duration}-minute {topic} interview for a {level}
         """
         
         try:
-            response = model.generate_content(
-                prompt,
+            return llm_cache.generate(
+                'interview_analysis', model, prompt,
                 generation_config={'response_mime_type': 'application/json'},
-                request_options={"timeout": 30}
+                request_options={"timeout": 30},
+                parse=json.loads
             )
-            return json.loads(response.text)
         except Exception as e:
-            logging.error(f"Interview analysis error: {e}")
+            logger.error(f"Interview analysis error: {e}")
             return {
                 "score": 70,
                 "feedback": "Analysis could not be completed. Please try again.",
@@ -339,7 +543,7 @@ class LiveKitService:
             api_secret = os.getenv('LIVEKIT_API_SECRET')
             
             if not api_key or not api_secret:
-                logging.warning("LiveKit credentials not configured. Returning mock token.")
+                logger.warning("LiveKit credentials not configured. Returning mock token.")
                 return "MOCK_LIVEKIT_TOKEN_FOR_DEV"
             
             token = AccessToken(api_key, api_secret)
@@ -356,10 +560,10 @@ class LiveKitService:
             
             return token.to_jwt()
         except ImportError:
-            logging.error("livekit-api package not installed")
+            logger.error("livekit-api package not installed")
             return "MOCK_LIVEKIT_TOKEN_FOR_DEV"
         except Exception as e:
-            logging.error(f"LiveKit token generation error: {e}")
+            logger.error(f"LiveKit token generation error: {e}")
             return "MOCK_LIVEKIT_TOKEN_FOR_DEV"
 
 
@@ -370,6 +574,41 @@ class LiveKitService:
 # AlgoKit is Algorand's official development toolkit — PS04 requirement.
 # ============================================================
 
+def _algorand_settings():
+    """
+    (mnemonic, cert_app_id, badge_app_id, skill_token_id) from the
+    environment; the mnemonic is '' when unset or still the placeholder.
+    """
+    algo_mnemonic_str = os.environ.get('ALGORAND_MNEMONIC', '')
+    if algo_mnemonic_str.startswith('word1'):
+        algo_mnemonic_str = ''
+    return (
+        algo_mnemonic_str,
+        int(os.environ.get('ALGORAND_CERT_APP_ID', '0') or '0'),
+        int(os.environ.get('ALGORAND_BADGE_APP_ID', '0') or '0'),
+        int(os.environ.get('ALGORAND_SKILL_TOKEN_ID', '0') or '0'),
+    )
+
+
+def algorand_configured():
+    """
+    Whether NFT minting is set up, read from the environment only. Views
+    use this to decide whether to queue a job; building AlgorandService
+    (and its algod client) is left to the blockchain worker.
+    """
+    algo_mnemonic_str, cert_app_id, badge_app_id, _ = _algorand_settings()
+    return bool(algo_mnemonic_str) and (cert_app_id > 0 or badge_app_id > 0)
+
+
+def rewards_configured():
+    """Like algorand_configured(), for $SKILL token rewards."""
+    return algorand_configured() and _algorand_settings()[3] > 0
+
+
+class TransactionRejected(Exception):
+    """algod refused the transaction(s): nothing was submitted, so sending again is safe."""
+
+
 class AlgorandService:
     """
     Bridges SkillMeter backend to Algorand blockchain.
@@ -389,42 +628,43 @@ class AlgorandService:
     def __init__(self):
         try:
             # AlgoKit is the primary framework — PS04 requirement.
-            # AlgorandClient.testnet() auto-connects to TestNet via algonode.cloud.
-            from algokit_utils import AlgorandClient
+            # The AlgorandClient wraps the process-wide pooled algod/indexer
+            # clients (TestNet via algonode.cloud unless ALGORAND_NETWORK says otherwise).
             from algosdk import mnemonic as algo_mnemonic
             from algosdk import account as algo_account
 
-            self.algorand_client = AlgorandClient.testnet()
+            from .algorand_client import get_algorand_client, get_params_cache
+
+            self.algorand_client = get_algorand_client()
             self.algod_client = self.algorand_client.client.algod  # underlying algod for txns
+            self.params_cache = get_params_cache(self.algod_client)  # shared, TTL-cached suggested_params
 
-            algo_mnemonic_str = os.environ.get('ALGORAND_MNEMONIC', '')
-            if not algo_mnemonic_str or algo_mnemonic_str.startswith('word1'):
-                logging.warning("AlgorandService: ALGORAND_MNEMONIC not configured")
+            algo_mnemonic_str, self.cert_app_id, self.badge_app_id, self.skill_token_id = _algorand_settings()
+            if not algo_mnemonic_str:
+                logger.warning("AlgorandService: ALGORAND_MNEMONIC not configured")
                 self.enabled = False
                 return
 
             self.admin_key = algo_mnemonic.to_private_key(algo_mnemonic_str)
             self.admin_address = algo_account.address_from_private_key(self.admin_key)
 
-            self.cert_app_id = int(os.environ.get('ALGORAND_CERT_APP_ID', '0') or '0')
-            self.badge_app_id = int(os.environ.get('ALGORAND_BADGE_APP_ID', '0') or '0')
-            self.skill_token_id = int(os.environ.get('ALGORAND_SKILL_TOKEN_ID', '0') or '0')
-
             self.enabled = self.cert_app_id > 0 or self.badge_app_id > 0
             if not self.enabled:
-                logging.warning("AlgorandService: No App IDs configured — run deploy scripts after TestNet setup")
+                logger.warning("AlgorandService: No App IDs configured — run deploy scripts after TestNet setup")
 
         except Exception as e:
-            logging.error(f"AlgorandService init error: {e}")
+            logger.error(f"AlgorandService init error: {e}")
             self.enabled = False
 
-    def issue_certificate_nft(self, recipient_address, course_name, score, cert_hash) -> dict:
+    def issue_certificate_nft(self, recipient_address, course_name, score, cert_hash, on_submit=None) -> dict:
         """
         Mints an ARC-69 Certificate NFT as a direct ASA creation.
         Returns {'asset_id': int, 'explorer_url': str} or None on failure.
+        With `on_submit` (see _send) errors propagate instead, since the
+        caller tracks the transaction itself.
         """
         if not self.enabled:
-            logging.info("AlgorandService: Certificate NFT minting skipped (not enabled)")
+            logger.info("AlgorandService: Certificate NFT minting skipped (not enabled)")
             return None
 
         try:
@@ -440,7 +680,7 @@ class AlgorandService:
             })
 
             safe_name = course_name[:32] if course_name else "SkillCert"
-            params = self.algod_client.suggested_params()
+            params = self.params_cache.get()
 
             # Direct ASA creation — reliably returns asset-index in confirmation
             txn = transaction.AssetCreateTxn(
@@ -459,33 +699,35 @@ class AlgorandService:
                 clawback=self.admin_address,
             )
 
-            signed = txn.sign(self.admin_key)
-            txid = self.algod_client.send_transaction(signed)
-            result = transaction.wait_for_confirmation(self.algod_client, txid, 6)
+            [txid], result = self._send([txn.sign(self.admin_key)], on_submit)
 
             asset_id = result.get('asset-index')
             if asset_id:
-                logging.info(f"AlgorandService: Certificate NFT minted, ASA ID={asset_id}")
+                logger.info(f"AlgorandService: Certificate NFT minted, ASA ID={asset_id}")
                 return {
                     'asset_id': asset_id,
                     'explorer_url': f'https://lora.algokit.io/testnet/asset/{asset_id}'
                 }
             else:
-                logging.warning(f"AlgorandService: Certificate txn confirmed ({txid}) but asset-index missing")
+                logger.warning(f"AlgorandService: Certificate txn confirmed ({txid}) but asset-index missing")
                 return {'asset_id': 0, 'explorer_url': f'https://lora.algokit.io/testnet/tx/{txid}'}
 
         except Exception as e:
-            logging.error(f"AlgorandService: Certificate NFT minting failed: {e}")
+            logger.error(f"AlgorandService: Certificate NFT minting failed: {e}")
+            self.params_cache.invalidate()
+            if on_submit:
+                raise
             return None
 
-    def issue_skill_badge(self, recipient_address, skill_name, score, topic_hash) -> dict:
+    def issue_skill_badge(self, recipient_address, skill_name, score, topic_hash, on_submit=None) -> dict:
         """
         Mints an ARC-69 Skill Badge NFT as a direct ASA creation.
         Called by submit_assessment view when score >= 80.
         Returns {'asset_id': int, 'explorer_url': str} or None on failure.
+        With `on_submit` (see _send) errors propagate instead.
         """
         if not self.enabled:
-            logging.info("AlgorandService: Badge NFT minting skipped (not enabled)")
+            logger.info("AlgorandService: Badge NFT minting skipped (not enabled)")
             return None
 
         try:
@@ -500,7 +742,7 @@ class AlgorandService:
             })
 
             safe_name = skill_name[:32] if skill_name else "SkillBadge"
-            params = self.algod_client.suggested_params()
+            params = self.params_cache.get()
 
             # Direct ASA creation — reliably returns asset-index in confirmation
             txn = transaction.AssetCreateTxn(
@@ -519,78 +761,184 @@ class AlgorandService:
                 clawback=self.admin_address,
             )
 
-            signed = txn.sign(self.admin_key)
-            txid = self.algod_client.send_transaction(signed)
-            result = transaction.wait_for_confirmation(self.algod_client, txid, 6)
+            [txid], result = self._send([txn.sign(self.admin_key)], on_submit)
 
             asset_id = result.get('asset-index')
             if asset_id:
-                logging.info(f"AlgorandService: Skill Badge minted, ASA ID={asset_id}")
+                logger.info(f"AlgorandService: Skill Badge minted, ASA ID={asset_id}")
                 return {
                     'asset_id': asset_id,
                     'explorer_url': f'https://lora.algokit.io/testnet/asset/{asset_id}'
                 }
             else:
-                logging.warning(f"AlgorandService: Badge txn confirmed ({txid}) but asset-index missing")
+                logger.warning(f"AlgorandService: Badge txn confirmed ({txid}) but asset-index missing")
                 return {'asset_id': 0, 'explorer_url': f'https://lora.algokit.io/testnet/tx/{txid}'}
 
         except Exception as e:
-            logging.error(f"AlgorandService: Badge NFT minting failed: {e}")
+            logger.error(f"AlgorandService: Badge NFT minting failed: {e}")
+            self.params_cache.invalidate()
+            if on_submit:
+                raise
             return None
 
-    def reward_skill_tokens(self, recipient_address, reason, user=None) -> dict:
+    def _send(self, signed, on_submit=None):
         """
-        Distributes $SKILL tokens (ASA transfer) for a learning action.
-        reason: 'concept' | 'daily_task' | 'assessment' | 'streak' | 'course' | 'perfect'
-        If on-chain transfer fails (e.g. wallet not opted-in), tokens are stored in
-        LearnerProfile.pending_skill_tokens so no rewards are ever lost.
+        Submit signed transactions (one, or an atomic group) and wait for the
+        first to confirm. Returns (txids, confirmation).
+
+        on_submit(txids, last_valid_round) runs before anything is sent so
+        the caller can persist the txids. If this raises anything but
+        TransactionRejected the transactions may still confirm (e.g. the
+        confirmation wait timed out), so check transaction_status() before
+        signing replacements, or the learner is paid / minted twice.
         """
-        amount = self.REWARD_TABLE.get(reason, 0)
-        if amount == 0 or not self.enabled or self.skill_token_id == 0:
-            return {'rewarded': False, 'reason': reason}
+        from algosdk import transaction
+        from algosdk.error import AlgodHTTPError
 
+        txids = [stx.get_txid() for stx in signed]
+        if on_submit:
+            on_submit(txids, signed[0].transaction.last_valid_round)
         try:
-            from algosdk import transaction
+            self.algod_client.send_transactions(signed)
+        except AlgodHTTPError as e:
+            self.params_cache.invalidate()  # e.g. params outside the valid round window
+            if e.code and e.code < 500:
+                raise TransactionRejected(str(e)) from e
+            raise
+        except Exception:
+            self.params_cache.invalidate()
+            raise
+        # Grouped transactions are confirmed in the same round
+        return txids, transaction.wait_for_confirmation(self.algod_client, txids[0], 6)
+
+    def transaction_status(self, txid, last_valid_round):
+        """
+        Where a txid passed to on_submit ended up:
+        ('confirmed', info) - on chain; info has 'confirmed-round' and, for an
+                              ASA creation, 'asset-index'
+        ('pending', None)   - may still confirm; ask again later
+        ('dead', None)      - can never confirm; safe to send a replacement
+        """
+        from algosdk.error import AlgodHTTPError
+        from .algorand_client import get_indexer_client
+
+        try:
+            info = self.algod_client.pending_transaction_info(txid)
+        except AlgodHTTPError as e:
+            if e.code != 404:
+                raise
+            info = {}
+        if info.get('confirmed-round'):
+            return 'confirmed', info
+        if info.get('pool-error'):
+            return 'dead', None
+        if info or self.algod_client.status()['last-round'] <= last_valid_round:
+            return 'pending', None
+
+        # Unknown to algod and past its validity window: it either confirmed
+        # a while ago (algod forgot it) or never will. The indexer knows which.
+        found = get_indexer_client().search_transactions(txid=txid)
+        if found['transactions']:
+            txn = found['transactions'][0]
+            return 'confirmed', {
+                'confirmed-round': txn.get('confirmed-round'), 'asset-index': txn.get('created-asset-index'),
+            }
+        if found['current-round'] <= last_valid_round:
+            return 'pending', None  # indexer still catching up
+        return 'dead', None
+
+    def transfer_skill_tokens(self, recipient_address, amount, reason, on_submit=None) -> str:
+        """
+        Sends `amount` $SKILL to `recipient_address` and waits for confirmation.
+        Returns the txid. Raises on failure (callers decide how to retry; see
+        _send for `on_submit`).
+        """
+        from algosdk import transaction
+
+        params = self.params_cache.get()
+
+        # Real ASA transfer of $SKILL tokens from admin wallet to recipient
+        txn = transaction.AssetTransferTxn(
+            sender=self.admin_address,
+            sp=params,
+            receiver=recipient_address,
+            amt=amount,
+            index=self.skill_token_id,
+            note=f'SkillMeter reward: {reason}'.encode(),
+        )
+
+        [txid], _ = self._send([txn.sign(self.admin_key)], on_submit)
+
+        logger.info(f"AlgorandService: Rewarded {amount} $SKILL for '{reason}' -> {recipient_address} (tx={txid})")
+        return txid
 
-            params = self.algod_client.suggested_params()
+    MAX_GROUP_SIZE = 16  # Algorand atomic transfer group limit
 
-            # Real ASA transfer of $SKILL tokens from admin wallet to recipient
-            txn = transaction.AssetTransferTxn(
+    def transfer_skill_tokens_group(self, transfers, on_submit=None) -> list:
+        """
+        Sends [(recipient_address, amount, note), ...] (at most 16) as one
+        atomic group: one suggested_params call, one submission and one
+        confirmation wait for the whole batch. Either every transfer lands
+        or none does. Returns the txids in input order; raises on failure
+        (TransactionRejected if nothing was submitted, see _send).
+        """
+        from algosdk import transaction
+
+        if not 0 < len(transfers) <= self.MAX_GROUP_SIZE:
+            raise ValueError(f"Group must contain 1-{self.MAX_GROUP_SIZE} transfers, got {len(transfers)}")
+
+        params = self.params_cache.get()
+        txns = [
+            transaction.AssetTransferTxn(
                 sender=self.admin_address,
                 sp=params,
                 receiver=recipient_address,
                 amt=amount,
                 index=self.skill_token_id,
-                note=f'SkillMeter reward: {reason}'.encode(),
+                note=note.encode(),
             )
+            for recipient_address, amount, note in transfers
+        ]
+        if len(txns) > 1:
+            transaction.assign_group_id(txns)
 
-            signed = txn.sign(self.admin_key)
-            txid = self.algod_client.send_transaction(signed)
-            transaction.wait_for_confirmation(self.algod_client, txid, 6)
+        txids, _ = self._send([txn.sign(self.admin_key) for txn in txns], on_submit)
 
-            logging.info(f"AlgorandService: Rewarded {amount} $SKILL for '{reason}' -> {recipient_address} (tx={txid})")
+        logger.info(f"AlgorandService: Sent {len(txids)} $SKILL transfers as one group (first tx={txids[0]})")
+        return txids
 
-            # If on-chain succeeded, clear any pending tokens (they're now on-chain)
-            if user:
-                try:
-                    from .models import LearnerProfile
-                    LearnerProfile.objects.filter(user=user).update(pending_skill_tokens=0)
-                except Exception:
-                    pass
+    def rewards_enabled(self) -> bool:
+        return bool(self.enabled and self.skill_token_id)
+
+    @staticmethod
+    def add_pending_tokens(user, amount):
+        """
+        Park tokens on the profile so no rewards are lost when a transfer
+        fails. They go out with a later reward batch (api.blockchain_jobs).
+        """
+        try:
+            from .models import LearnerProfile
+            from django.db.models import F
+            LearnerProfile.objects.filter(user=user).update(
+                pending_skill_tokens=F('pending_skill_tokens') + amount
+            )
+            logger.info(f"AlgorandService: Saved {amount} $SKILL as pending for user {user}")
+        except Exception as inner_e:
+            logger.error(f"AlgorandService: Failed to save pending tokens: {inner_e}")
 
-            return {'rewarded': True, 'amount': amount, 'reason': reason, 'txid': txid}
 
-        except Exception as e:
-            logging.error(f"AlgorandService: Token reward failed ({reason}): {e}")
-            # Save to pending — no rewards are lost
-            if user:
+def get_algorand_service():
+    """
+    Process-wide AlgorandService, built on first use (fail-safe — returns
+    None instead of breaking the request if construction blows up).
+    """
+    global _algorand_service
+    if _algorand_service is None:
+        with _sdk_lock:
+            if _algorand_service is None:
                 try:
-                    from .models import LearnerProfile
-                    from django.db.models import F
-                    LearnerProfile.objects.filter(user=user).update(
-                        pending_skill_tokens=F('pending_skill_tokens') + amount
-                    )
-                    logging.info(f"AlgorandService: Saved {amount} $SKILL as pending for user {user}")
-                except Exception as inner_e:
-                    logging.error(f"AlgorandService: Failed to save pending tokens: {inner_e}")
-            return {'rewarded': False, 'amount': amount, 'reason': reason}
+                    _algorand_service = AlgorandService()
+                except Exception as e:
+                    logger.error(f"AlgorandService init error: {e}")
+                    return None
+    return _algorand_service
@@ -0,0 +1,115 @@
+"""
+Single-flight for on-demand generations.
+
+When many learners open the same shared concept at once, only one request
+(the leader) calls Gemini; the others wait for the leader's result to
+appear in the database and return it. The lock is a GenerationLease row,
+so it works across every worker process. A lease expires after
+SINGLE_FLIGHT_LEASE_SECONDS so a crashed leader cannot block a key
+forever; a waiter that finds the lease gone without a result takes over.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import GenerationLease
+
+logger = logging.getLogger(__name__)
+
+WAIT_SECONDS = getattr(settings, 'SINGLE_FLIGHT_WAIT_SECONDS', 45)
+LEASE_SECONDS = getattr(settings, 'SINGLE_FLIGHT_LEASE_SECONDS', 120)
+POLL_SECONDS = 0.25
+
+_lock = threading.Lock()
+_counters = {'cached': 0, 'leader': 0, 'coalesced': 0, 'takeovers': 0, 'timeouts': 0}
+
+
+class SingleFlightTimeout(Exception):
+    """Another request is still generating this key after the wait timeout."""
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+
+
+def _acquire(key, owner):
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=LEASE_SECONDS)
+    try:
+        with transaction.atomic():
+            GenerationLease.objects.create(key=key, owner=owner, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        # Take over a lease whose holder died without releasing it
+        return bool(GenerationLease.objects.filter(key=key, expires_at__lt=now).update(
+            owner=owner, expires_at=expires_at
+        ))
+
+
+def _release(key, owner):
+    GenerationLease.objects.filter(key=key, owner=owner).delete()
+
+
+def run(key, compute, load, wait_seconds=None):
+    """
+    Return (result, outcome) for `key`.
+
+    `load()` returns the stored result or None; `compute()` generates and
+    stores it and returns it. outcome is 'cached' (already stored),
+    'leader' (this call computed it) or 'coalesced' (another request
+    computed it while we waited). Raises SingleFlightTimeout if nothing
+    arrives within `wait_seconds`.
+    """
+    result = load()
+    if result is not None:
+        _count('cached')
+        return result, 'cached'
+
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + (WAIT_SECONDS if wait_seconds is None else wait_seconds)
+    waited = False
+    while True:
+        if _acquire(key, owner):
+            try:
+                # The previous holder may have finished between load() and here
+                result = load()
+                if result is not None:
+                    _count('coalesced' if waited else 'cached')
+                    return result, 'coalesced' if waited else 'cached'
+                if waited:
+                    _count('takeovers')
+                _count('leader')
+                return compute(), 'leader'
+            finally:
+                _release(key, owner)
+
+        if time.monotonic() >= deadline:
+            _count('timeouts')
+            logger.warning(f"single_flight: gave up waiting for {key}")
+            raise SingleFlightTimeout(key)
+        waited = True
+        _sleep(POLL_SECONDS)
+        result = load()
+        if result is not None:
+            _count('coalesced')
+            return result, 'coalesced'
+
+
+def stats():
+    """Counters for this process: how many calls were served from cache, led or coalesced."""
+    with _lock:
+        counters = dict(_counters)
+    generated = counters['leader'] + counters['coalesced']
+    counters['coalesce_rate'] = round(counters['coalesced'] / generated, 3) if generated else 0.0
+    return counters
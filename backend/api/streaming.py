@@ -0,0 +1,94 @@
+"""
+Helpers for streaming roadmap generation.
+
+CourseStreamParser consumes Gemini's JSON output chunk by chunk and hands
+back the "course" object and each element of "chapters" as soon as its
+closing brace arrives, so chapters can be saved and sent to the client
+while the model is still writing the rest of the course.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class CourseStreamParser:
+    """
+    Incremental parser for {"course": {...}, "chapters": [{...}, ...]}.
+
+    feed() returns a list of ('course', dict) / ('chapter', dict) events for
+    every object completed by the new text. Only brace/bracket nesting and
+    string boundaries are tracked; each completed object is then decoded
+    with json.loads. Anything before the first '{' (e.g. a ```json fence)
+    is ignored.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._top_key = None
+        self._capture_start = None
+        self._capture_depth = None
+
+    def feed(self, chunk):
+        self.text += chunk
+        text = self.text
+        events = []
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"' and self._stack:
+                self._in_string = True
+                self._string_start = i
+            elif ch == ':' and len(self._stack) == 1:
+                self._top_key = self._last_string
+            elif ch in '{[':
+                if not self._stack and ch != '{':
+                    continue
+                self._stack.append(ch)
+                if ch == '{' and self._capture_start is None and self._is_target():
+                    self._capture_start = i
+                    self._capture_depth = len(self._stack)
+            elif ch in '}]' and self._stack:
+                if self._capture_start is not None and len(self._stack) == self._capture_depth:
+                    obj = json.loads(text[self._capture_start:i + 1])
+                    if self._top_key == 'course':
+                        events.append(('course', obj))
+                    else:
+                        events.append(('chapter', obj))
+                    self._capture_start = None
+                self._stack.pop()
+        self._pos = len(text)
+        return events
+
+    def _is_target(self):
+        depth = len(self._stack)
+        if self._top_key == 'course':
+            return depth == 2
+        if self._top_key == 'chapters':
+            return depth == 3 and self._stack[1] == '['
+        return False
+
+    @property
+    def complete(self):
+        """True once the top-level object has been closed."""
+        return self._pos > 0 and not self._stack and '{' in self.text
+
+
+def sse_event(event, data):
+    """One Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
@@ -1,3 +1,1572 @@
-from django.test import TestCase
+import contextlib
+import io
+import json
+import os
+import random
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db.models import Count, F, Sum
+from django.core.management import call_command
+from django.db import IntegrityError, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import (
+    Course, Chapter, Concept, Roadmap, ConceptProgress, Assessment, AssessmentResult,
+    BlockchainJob, LearnerProfile, YouTubeSearchCache, GenerationLease, PrefetchJob, LLMCacheEntry, ConceptNotes,
+    DailyTask, DailyActivity, LeaderboardEntry, UserProgress, LearningEvent, ProjectionCheckpoint, NotificationLog,
+)
+from . import (
+    activity, algorand_client, blockchain_jobs, concept_content, course_catalog, course_import, daily_planner, events,
+    gemini_limiter, leaderboard, llm_cache, notification_outbox, prefetch, ranking, roadmap_progress, single_flight,
+    youtube_cache,
+)
+from . import services
+from .utils import notifications
+from .services import YouTubeService
+
+
+def make_course(title, chapters=3, concepts=4):
+    course = Course.objects.create(title=title, description=f'{title} course')
+    for i in range(chapters):
+        chapter = Chapter.objects.create(course=course, title=f'{title} ch{i}', order=i + 1)
+        for j in range(concepts):
+            Concept.objects.create(chapter=chapter, title=f'{title} c{i}.{j}', order=j + 1)
+    return course
+
+
+class CourseTreeQueryCountTests(TestCase):
+    """The course tree endpoints must not issue queries per chapter or concept."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='learner', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.courses = [make_course(f'Course {n}') for n in range(3)]
+        for course in self.courses:
+            Roadmap.objects.create(user=self.user, course=course)
+        done = Concept.objects.filter(chapter__course=self.courses[0])[:2]
+        for concept in done:
+            ConceptProgress.objects.create(user=self.user, concept=concept, completed=True)
+        self.done_ids = {c.id for c in done}
+
+    def _completed_ids(self, courses):
+        return {
+            concept['id']
+            for course in courses
+            for chapter in course['chapters']
+            for concept in chapter['concepts']
+            if concept['completed']
+        }
+
+    def test_roadmap_list(self):
+        # roadmaps+course, chapters, concepts, completed concept IDs
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('roadmap_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(self._completed_ids(r['course'] for r in response.data), self.done_ids)
+
+    def test_course_list(self):
+        # courses, chapters, concepts, completed concept IDs
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('course_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._completed_ids(response.data), self.done_ids)
+
+    def test_course_detail(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('course_detail', args=[self.courses[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(len(ch['concepts']) for ch in response.data['chapters']), 12)
+        self.assertEqual(self._completed_ids([response.data]), self.done_ids)
+
+    def test_query_count_independent_of_tree_size(self):
+        make_course('Big', chapters=6, concepts=5)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('course_list'))
+
+
+class FakeAlgorandService:
+    """
+    Stand-in for AlgorandService: records calls, optionally has algod reject
+    transfers, or lets the confirmation wait time out after sending.
+    transaction_status() answers from `statuses` (default 'pending').
+    """
+    REWARD_TABLE = {'concept': 1, 'assessment': 20, 'perfect': 10}
+    enabled = True
+
+    def __init__(self, fail_transfers=False, fail_groups=False, time_out=False):
+        self.fail_transfers = fail_transfers
+        self.fail_groups = fail_groups
+        self.time_out = time_out
+        self.transfers = []
+        self.groups = []
+        self.mints = []
+        self.statuses = {}
+        self.next_asset_id = 1000
+
+    def rewards_enabled(self):
+        return True
+
+    def _send(self, txids, on_submit, sent, item, rejected=False):
+        if on_submit:
+            on_submit(txids, 5000)
+        if rejected:
+            raise services.TransactionRejected('asset not opted in')
+        sent.append(item)
+        if self.time_out:
+            raise TimeoutError('Wait for transaction id timed out')
+        return txids
+
+    def transaction_status(self, txid, last_valid_round):
+        return self.statuses.get(txid, ('pending', None))
+
+    def transfer_skill_tokens(self, wallet, amount, reason, on_submit=None):
+        txid = f'TX{len(self.transfers) + 1}'
+        self._send([txid], on_submit, self.transfers, (wallet, amount, reason), rejected=self.fail_transfers)
+        return txid
+
+    def transfer_skill_tokens_group(self, transfers, on_submit=None):
+        txids = [f'G{len(self.groups) + 1}-{i}' for i in range(len(transfers))]
+        return self._send(txids, on_submit, self.groups, transfers, rejected=self.fail_groups or self.fail_transfers)
+
+    def issue_skill_badge(self, wallet, skill_name, score, topic, on_submit=None):
+        self._send([f'MINT{len(self.mints) + 1}'], on_submit, self.mints, skill_name)
+        self.next_asset_id += 1
+        return {'asset_id': self.next_asset_id}
+
+    def add_pending_tokens(self, user, amount):
+        LearnerProfile.objects.filter(user=user).update(pending_skill_tokens=F('pending_skill_tokens') + amount)
+
+
+@mock.patch.object(blockchain_jobs, 'BATCH_WINDOW_SECONDS', 0)
+class BlockchainJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='minter', password='pw')
+        LearnerProfile.objects.create(user=self.user, algo_wallet='W' * 58)
+        concept = Concept.objects.get(chapter__course=make_course('Algo', chapters=1, concepts=1))
+        self.result = AssessmentResult.objects.create(
+            user=self.user, assessment=Assessment.objects.create(concept=concept), score=90
+        )
+
+    def test_enqueue_is_idempotent(self):
+        for _ in range(3):
+            blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'concept', 7)
+        self.assertEqual(BlockchainJob.objects.count(), 1)
+
+    def test_worker_mints_badge_and_rewards(self):
+        blockchain_jobs.enqueue_badge(self.user, 'W' * 58, self.result)
+        blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'assessment', self.result.id)
+        service = FakeAlgorandService()
+
+        self.assertEqual(blockchain_jobs.drain(service), (2, 0))
+        self.result.refresh_from_db()
+        self.assertEqual(self.result.badge_asset_id, 1001)
+        self.assertEqual(service.groups, [[('W' * 58, 20, 'SkillMeter reward: assessment')]])
+        self.assertEqual(blockchain_jobs.drain(service), (0, 0))
+
+    def test_views_queue_jobs_from_the_environment_without_building_the_service(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        concept = Concept.objects.get(chapter__course__title='Algo')
+        env = {'ALGORAND_MNEMONIC': 'abandon ' * 24 + 'art', 'ALGORAND_BADGE_APP_ID': '5'}
+        with mock.patch('api.views.get_algorand_service') as build, mock.patch.dict(os.environ, env):
+            client.post(reverse('concept_complete', args=[concept.id]))
+            self.assertFalse(BlockchainJob.objects.exists())  # no $SKILL token configured
+            with mock.patch.dict(os.environ, {'ALGORAND_SKILL_TOKEN_ID': '9'}):
+                ConceptProgress.objects.filter(user=self.user).update(completed=False)
+                client.post(reverse('concept_complete', args=[concept.id]))
+        build.assert_not_called()
+        self.assertEqual(list(BlockchainJob.objects.values_list('kind', flat=True)), ['reward'])
+
+    def test_failed_reward_backs_off_then_parks_pending_tokens(self):
+        job = blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'assessment', self.result.id)
+        service = FakeAlgorandService(fail_transfers=True)
+
+        self.assertEqual(blockchain_jobs.drain(service), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('PENDING', 1))
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        self.assertEqual(blockchain_jobs.drain(service), (0, 0))  # not due yet
+
+        for _ in range(blockchain_jobs.MAX_ATTEMPTS - 1):
+            BlockchainJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+            blockchain_jobs.drain(service)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(LearnerProfile.objects.get(user=self.user).pending_skill_tokens, 20)
+
+    def test_retry_requeues_only_failed_and_abandoned_jobs_and_takes_back_parked_tokens(self):
+        parked = blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'assessment', self.result.id)
+        paid_out = blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'course', 1)
+        running = blockchain_jobs.enqueue_badge(self.user, 'W' * 58, self.result)
+        abandoned = blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'concept', 2)
+        stale = timezone.now() - timedelta(seconds=blockchain_jobs.LEASE_SECONDS + 1)
+        BlockchainJob.objects.filter(pk__in=[parked.pk, paid_out.pk]).update(status='FAILED', attempts=6)
+        BlockchainJob.objects.filter(pk=running.pk).update(status='RUNNING', locked_at=timezone.now(), attempts=1)
+        BlockchainJob.objects.filter(pk=abandoned.pk).update(status='RUNNING', locked_at=stale, attempts=2)
+        # The assessment reward's 20 tokens are still parked; the course reward's 100 went out
+        LearnerProfile.objects.filter(user=self.user).update(pending_skill_tokens=20)
+
+        self.assertEqual(blockchain_jobs.retry(BlockchainJob.objects.all()), 2)
+        states = dict(BlockchainJob.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [states[job.pk] for job in (parked, paid_out, running, abandoned)], ['PENDING', 'FAILED', 'RUNNING', 'PENDING']
+        )
+        self.assertEqual(BlockchainJob.objects.get(pk=parked.pk).attempts, 0)
+        self.assertEqual(LearnerProfile.objects.get(user=self.user).pending_skill_tokens, 0)
+
+    def test_unconfirmed_mint_is_checked_on_chain_instead_of_minted_again(self):
+        job = blockchain_jobs.enqueue_badge(self.user, 'W' * 58, self.result)
+        service = FakeAlgorandService(time_out=True)
+
+        self.assertEqual(blockchain_jobs.drain(service), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.submitted['txid']), ('PENDING', 0, 'MINT1'))
+
+        # Still pending on chain: wait, don't mint again and don't use up attempts
+        for _ in range(blockchain_jobs.MAX_ATTEMPTS + 1):
+            BlockchainJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(blockchain_jobs.drain(service), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('PENDING', 0))
+
+        service.statuses['MINT1'] = ('confirmed', {'confirmed-round': 10, 'asset-index': 777})
+        BlockchainJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(blockchain_jobs.drain(service), (1, 0))
+        self.assertEqual(len(service.mints), 1)
+        self.result.refresh_from_db()
+        self.assertEqual(self.result.badge_asset_id, 777)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.submitted), ('DONE', {}))
+
+    def test_dead_transaction_is_replaced(self):
+        job = blockchain_jobs.enqueue_badge(self.user, 'W' * 58, self.result)
+        service = FakeAlgorandService(time_out=True)
+        blockchain_jobs.drain(service)
+
+        service.time_out = False
+        service.statuses['MINT1'] = ('dead', None)
+        BlockchainJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(blockchain_jobs.drain(service), (1, 0))
+        self.assertEqual(len(service.mints), 2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('DONE', 1))
+
+    def test_rewards_are_grouped_per_wallet_and_settle_pending(self):
+        other = User.objects.create_user(username='other', password='pw')
+        LearnerProfile.objects.create(user=other, algo_wallet='X' * 58, pending_skill_tokens=5)
+        blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'assessment', self.result.id)
+        blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'perfect', self.result.id)
+        blockchain_jobs.enqueue_reward(other, 'X' * 58, 'concept', 1)
+        service = FakeAlgorandService()
+
+        self.assertEqual(blockchain_jobs.drain(service), (3, 0))
+        self.assertEqual(len(service.groups), 1)
+        self.assertEqual(sorted((w[0], amt) for w, amt, _ in service.groups[0]), [('W', 30), ('X', 6)])
+        self.assertEqual(LearnerProfile.objects.get(user=other).pending_skill_tokens, 0)
+        self.assertFalse(BlockchainJob.objects.exclude(status='DONE').exists())
+
+    def test_unconfirmed_group_is_not_resent(self):
+        other = User.objects.create_user(username='other', password='pw')
+        LearnerProfile.objects.create(user=other, algo_wallet='X' * 58, pending_skill_tokens=5)
+        blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'assessment', self.result.id)
+        blockchain_jobs.enqueue_reward(other, 'X' * 58, 'concept', 1)
+        service = FakeAlgorandService(time_out=True)
+
+        self.assertEqual(blockchain_jobs.drain(service), (0, 2))
+        self.assertEqual((len(service.groups), service.transfers), (1, []))
+        self.assertEqual(LearnerProfile.objects.get(user=other).pending_skill_tokens, 5)
+
+        service.statuses = {txid: ('confirmed', {'confirmed-round': 10}) for txid in ('G1-0', 'G1-1')}
+        BlockchainJob.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(blockchain_jobs.drain(service), (2, 0))
+        self.assertEqual((len(service.groups), service.transfers), (1, []))
+        self.assertEqual(LearnerProfile.objects.get(user=other).pending_skill_tokens, 0)
+        self.assertEqual(sorted(BlockchainJob.objects.values_list('result__txid', flat=True)), ['G1-0', 'G1-1'])
+
+    def test_group_failure_falls_back_to_single_transfers(self):
+        blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'assessment', self.result.id)
+        blockchain_jobs.enqueue_reward(self.user, 'W' * 58, 'concept', 3)
+        service = FakeAlgorandService(fail_groups=True)
+
+        self.assertEqual(blockchain_jobs.drain(service), (2, 0))
+        self.assertEqual(sorted(r for _, _, r in service.transfers), ['assessment', 'concept'])
+
+
+class _StubAlgodHandler(BaseHTTPRequestHandler):
+    """Minimal algod: /v2/status answers, everything else 404s. Records client ports."""
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        self.server.peers.add(self.client_address[1])
+        if self.path == '/v2/status':
+            code, body = 200, {'last-round': 42}
+        else:
+            code, body = 404, {'message': 'application does not exist'}
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledAlgodClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubAlgodHandler)
+        self.server.peers = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        address = f'http://127.0.0.1:{self.server.server_port}'
+        env = {'ALGORAND_NETWORK': 'localnet', 'ALGORAND_ALGOD_SERVER': address}
+        patcher = mock.patch.dict('os.environ', env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        algorand_client.call_stats.reset()
+
+    def test_shared_client_reuses_connection_and_times_calls(self):
+        client = algorand_client.get_algod_client()
+        self.assertIs(client, algorand_client.get_algod_client())
+        self.assertEqual(client.algod_token, algorand_client.LOCALNET_TOKEN)
+
+        for _ in range(5):
+            self.assertEqual(client.status()['last-round'], 42)
+        self.assertEqual(len(self.server.peers), 1)
+        self.assertEqual(algorand_client.client_stats()['algod GET /v2/status']['calls'], 5)
+
+    def test_http_errors_match_the_sdk(self):
+        from algosdk.error import AlgodHTTPError
+
+        with self.assertRaises(AlgodHTTPError) as ctx:
+            algorand_client.get_algod_client().application_info(123)
+        self.assertEqual(ctx.exception.code, 404)
+        self.assertEqual(str(ctx.exception), 'application does not exist')
+        self.assertEqual(algorand_client.client_stats()['algod GET /v2/applications/:id']['errors'], 1)
+
+
+class FakeParamsAlgod:
+    """algod stand-in whose suggested_params() returns the next round each call."""
+
+    def __init__(self, address='http://node-a', rounds=None):
+        self.algod_address = address
+        self.rounds = iter(rounds or range(100, 10_000))
+
+    def suggested_params(self):
+        return types.SimpleNamespace(first=next(self.rounds))
+
+
+class SuggestedParamsCacheTests(TestCase):
+    def _wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_params_are_served_until_the_ttl_expires(self):
+        cache = algorand_client.SuggestedParamsCache(FakeParamsAlgod(), ttl=60)
+        cache.get().first = 0  # callers get a private copy
+        self.assertEqual([cache.get().first for _ in range(3)], [100, 100, 100])
+
+        cache._fetched_at -= 61
+        self.assertEqual(cache.get().first, 101)
+        self.assertEqual((cache.hits, cache.misses, cache.fetch_count), (3, 2, 2))
+
+    def test_half_expired_entry_is_refreshed_in_the_background(self):
+        cache = algorand_client.SuggestedParamsCache(FakeParamsAlgod(), ttl=60)
+        cache.get()
+        cache._fetched_at -= 31
+        self.assertEqual(cache.get().first, 100)  # served from cache, not waiting on algod
+        self._wait_for(lambda: cache.background_refreshes == 1)
+        self.assertEqual(cache.get().first, 101)
+
+    def test_invalidate_refetches_but_never_goes_back_a_round(self):
+        cache = algorand_client.SuggestedParamsCache(FakeParamsAlgod(rounds=[100, 120, 90]), ttl=60)
+        cache.get()
+        cache.invalidate()
+        self.assertIsNone(cache.last_round)
+        self.assertEqual(cache.get().first, 120)
+        cache._fetch()  # a lagging node answers with an older round
+        self.assertEqual(cache.get().first, 120)
+
+    def test_one_cache_per_node(self):
+        with mock.patch.dict(algorand_client._params_caches, clear=True):
+            first = algorand_client.get_params_cache(FakeParamsAlgod('http://node-a'))
+            self.assertIs(algorand_client.get_params_cache(FakeParamsAlgod('http://node-a')), first)
+            self.assertIsNot(algorand_client.get_params_cache(FakeParamsAlgod('http://node-b')), first)
+
+
+class ImportTimeTests(TestCase):
+    """Loading the URLconf must not import the AI/blockchain SDKs (worker cold start)."""
+    HEAVY_SDKS = ('google.generativeai', 'algosdk', 'algokit_utils')
+    # Cumulative `python -X importtime` budget for backend.urls; about 0.65s
+    # here with the SDKs lazy, ~1.6s when they are imported eagerly.
+    BUDGET_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', '1200'))
+
+    def test_urlconf_import_is_cheap(self):
+        code = (
+            'import sys, django; django.setup(); import backend.urls; '
+            f'print([m for m in {self.HEAVY_SDKS!r} if m in sys.modules])'
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='backend.settings')
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+        self.assertEqual(proc.stdout.strip().splitlines()[-1], '[]', 'SDKs imported at startup')
+
+        cumulative_us = next(
+            int(line.split('|')[1])
+            for line in proc.stderr.splitlines()
+            if line.startswith('import time:') and line.split('|')[2].strip() == 'backend.urls'
+        )
+        self.assertLess(cumulative_us / 1000, self.BUDGET_MS)
+
+
+class YouTubeEnrichmentTests(TestCase):
+    @staticmethod
+    def _search(query):
+        if query.startswith('slow'):
+            time.sleep(2)
+        return {'video_url': f'https://www.youtube.com/embed/{query}', 'thumbnail': 't.jpg'}
+
+    def test_searches_run_concurrently_and_miss_deadline_with_fallback(self):
+        queries = [f'fast {i}' for i in range(8)] + ['slow one', 'fast 0']
+        with mock.patch.object(YouTubeService, 'fetch_video', side_effect=self._search):
+            start = time.monotonic()
+            results = YouTubeService.search_videos(queries, max_workers=8, deadline=0.5)
+            elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(len(results), 9)
+        self.assertEqual(results['fast 3']['video_url'], 'https://www.youtube.com/embed/fast 3')
+        self.assertIn('/results?search_query=slow', results['slow one']['video_url'])
+
+
+class YouTubeCacheTests(TestCase):
+    VIDEO = {'video_url': 'https://www.youtube.com/embed/abc', 'thumbnail': 't.jpg'}
+
+    def test_equivalent_queries_share_one_api_call(self):
+        with mock.patch.object(YouTubeService, 'fetch_video', return_value=self.VIDEO) as fetch:
+            first = YouTubeService.search_video('React hooks tutorial')
+            second = YouTubeService.search_videos(['tutorial: react HOOKS', 'React hooks tutorial'])
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(first, self.VIDEO)
+        self.assertEqual(list(second.values()), [self.VIDEO, self.VIDEO])
+        self.assertEqual(YouTubeSearchCache.objects.get().hits, 1)
+
+    def test_no_results_are_negatively_cached(self):
+        with mock.patch.object(YouTubeService, 'fetch_video', return_value=None) as fetch:
+            YouTubeService.search_video('obscure topic')
+            result = YouTubeService.search_video('obscure topic')
+        self.assertEqual(fetch.call_count, 1)
+        self.assertIn('/results?search_query=', result['video_url'])
+
+    def test_expired_entry_is_served_when_the_api_fails(self):
+        youtube_cache.store({'python lists': self.VIDEO})
+        YouTubeSearchCache.objects.update(fetched_at=timezone.now() - youtube_cache.TTL)
+        with mock.patch.object(YouTubeService, 'fetch_video', side_effect=RuntimeError('quotaExceeded')):
+            self.assertEqual(YouTubeService.search_video('python lists'), self.VIDEO)
+
+    def test_evicts_least_recently_used(self):
+        youtube_cache.store({f'q{i}': self.VIDEO for i in range(5)})
+        YouTubeSearchCache.objects.filter(query='q0').update(last_used_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(youtube_cache.evict(max_entries=4), 1)
+        self.assertFalse(YouTubeSearchCache.objects.filter(query='q0').exists())
+
+
+class CanonicalCourseTests(TestCase):
+    AI_COURSE = {
+        'course': {'title': 'Python Basics', 'description': 'Learn Python'},
+        'chapters': [{'title': 'Intro', 'concepts': [
+            {'title': 'Variables', 'video_url': 'https://www.youtube.com/embed/v1'},
+        ]}],
+    }
+
+    def _generate(self, user, topic, **extra):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(reverse('roadmap_generate_ai'), {'topic': topic, 'skillLevel': 'beginner', **extra}, format='json')
+
+    @mock.patch('api.views.ContentDiscoveryService.search_videos', return_value=AI_COURSE)
+    def test_same_topic_reuses_course_unless_forced(self, search_videos):
+        alice = User.objects.create_user(username='alice', password='pw')
+        bob = User.objects.create_user(username='bob', password='pw')
+
+        first = self._generate(alice, 'Python')
+        second = self._generate(bob, '  python. ')
+        again = self._generate(bob, 'Python')
+        self.assertEqual((first.status_code, second.status_code, again.status_code), (201, 201, 200))
+        self.assertEqual(search_videos.call_count, 1)
+        self.assertEqual(first.data['course']['id'], second.data['course']['id'])
+        self.assertEqual(again.data['id'], second.data['id'])
+
+        forced = self._generate(bob, 'Python', forceRegenerate=True)
+        self.assertEqual(search_videos.call_count, 2)
+        self.assertNotEqual(forced.data['course']['id'], first.data['course']['id'])
+        self.assertEqual(Course.objects.count(), 2)
+
+
+class StreamingRoadmapTests(TestCase):
+    """Runs the view through the ASGI (async) client, as daphne does in production."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='streamer', password='pw')
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.generated = 0
+
+    async def _post(self):
+        return await self.async_client.post(
+            reverse('roadmap_generate_stream'), {'topic': 'Go'}, content_type='application/json', headers=self.auth
+        )
+
+    async def _events(self, response, on_frame=None):
+        events = []
+        async for chunk in response.streaming_content:
+            for frame in chunk.decode().strip().split('\n\n'):
+                name, data = frame.split('\n')
+                events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+                if on_frame:
+                    on_frame(events[-1])
+        return events
+
+    def _stream(self, topic, skill_level, fresh=False, fail_after=None):
+        yield 'course', {'title': 'Go Basics', 'description': 'Learn Go'}
+        for i in range(2):
+            if i == fail_after:
+                raise RuntimeError('stream cut')
+            # The course only becomes reusable once the stream has finished
+            self.assertIsNone(course_catalog.find_canonical(topic, skill_level))
+            self.generated += 1
+            yield 'chapter', {'title': f'Ch {i}', 'thumbnail': 't.jpg', 'concepts': [
+                {'title': f'C{i}', 'video_url': 'https://www.youtube.com/embed/x'},
+            ]}
+
+    async def test_chapters_are_saved_and_emitted_as_they_arrive(self):
+        seen_at = []
+        with mock.patch('api.views.ContentDiscoveryService.stream_course', side_effect=self._stream):
+            response = await self._post()
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertTrue(response.is_async)
+            events = await self._events(response, on_frame=lambda event: seen_at.append(self.generated))
+
+        self.assertEqual([name for name, _ in events], ['course', 'roadmap', 'chapter', 'chapter', 'done'])
+        # The first chapter reached the client before the second was generated
+        self.assertEqual(seen_at[2], 1)
+        self.assertEqual(events[2][1]['concepts'][0]['title'], 'C0')
+        course = await Course.objects.aget()
+        self.assertEqual((course.title, course.thumbnail), ('Go Basics', 't.jpg'))
+        self.assertEqual(await course.chapters.acount(), 2)
+        self.assertEqual(events[-1][1]['course']['id'], course.id)
+        self.assertEqual(await sync_to_async(course_catalog.find_canonical)('Go', 'beginner'), course)
+
+    def test_parser_emits_objects_as_soon_as_they_close(self):
+        from .streaming import CourseStreamParser
+
+        data = {'course': {'title': 'A "quoted" } brace'}, 'chapters': [
+            {'title': f'Ch {i}', 'concepts': [{'title': '[x]'}]} for i in range(3)
+        ]}
+        text = '```json\n' + json.dumps(data) + '\n```'
+        parser, events = CourseStreamParser(), []
+        for i in range(0, len(text), 7):
+            events += parser.feed(text[i:i + 7])
+        self.assertEqual(events, [('course', data['course'])] + [('chapter', ch) for ch in data['chapters']])
+        self.assertTrue(parser.complete)
+
+    async def test_failure_before_first_chapter_leaves_nothing(self):
+        with mock.patch('api.views.ContentDiscoveryService.stream_course', side_effect=RuntimeError('quota')):
+            events = await self._events(await self._post())
+        self.assertEqual(events[-1][0], 'error')
+        self.assertFalse(await Course.objects.aexists())
+        self.assertFalse(await Roadmap.objects.aexists())
+
+    async def test_failure_mid_stream_removes_the_partial_course(self):
+        stream = lambda topic, skill_level, fresh=False: self._stream(topic, skill_level, fresh, fail_after=1)
+        with mock.patch('api.views.ContentDiscoveryService.stream_course', side_effect=stream):
+            events = await self._events(await self._post())
+
+        self.assertEqual([name for name, _ in events], ['course', 'roadmap', 'chapter', 'error'])
+        self.assertFalse(await Course.objects.aexists())
+        self.assertFalse(await Chapter.objects.aexists())
+        self.assertFalse(await Roadmap.objects.aexists())
+        entry = await LeaderboardEntry.objects.aget(user=self.user)
+        self.assertEqual((entry.roadmaps_count, entry.points), (0, 0))
+
+
+class CourseImportTests(TestCase):
+    TREE = {
+        'course': {'title': 'Imported', 'description': 'd', 'tags': ['x']},
+        'chapters': [
+            {'title': f'Ch {i}', 'concepts': [
+                {'title': f'C{i}.{j}', 'duration_minutes': 20,
+                 'assessments': [{'questions': [{'q': 1}], 'time_limit': 5}] if j == 0 else []}
+                for j in range(4)
+            ]}
+            for i in range(5)
+        ],
+    }
+
+    def test_tree_is_inserted_in_bulk_and_round_trips(self):
+        # savepoint, course, chapters, concepts, assessments, release
+        with self.assertNumQueries(6):
+            course = course_import.import_course(self.TREE)
+
+        self.assertEqual(list(course.chapters.values_list('title', 'order'))[:2], [('Ch 0', 1), ('Ch 1', 2)])
+        self.assertEqual(Concept.objects.filter(chapter__course=course, duration=20).count(), 20)
+        self.assertEqual(Assessment.objects.filter(concept__chapter__course=course).count(), 5)
+
+        copy = course_import.import_course(course_import.export_course(course), title='Copy')
+        exported = course_import.export_course(copy)
+        self.assertEqual(exported['chapters'], course_import.export_course(course)['chapters'])
+        self.assertEqual(Course.objects.get(id=copy.id).chapter_sizes, roadmap_progress.chapter_sizes(course.id))
+
+    def test_failure_leaves_no_partial_course(self):
+        broken = {'course': {'title': 'Broken'}, 'chapters': [{'title': 'Ch', 'concepts': [{'title': None}]}]}
+        with self.assertRaises(Exception):
+            course_import.import_course(broken)
+        self.assertFalse(Course.objects.filter(title='Broken').exists())
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.concept = Concept.objects.get(chapter__course=make_course('Shared', chapters=1, concepts=1))
+
+    def test_waiter_reuses_the_leaders_notes(self):
+        # Another worker holds the lease and finishes while we poll
+        GenerationLease.objects.create(key=f'notes:{self.concept.id}', owner='other',
+                                       expires_at=timezone.now() + timedelta(minutes=1))
+
+        def leader_finishes(seconds):
+            concept_content.save_notes(self.concept.id, '# Real notes')
+            GenerationLease.objects.all().delete()
+
+        before = single_flight.stats()
+        with mock.patch('api.services.NotesGeneratorService.generate_notes') as generate, \
+                mock.patch.object(single_flight, '_sleep', side_effect=leader_finishes):
+            response = self.client.post(reverse('concept_generate_notes', args=[self.concept.id]))
+
+        generate.assert_not_called()
+        self.assertEqual(response.data, {'notes': '# Real notes', 'cached': True})
+        self.assertEqual(single_flight.stats()['coalesced'], before['coalesced'] + 1)
+
+    def test_leader_generates_once_and_releases_the_lease(self):
+        with mock.patch('api.services.NotesGeneratorService.generate_notes', return_value='# Fresh') as generate:
+            first = self.client.post(reverse('concept_generate_notes', args=[self.concept.id]))
+            second = self.client.post(reverse('concept_generate_notes', args=[self.concept.id]))
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual((first.data['cached'], second.data['cached']), (False, True))
+        self.assertFalse(GenerationLease.objects.exists())
+
+    def test_failed_generation_shows_a_placeholder_but_stores_nothing(self):
+        with mock.patch('api.services.llm_cache.generate', side_effect=RuntimeError('500 from Gemini')):
+            response = self.client.post(reverse('concept_generate_notes', args=[self.concept.id]))
+        self.assertIn('Notes will be generated', response.data['notes'])
+        self.assertIsNone(concept_content.read_notes(self.concept.id))
+
+        with mock.patch('api.services.NotesGeneratorService.generate_notes', return_value='# Real') as generate:
+            response = self.client.post(reverse('concept_generate_notes', args=[self.concept.id]))
+        generate.assert_called_once()
+        self.assertEqual(response.data, {'notes': '# Real', 'cached': False})
+
+    def test_expired_lease_is_taken_over_and_live_lease_times_out(self):
+        lease = GenerationLease.objects.create(key=f'quiz:{self.concept.id}', owner='crashed',
+                                               expires_at=timezone.now() - timedelta(seconds=1))
+        with mock.patch('api.services.QuizGeneratorService.generate_quiz', return_value=[{'q': 1}]):
+            response = self.client.post(reverse('concept_generate_quiz', args=[self.concept.id]))
+        self.assertEqual(response.data['quiz'], [{'q': 1}])
+        self.assertFalse(GenerationLease.objects.filter(id=lease.id).exists())
+
+        GenerationLease.objects.create(key='notes:busy', owner='other', expires_at=timezone.now() + timedelta(minutes=1))
+        with mock.patch.object(single_flight, '_sleep'), self.assertRaises(single_flight.SingleFlightTimeout):
+            single_flight.run('notes:busy', lambda: 'x', lambda: None, wait_seconds=0)
+
+
+class RuntimeStatsTests(TestCase):
+    def test_staff_can_read_this_process_counters(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='learner', password='pw'))
+        self.assertEqual(client.get(reverse('runtime_stats')).status_code, 403)
+
+        client.force_authenticate(User.objects.create_user(username='ops', password='pw', is_staff=True))
+        data = client.get(reverse('runtime_stats')).json()
+        self.assertEqual(data['pid'], os.getpid())
+        self.assertEqual(data['single_flight'], single_flight.stats())
+        self.assertEqual(data['llm_cache'], llm_cache.stats())
+        self.assertEqual(data['gemini_limiter'], gemini_limiter.stats())
+
+
+class PrefetchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ahead', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        course = make_course('Prefetch', chapters=2, concepts=2)
+        self.concepts = list(Concept.objects.filter(chapter__course=course).order_by('chapter__order', 'order'))
+        Roadmap.objects.create(user=self.user, course=course)
+
+    def test_completion_queues_the_next_concepts_across_chapters(self):
+        concept_content.save_notes(self.concepts[2].id, '# Already written')
+        self.client.post(reverse('concept_complete', args=[self.concepts[1].id]))
+        self.client.post(reverse('concept_complete', args=[self.concepts[1].id]))
+
+        queued = set(PrefetchJob.objects.values_list('concept_id', 'kind'))
+        self.assertEqual(queued, {
+            (self.concepts[2].id, 'quiz'), (self.concepts[3].id, 'notes'), (self.concepts[3].id, 'quiz'),
+        })
+
+    def test_worker_respects_budget_and_lesson_opens_from_cache(self):
+        prefetch.enqueue_after(self.concepts[0], k=1)
+        with mock.patch.object(prefetch, 'DAILY_BUDGET', 1), mock.patch.object(prefetch, 'MAX_CONCURRENCY', 1), \
+                mock.patch('api.services.NotesGeneratorService.generate_notes', return_value='# Prefetched') as generate:
+            self.assertEqual(prefetch.drain(), (1, 0))
+            self.assertEqual(prefetch.drain(), (0, 0))
+            self.assertEqual(prefetch.budget_left(), 0)
+            response = self.client.post(reverse('concept_generate_notes', args=[self.concepts[1].id]))
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(response.data, {'notes': '# Prefetched', 'cached': True})
+        self.assertEqual(PrefetchJob.objects.get(kind='quiz').status, 'PENDING')
+
+    def test_quiz_job_waits_for_the_notes_job(self):
+        prefetch.enqueue_after(self.concepts[0], k=1)
+        with mock.patch('api.services.NotesGeneratorService.generate_notes', return_value='# Prefetched'), \
+                mock.patch('api.services.QuizGeneratorService.generate_quiz', return_value=[{'q': 1}]) as quiz:
+            self.assertEqual(prefetch.drain(), (1, 0))
+            self.assertEqual(PrefetchJob.objects.get(kind='quiz').status, 'PENDING')
+            self.assertEqual(prefetch.drain(), (1, 0))
+
+        quiz.assert_called_once_with(self.concepts[1].title, '# Prefetched')
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel; records every prompt it is sent."""
+
+    def __init__(self, text='{"ok": true}', model_name='models/fake'):
+        self.model_name = model_name
+        self.text = text
+        self.calls = []
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls.append(prompt)
+        if stream:
+            return [mock.Mock(text=self.text[:5]), mock.Mock(text=self.text[5:])]
+        return mock.Mock(text=self.text)
+
+
+class LLMCacheTests(TestCase):
+    def setUp(self):
+        llm_cache._counters.clear()
+        limiter = mock.patch.object(gemini_limiter, 'ENABLED', False)
+        limiter.start()
+        self.addCleanup(limiter.stop)
+
+    def test_db_backend_serves_repeats_and_reports_savings(self):
+        model = FakeModel()
+        with mock.patch.object(llm_cache, '_backend', llm_cache.DatabaseBackend()):
+            first = llm_cache.generate('quiz', model, 'prompt', {'temperature': 0}, parse=json.loads)
+            second = llm_cache.generate('quiz', model, 'prompt', {'temperature': 0}, parse=json.loads)
+            llm_cache.generate('quiz', model, 'prompt', {'temperature': 1}, parse=json.loads)
+            llm_cache.generate('quiz', model, 'prompt', {'temperature': 0}, bypass=True)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(model.calls), 3)
+        self.assertEqual(LLMCacheEntry.objects.count(), 2)
+        stats = llm_cache.stats()['quiz']
+        self.assertEqual((stats['hits'], stats['misses'], stats['bypassed'], stats['hit_ratio']), (1, 2, 1, 0.333))
+
+    def test_rejected_responses_and_expired_entries_are_not_served(self):
+        backend = llm_cache.MemoryBackend(max_entries=1)
+        model = FakeModel(text='not json')
+        with mock.patch.object(llm_cache, '_backend', backend):
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    llm_cache.generate('quiz', model, 'p', parse=json.loads)
+            self.assertEqual(backend.count(), 0)
+
+            model.text = '{"a": 1}'
+            llm_cache.generate('notes', model, 'p1')
+            llm_cache.generate('notes', model, 'p2')
+            self.assertEqual(backend.count(), 1)
+            with mock.patch.object(llm_cache, 'TTL_SECONDS', -1):
+                llm_cache.generate('notes', model, 'p2')
+        self.assertEqual(len(model.calls), 5)
+
+    def test_stream_and_file_backend(self):
+        model = FakeModel(text='{"course": {}}')
+        with tempfile.TemporaryDirectory() as directory:
+            backend = llm_cache.FileBackend(directory, max_entries=5)
+            with mock.patch.object(llm_cache, '_backend', backend):
+                streamed = list(llm_cache.stream('course', model, 'p', validate=json.loads))
+                cached = list(llm_cache.stream('course', model, 'p', validate=json.loads))
+                self.assertEqual(llm_cache.generate('course', model, 'p', parse=json.loads), {'course': {}})
+            self.assertEqual(backend.count(), 1)
+            self.assertEqual(backend.evict(max_entries=0), 1)
+
+        self.assertEqual(len(streamed), 2)
+        self.assertEqual(cached, [model.text])
+        self.assertEqual(len(model.calls), 1)
+
+
+    def test_stream_releases_the_limiter_slot_before_the_caller_is_done(self):
+        released = threading.Event()
+        priorities = []
+
+        @contextlib.contextmanager
+        def slot(call_site, prompt, generation_config=None):
+            priorities.append(gemini_limiter._background.get())
+            yield
+            released.set()
+
+        model = FakeModel(text='{"course": {}}')
+        with mock.patch.object(llm_cache, '_backend', llm_cache.MemoryBackend()), \
+                mock.patch.object(gemini_limiter, 'slot', slot), gemini_limiter.background():
+            chunks = llm_cache.stream('course', model, 'p', validate=json.loads)
+            first = next(chunks)
+            # The consumer is still busy with the first chunk; Gemini is done
+            self.assertTrue(released.wait(5))
+            self.assertEqual(first + ''.join(chunks), model.text)
+        self.assertEqual(priorities, [True])
+
+    def test_stream_error_reaches_the_caller(self):
+        model = FakeModel()
+        model.generate_content = mock.Mock(side_effect=RuntimeError('quota'))
+        with mock.patch.object(llm_cache, '_backend', llm_cache.MemoryBackend()):
+            with self.assertRaisesMessage(RuntimeError, 'quota'):
+                list(llm_cache.stream('course', model, 'p'))
+
+
+class GeminiLimiterTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'limiter.json')
+        self.clock = 1000.0
+
+        def sleep(seconds):
+            self.clock += seconds
+
+        for name, value in (('_now', lambda: self.clock), ('_monotonic', lambda: self.clock), ('_sleep', sleep)):
+            patcher = mock.patch.object(gemini_limiter, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_processes_share_one_bucket_and_callers_wait_for_refill(self):
+        # Two Limiter objects on one file behave like two worker processes
+        first = gemini_limiter.Limiter(self.path, rpm=2, tpm=100_000)
+        second = gemini_limiter.Limiter(self.path, rpm=2, tpm=100_000)
+        first.release(first.acquire('interview_question'))
+        second.release(second.acquire('interview_question'))
+
+        with self.assertRaises(gemini_limiter.RateLimitTimeout):
+            first.acquire('interview_question', deadline=0)
+        start = self.clock
+        first.release(first.acquire('interview_question', deadline=60))
+        self.assertAlmostEqual(self.clock - start, 30, delta=0.5)
+        self.assertEqual(first.stats()['wait_ms']['interview_question'], {'<=10ms': 1, '<=30000ms': 1})
+        self.assertEqual(first.stats()['timeouts'], 1)
+
+    def test_background_work_leaves_headroom_for_interviews(self):
+        limiter = gemini_limiter.Limiter(self.path, rpm=10, tpm=100_000, max_concurrency=2)
+        with gemini_limiter.background():
+            held = limiter.acquire('notes')
+            with self.assertRaises(gemini_limiter.RateLimitTimeout):
+                limiter.acquire('notes', deadline=0)
+        with limiter.slot('interview_question'):
+            pass
+
+        limiter.release(held)
+        with self.assertRaises(RuntimeError), limiter.slot('course'):
+            raise RuntimeError('429 Resource has been exhausted')
+        self.assertEqual(limiter.stats()['throttled'], 1)
+        with self.assertRaises(gemini_limiter.RateLimitTimeout):
+            limiter.acquire('interview_question', deadline=0)
+
+
+class ModelRegistryTests(TestCase):
+    def test_handles_are_built_once_per_configuration(self):
+        genai = mock.Mock(GenerativeModel=mock.Mock(side_effect=lambda *a, **k: object()))
+        with mock.patch.object(services, 'get_genai', return_value=genai), mock.patch.dict(services._models, clear=True):
+            notes = services.get_model('gemini-3-flash-preview')
+            self.assertIs(services.get_model('gemini-3-flash-preview'), notes)
+            self.assertIs(services.get_model('gemini-3-flash-preview', generation_config={'b': 1, 'a': 2}),
+                          services.get_model('gemini-3-flash-preview', generation_config={'a': 2, 'b': 1}))
+            self.assertIsNot(services.get_model('gemini-3-flash-preview', system_instruction='Be brief'), notes)
+        self.assertEqual(genai.GenerativeModel.call_count, 3)
+        genai.configure.assert_not_called()
+
+
+class ConceptNotesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='noter', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.course = make_course('Notes', chapters=1, concepts=2)
+        self.concept, self.other = Concept.objects.filter(chapter__course=self.course).order_by('order')
+
+    def test_notes_are_compressed_and_kept_out_of_course_trees(self):
+        text = '# Lists\n\n' + 'Lists are ordered, mutable sequences. ' * 200
+        concept_content.save_notes(self.concept.id, text)
+
+        row = ConceptNotes.objects.get(concept=self.concept)
+        self.assertTrue(row.compressed)
+        self.assertLess(len(bytes(row.body)), row.size // 10)
+        self.assertEqual(concept_content.read_notes(self.concept.id), text)
+
+        course = self.client.get(reverse('course_detail', args=[self.course.id])).data
+        concepts = course['chapters'][0]['concepts']
+        self.assertEqual([c['hasNotes'] for c in concepts], [True, False])
+        self.assertNotIn('notes', concepts[0])
+
+        tree = course_import.export_course(self.course)
+        self.assertEqual(tree['chapters'][0]['concepts'][0]['notes'], text)
+        copy = course_import.import_course(tree, title='Copy')
+        self.assertEqual(course_import.export_course(copy)['chapters'], tree['chapters'])
+
+    def test_notes_endpoint_revalidates_with_etag(self):
+        self.assertEqual(self.client.get(reverse('concept_notes', args=[self.other.id])).status_code, 404)
+
+        concept_content.save_notes(self.concept.id, '# Short')
+        url = reverse('concept_notes', args=[self.concept.id])
+        first = self.client.get(url)
+        self.assertEqual(first.data, {'notes': '# Short'})
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        concept_content.save_notes(self.concept.id, '# Rewritten')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((changed.status_code, changed.data['notes']), (200, '# Rewritten'))
+
+
+class DailyPlannerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='planner', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        LearnerProfile.objects.create(user=self.user, daily_study_time=45)
+        self.older, self.recent = make_course('Older', 1, 3), make_course('Recent', 1, 3)
+        for course, days_ago in ((self.older, 2), (self.recent, 0)):
+            roadmap = Roadmap.objects.create(user=self.user, course=course)
+            Roadmap.objects.filter(id=roadmap.id).update(last_accessed_at=timezone.now() - timedelta(days=days_ago))
+        first = Concept.objects.get(chapter__course=self.recent, order=1)
+        ConceptProgress.objects.create(user=self.user, concept=first, completed=True)
+        self.today = timezone.now().date()
+
+    def test_plans_round_robin_across_roadmaps_within_study_time(self):
+        self.assertEqual(daily_planner.plan_day(self.today), (1, 3))
+        titles = list(DailyTask.objects.filter(user=self.user).order_by('id').values_list('title', flat=True))
+        # Most recently opened roadmap first, its completed concept skipped, 3 x 15 min = 45 min
+        self.assertEqual(titles, ['Complete: Recent c0.1', 'Complete: Older c0.0', 'Complete: Recent c0.2'])
+
+        # Idempotent: a second run (or the view's fallback) adds nothing
+        self.assertEqual(daily_planner.plan_day(self.today), (1, 0))
+        self.assertEqual(daily_planner.plan_users([self.user.id], self.today), 0)
+
+    def test_counts_only_rows_it_inserted(self):
+        candidates = daily_planner._candidates
+
+        def planned_concurrently(user_ids):
+            # Another planner inserts one of the same tasks after our check for existing ones
+            concept = Concept.objects.get(chapter__course=self.older, order=1)
+            DailyTask.objects.create(user=self.user, concept=concept, title='x', scheduled_date=self.today)
+            return candidates(user_ids)
+
+        with mock.patch.object(daily_planner, '_candidates', side_effect=planned_concurrently):
+            self.assertEqual(daily_planner.plan_users([self.user.id], self.today), 2)
+        self.assertEqual(DailyTask.objects.filter(user=self.user, scheduled_date=self.today).count(), 3)
+
+    def test_task_list_reads_planned_tasks(self):
+        daily_planner.plan_day(self.today)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('task_list'))
+        self.assertEqual(len(response.data), 3)
+
+    def test_task_list_plans_unplanned_learner_once(self):
+        Roadmap.objects.filter(user=self.user).update(last_accessed_at=timezone.now() - timedelta(days=90))
+        self.assertEqual(daily_planner.plan_day(self.today), (0, 0))
+
+        self.assertEqual(len(self.client.get(reverse('task_list')).data), 3)
+        DailyTask.objects.filter(user=self.user).update(completed=True)
+        # Finishing today's tasks does not plan a second batch
+        self.assertEqual(self.client.get(reverse('task_list')).data, [])
+        self.assertEqual(DailyTask.objects.filter(user=self.user).count(), 3)
+
+
+@mock.patch.object(ranking.RankIndex, 'LOAD', 4)
+class RankIndexTests(TestCase):
+    def _expected(self, scores):
+        ordered = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(rank, username, points) for rank, (username, points) in enumerate(ordered, start=1)]
+
+    def test_matches_a_sorted_list_through_inserts_updates_and_removes(self):
+        rng = random.Random(7)
+        index, scores = ranking.RankIndex(), {}
+        for step in range(600):
+            username = f'u{rng.randrange(60):02d}'
+            if step % 5 == 4:
+                index.remove(username)
+                scores.pop(username, None)
+            else:
+                points = rng.randrange(0, 100, 10)  # coarse, so there are plenty of ties
+                index.update(username, points)
+                scores[username] = points
+            if step % 50 == 0:
+                expected = self._expected(scores)
+                self.assertEqual(index.top(len(scores) + 3), expected)
+                for rank, username, _ in expected:
+                    self.assertEqual(index.rank(username), rank)
+        self.assertGreater(len(index._buckets), 2)  # buckets split at 2 * LOAD
+
+    def test_load_and_positional_queries(self):
+        index = ranking.RankIndex()
+        index.load([('cy', 30), ('al', 50), ('bo', 30), ('di', 10), ('ed', 10), ('fa', 0)] +
+                   [(f'z{i:02d}', 0) for i in range(10)])
+        self.assertEqual(index.top(3), [(1, 'al', 50), (2, 'bo', 30), (3, 'cy', 30)])
+        self.assertEqual(index.around('di', radius=1), [(3, 'cy', 30), (4, 'di', 10), (5, 'ed', 10)])
+        self.assertEqual(index.around('al', radius=1), [(1, 'al', 50), (2, 'bo', 30)])
+        self.assertEqual(index.slice(14, 40), [(15, 'z08', 0), (16, 'z09', 0)])
+        # Not in the index: ranked where they would sort with their points
+        self.assertEqual(index.rank('ca', 30), 3)
+        self.assertEqual(index.rank('newcomer'), 7)
+
+    def test_ties_are_broken_by_username(self):
+        index = ranking.RankIndex()
+        for username in ('mo', 'ab', 'zz', 'ka'):
+            index.update(username, 20)
+        self.assertEqual([row[1] for row in index.top(4)], ['ab', 'ka', 'mo', 'zz'])
+        index.update('zz', 30)
+        self.assertEqual(index.rank('zz'), 1)
+        self.assertEqual(index.rank('mo'), 4)
+
+
+class RankServiceTests(TestCase):
+    def setUp(self):
+        ranking._service.invalidate()
+        self.users = [User.objects.create_user(username=f'r{i}', password='pw') for i in range(3)]
+        for i, user in enumerate(self.users):
+            LeaderboardEntry.objects.create(user=user, username=user.username, concepts_completed=i, points=10 * i)
+
+    def tearDown(self):
+        ranking._service.invalidate()
+
+    def test_rank_top_and_around_match_the_database(self):
+        newcomer = self.users[0]  # no completed concept yet
+        self.assertEqual(ranking.top(5), [(1, 'r2', 20), (2, 'r1', 10)])
+        self.assertEqual(ranking.rank_of(newcomer), 3)
+        self.assertEqual(ranking.around(newcomer, 1), [(2, 'r1', 10), (3, 'r0', 0)])
+
+    def test_signal_updates_the_index_without_a_sync(self):
+        ranking.top(5)
+        with mock.patch.object(ranking, 'SYNC_INTERVAL', 3600):
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(3):
+                    leaderboard.record_concept_completed(self.users[0])
+            self.assertEqual(ranking.top(1), [(1, 'r0', 30)])
+
+    def test_rolled_back_change_never_reaches_the_index(self):
+        ranking.top(5)
+        with mock.patch.object(ranking, 'SYNC_INTERVAL', 3600), self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                for _ in range(3):
+                    leaderboard.record_concept_completed(self.users[0])
+                raise RuntimeError('request failed')
+            self.assertEqual(ranking.top(1), [(1, 'r2', 20)])
+
+    def test_sync_picks_up_rows_stamped_behind_the_watermark(self):
+        ranking.top(5)
+        watermark = ranking._service._watermark
+        # Another worker with a lagging clock commits after this process synced
+        LeaderboardEntry.objects.filter(user=self.users[1]).update(
+            points=90, updated_at=watermark - timedelta(seconds=ranking.SYNC_OVERLAP // 2)
+        )
+        ranking._service._synced_at -= ranking.SYNC_INTERVAL + 1
+        self.assertEqual(ranking.top(1), [(1, 'r1', 90)])
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.course = make_course('Board', chapters=1, concepts=3)
+        self.concepts = list(Concept.objects.filter(chapter__course=self.course))
+        self.users = [User.objects.create_user(username=name, password='pw') for name in ('bea', 'abe', 'cal')]
+
+    def _complete(self, user, concepts):
+        for concept in concepts:
+            ConceptProgress.objects.create(user=user, concept=concept, completed=True)
+            leaderboard.record_concept_completed(user)
+
+    def _entries(self):
+        return list(LeaderboardEntry.objects.order_by('user_id').values_list(
+            'user_id', 'username', 'concepts_completed', 'roadmaps_count', 'points',
+        ))
+
+    def test_incremental_updates_match_a_rebuild(self):
+        bea, abe, _ = self.users
+        course_catalog.enroll(bea, self.course)
+        self._complete(bea, self.concepts)
+        course_catalog.enroll(abe, self.course)
+        self._complete(abe, self.concepts[:1])
+        Roadmap.objects.filter(user=abe).delete()
+        leaderboard.record_roadmap_deleted(abe)
+
+        incremental = self._entries()
+        self.assertEqual(incremental, [(bea.id, 'bea', 3, 1, 80), (abe.id, 'abe', 1, 0, 10)])
+        call_command('rebuild_leaderboard', stdout=io.StringIO())
+        self.assertEqual(self._entries(), incremental)
+        self.assertEqual(leaderboard.rebuild_user(abe).points, 10)
+
+    def test_rebuild_all_drops_stale_rows_and_users_without_activity(self):
+        bea, abe, cal = self.users
+        self._complete(bea, self.concepts[:2])
+        LeaderboardEntry.objects.filter(user=bea).update(points=999)
+        LeaderboardEntry.objects.create(user=cal, username='cal', concepts_completed=4, points=40)
+        with mock.patch.object(ranking._service, 'invalidate') as invalidate:
+            self.assertEqual(leaderboard.rebuild_all(), 1)
+        invalidate.assert_called_once()
+        self.assertEqual(self._entries(), [(bea.id, 'bea', 2, 0, 20)])
+
+    def test_rank_of_breaks_ties_by_username(self):
+        bea, abe, cal = self.users
+        self._complete(bea, self.concepts[:1])
+        self._complete(abe, self.concepts[:1])
+        ranking._service.invalidate()
+        self.assertEqual([ranking.rank_of(user) for user in self.users], [2, 1, 3])
+        self.assertEqual(ranking.top(), [(1, 'abe', 10), (2, 'bea', 10)])
+        ranking._service.invalidate()
+
+    def test_concurrent_first_activity_updates_the_row_it_lost_to(self):
+        bea = self.users[0]
+        ConceptProgress.objects.create(user=bea, concept=self.concepts[0], completed=True)
+        update_or_create = LeaderboardEntry.objects.update_or_create
+        calls = []
+
+        def racing(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                # The other request inserts the row between our lookup and insert
+                LeaderboardEntry.objects.create(user=bea, username='bea')
+                raise IntegrityError('UNIQUE constraint failed: api_leaderboardentry.user_id')
+            return update_or_create(**kwargs)
+
+        with mock.patch.object(LeaderboardEntry.objects, 'update_or_create', side_effect=racing):
+            leaderboard.record_concept_completed(bea)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self._entries(), [(bea.id, 'bea', 1, 0, 10)])
+
+    def test_rename_follows_into_entry_and_rank_index(self):
+        bea = self.users[0]
+        self._complete(bea, self.concepts[:1])
+        ranking._service.invalidate()
+        self.assertEqual(ranking.top(5), [(1, 'bea', 10)])
+        bea.username = 'beatrix'
+        with self.captureOnCommitCallbacks(execute=True):
+            bea.save()
+        self.assertEqual(LeaderboardEntry.objects.get(user=bea).username, 'beatrix')
+        self.assertEqual(ranking.top(5), [(1, 'beatrix', 10)])
+        ranking._service.invalidate()
+
+
+class ConcurrentCompletionTests(TransactionTestCase):
+    """Parallel completions from one learner must count every concept exactly once."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tabs', password='pw')
+        course = make_course('Race', chapters=2, concepts=3)
+        Roadmap.objects.create(user=self.user, course=course)
+        self.concepts = list(Concept.objects.filter(chapter__course=course).order_by('chapter__order', 'order'))[:4]
+        yesterday = timezone.now().date() - timedelta(days=1)
+        UserProgress.objects.create(user=self.user, current_streak=6, longest_streak=6, last_activity_date=yesterday)
+        leaderboard.rebuild_user(self.user)
+
+    def _complete(self, concept, barrier, statuses):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            barrier.wait()
+            statuses.append(client.post(reverse('concept_complete', args=[concept.id])).status_code)
+        finally:
+            connections.close_all()
+
+    @mock.patch('api.views.prefetch.enqueue_after')
+    @mock.patch('api.views._queue_reward')
+    def test_parallel_completions_count_exactly_once(self, queue_reward, _):
+        # Every concept is completed by three "tabs" at once
+        requests = [concept for concept in self.concepts for _ in range(3)]
+        barrier, statuses = threading.Barrier(len(requests)), []
+        threads = [threading.Thread(target=self._complete, args=(c, barrier, statuses)) for c in requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [200] * len(requests))
+        stats = UserProgress.objects.get(user=self.user)
+        self.assertEqual(
+            (stats.total_concepts_completed, stats.total_minutes_learned, stats.current_streak, stats.longest_streak),
+            (4, 4 * 15, 7, 7),
+        )
+        self.assertEqual(DailyActivity.objects.get(user=self.user).concepts_completed, 4)
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.user).concepts_completed, 4)
+        reasons = [call.args[1] for call in queue_reward.call_args_list]
+        self.assertEqual((reasons.count('concept'), reasons.count('streak')), (4, 1))
+
+
+class DailyActivityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='charted', password='pw')
+        self.other = User.objects.create_user(username='bystander', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        course = make_course('Chart', chapters=2, concepts=4)
+        concepts = list(Concept.objects.filter(chapter__course=course).order_by('chapter__order', 'order'))
+        for i, concept in enumerate(concepts):
+            Concept.objects.filter(pk=concept.pk).update(duration=5 * (i + 1))
+        now = timezone.now()
+        for concept, days_ago in zip(concepts, (0, 0, 1, 3, 6, 7, 200, 400)):
+            ConceptProgress.objects.create(
+                user=self.user, concept=concept, completed=True, completed_at=now - timedelta(days=days_ago),
+            )
+        ConceptProgress.objects.create(user=self.other, concept=concepts[0], completed=True, completed_at=now)
+        Roadmap.objects.create(user=self.user, course=course)
+        self.assertEqual(activity.rebuild(), 8)
+
+    def _old_daily_progress(self):
+        today = timezone.now().date()
+        daily = []
+        for i in range(6, -1, -1):
+            date = today - timedelta(days=i)
+            completed = ConceptProgress.objects.filter(
+                user=self.user, completed=True, completed_at__date=date
+            ).aggregate(minutes=Sum('concept__duration'), count=Count('id'))
+            daily.append({
+                'date': date.isoformat(),
+                'minutesLearned': completed['minutes'] or 0,
+                'conceptsCompleted': completed['count'] or 0,
+            })
+        return daily
+
+    def _old_heatmap(self):
+        start_date = timezone.now().date() - timedelta(days=365)
+        rows = ConceptProgress.objects.filter(
+            user=self.user, completed=True, completed_at__date__gte=start_date
+        ).values('completed_at__date').annotate(count=Count('id'))
+        return {row['completed_at__date'].isoformat(): row['count'] for row in rows}
+
+    def test_chart_and_heatmap_match_the_old_aggregates(self):
+        data = self.client.get(reverse('user_stats')).json()
+        self.assertEqual(data['dailyProgress'], self._old_daily_progress())
+        self.assertEqual(self.client.get(reverse('activity_log')).json(), self._old_heatmap())
+
+    def test_last_days_fills_gaps_oldest_first(self):
+        days = activity.last_days(self.user, 3)
+        today = timezone.now().date()
+        self.assertEqual([day for day, _ in days], [today - timedelta(days=2), today - timedelta(days=1), today])
+        self.assertIsNone(days[0][1])
+        self.assertEqual((days[2][1].concepts_completed, days[2][1].minutes_learned), (2, 15))
+
+    def test_rebuild_for_some_users_leaves_the_rest(self):
+        DailyActivity.objects.filter(user=self.user).update(concepts_completed=50)
+        DailyActivity.objects.filter(user=self.other).update(concepts_completed=9)
+        self.assertEqual(activity.rebuild(User.objects.filter(pk=self.user.pk)), 7)
+        self.assertEqual(self.client.get(reverse('activity_log')).json(), self._old_heatmap())
+        self.assertEqual(DailyActivity.objects.get(user=self.other).concepts_completed, 9)
+
+    def test_courses_enrolled_counts_roadmaps_not_the_leaderboard_counter(self):
+        LeaderboardEntry.objects.update_or_create(user=self.user, defaults={'username': 'charted', 'roadmaps_count': 7})
+        self.assertEqual(self.client.get(reverse('user_stats')).json()['totalCoursesEnrolled'], 1)
+
+
+class LearningEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='logger', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.course = make_course('Events', chapters=1, concepts=3)
+        self.concepts = list(Concept.objects.filter(chapter__course=self.course).order_by('order'))
+        course_catalog.enroll(self.user, self.course)
+        # Two earlier days of history, then today's completion through the API
+        now = timezone.now()
+        for days_ago, concept in ((2, self.concepts[0]), (1, self.concepts[1])):
+            ConceptProgress.objects.create(user=self.user, concept=concept, completed=True)
+            events.record(self.user, 'concept_completed', concept.id, now - timedelta(days=days_ago), minutes=15)
+        self.client.post(reverse('concept_complete', args=[self.concepts[2].id]))
+        self.client.post(reverse('concept_complete', args=[self.concepts[2].id]))
+
+    def _snapshot(self):
+        return (
+            list(DailyActivity.objects.filter(user=self.user).order_by('date').values_list(
+                'date', 'minutes_learned', 'concepts_completed',
+            )),
+            UserProgress.objects.values_list(
+                'total_concepts_completed', 'total_minutes_learned', 'current_streak', 'longest_streak',
+                'last_activity_date',
+            ).get(user=self.user),
+            LeaderboardEntry.objects.values_list('concepts_completed', 'roadmaps_count', 'points').get(user=self.user),
+        )
+
+    def test_endpoints_append_events_and_projections_follow(self):
+        kinds = list(LearningEvent.objects.filter(user=self.user).values_list('kind', flat=True))
+        self.assertEqual(kinds, ['roadmap_started'] + ['concept_completed'] * 3)
+        activity_rows, progress, entry = self._snapshot()
+        self.assertEqual(len(activity_rows), 3)
+        self.assertEqual(progress[:4], (3, 45, 3, 3))
+        self.assertEqual(entry, (3, 1, 80))
+
+    def test_replay_rebuilds_projections_and_resumes_from_checkpoint(self):
+        expected = self._snapshot()
+        other = User.objects.create_user(username='later', password='pw')
+        events.record(other, 'concept_completed', self.concepts[0].id, minutes=5)
+        DailyActivity.objects.all().delete()
+        UserProgress.objects.filter(user=self.user).update(current_streak=40, total_concepts_completed=99)
+        UserProgress.objects.filter(user=other).update(total_concepts_completed=7)
+        LeaderboardEntry.objects.filter(user=self.user).update(points=0)
+
+        apply = events.PROJECTORS['user_progress'].apply
+
+        def crash_on_later(event):
+            if event.user_id == other.id:
+                raise RuntimeError('worker killed')
+            return apply(event)
+
+        with mock.patch.object(events.PROJECTORS['user_progress'], 'apply', side_effect=crash_on_later):
+            with self.assertRaises(RuntimeError):
+                events.replay('user_progress', batch_size=2)
+        # The first learner was rebuilt; the second kept its old row rather than a zeroed one
+        self.assertEqual(ProjectionCheckpoint.objects.get(name='user_progress').last_user_id, self.user.id)
+        self.assertEqual(UserProgress.objects.get(user=other).total_concepts_completed, 7)
+
+        self.assertEqual(events.replay('user_progress', batch_size=2, resume=True), 1)
+        self.assertEqual(UserProgress.objects.get(user=other).total_concepts_completed, 1)
+        call_command('replay_events', 'daily_activity', 'leaderboard', '--batch-size', '2', stdout=io.StringIO())
+        self.assertEqual(self._snapshot(), expected)
+
+    def test_late_event_for_an_earlier_day_keeps_the_streak(self):
+        today = timezone.now().date()
+        events.record(self.user, 'concept_completed', self.concepts[0].id, timezone.now() - timedelta(days=5), minutes=10)
+        progress = UserProgress.objects.get(user=self.user)
+        self.assertEqual((progress.current_streak, progress.last_activity_date), (3, today))
+        self.assertEqual(progress.total_minutes_learned, 55)
+
+
+class RoadmapCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counter', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.course = make_course('Counted', chapters=2, concepts=2)
+        self.concepts = list(Concept.objects.filter(chapter__course=self.course).order_by('chapter__order', 'order'))
+        self.roadmap, _ = course_catalog.enroll(self.user, self.course)
+
+    def _state(self):
+        roadmap = Roadmap.objects.get(id=self.roadmap.id)
+        return (roadmap.completed_count, roadmap.total_count, roadmap.progress,
+                roadmap.current_chapter, roadmap.current_concept)
+
+    def _complete(self, concept):
+        self.client.post(reverse('concept_complete', args=[concept.id]))
+
+    def test_counters_follow_completions_and_course_changes(self):
+        self.assertEqual(self._state(), (0, 4, 0, 0, 0))
+        self._complete(self.concepts[0])
+        self._complete(self.concepts[0])
+        self.assertEqual(self._state(), (1, 4, 25, 0, 1))
+        self._complete(self.concepts[1])
+        self.assertEqual(self._state(), (2, 4, 50, 1, 0))
+
+        course_import.add_chapters(self.course, [{'title': 'Extra', 'concepts': [{'title': 'e1'}, {'title': 'e2'}]}], 3)
+        self.assertEqual(self._state(), (2, 6, 33, 1, 0))
+        self.concepts[0].delete()
+        self.assertEqual(self._state(), (1, 5, 20, 1, 0))
+
+        for concept in Concept.objects.filter(chapter__course=self.course):
+            self._complete(concept)
+        self.assertEqual(self._state(), (5, 5, 100, 2, 1))
+        self.assertIsNotNone(Roadmap.objects.get(id=self.roadmap.id).completed_at)
+
+    def test_completion_uses_the_cached_chapter_sizes(self):
+        def sizes():
+            return Course.objects.get(id=self.course.id).chapter_sizes
+
+        self.assertEqual(sizes(), [2, 2])
+        with mock.patch.object(roadmap_progress, 'chapter_sizes', side_effect=AssertionError('recounted')):
+            self._complete(self.concepts[0])
+            self._complete(self.concepts[1])
+        self.assertEqual(self._state(), (2, 4, 50, 1, 0))
+
+        # Every change to the course's tree refreshes the cache
+        self.concepts[0].chapter = self.concepts[2].chapter
+        self.concepts[0].save()
+        self.assertEqual(sizes(), [1, 3])
+        Chapter.objects.filter(id=self.concepts[2].chapter_id).update(order=0)
+        Chapter.objects.get(id=self.concepts[2].chapter_id).save()
+        self.assertEqual(sizes(), [3, 1])
+        course_import.add_chapters(self.course, [{'title': 'Extra', 'concepts': [{'title': 'e1'}]}], 3)
+        self.assertEqual(sizes(), [3, 1, 1])
+        self.concepts[1].delete()
+        self.assertEqual(sizes(), [3, 0, 1])
+        self.assertEqual(self._state(), (1, 4, 25, 0, 1))
+
+    def test_reconcile_repairs_drift(self):
+        self._complete(self.concepts[0])
+        expected = self._state()
+        Roadmap.objects.filter(id=self.roadmap.id).update(completed_count=3, total_count=9, progress=33)
+        Course.objects.filter(id=self.course.id).update(chapter_sizes=[9])
+
+        out = io.StringIO()
+        call_command('reconcile_roadmaps', stdout=out)
+        self.assertIn('1 had drifted', out.getvalue())
+        self.assertEqual(self._state(), expected)
+        self.assertEqual(Course.objects.get(id=self.course.id).chapter_sizes, [2, 2])
+
+
+class _StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server: accepts every message, records sessions and messages."""
+
+    def handle(self):
+        self.server.sessions.append(self.client_address[1])
+        self.wfile.write(b'220 stub ESMTP\r\n')
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command == b'DATA':
+                self.wfile.write(b'354 end with .\r\n')
+                self.server.messages.append(b''.join(iter(self.rfile.readline, b'.\r\n')))
+            if command == b'QUIT':
+                self.wfile.write(b'221 bye\r\n')
+                return
+            self.wfile.write(b'250 OK\r\n')
+
+
+class _StubTwilioHandler(BaseHTTPRequestHandler):
+    """Fake Twilio Messages API: accepts every message. Records client ports and bodies."""
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        self.server.peers.add(self.client_address[1])
+        form = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        self.server.posts.append((self.path, form))
+        payload = json.dumps({'sid': f'SM{len(self.server.posts)}', 'status': 'queued'}).encode()
+        self.send_response(201)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='notified', password='pw', email='notified@example.com')
+        LearnerProfile.objects.create(user=self.user, phone_number='+15550001111')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _serve(self, server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server.server_address[1]
+
+    def test_course_completion_is_queued_and_sent_by_the_worker(self):
+        course = make_course('Notify', chapters=1, concepts=1)
+        course_catalog.enroll(self.user, course)
+        self.client.post(reverse('concept_complete', args=[Concept.objects.get(chapter__course=course).id]))
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(set(NotificationLog.objects.values_list('notification_type', 'status')),
+                         {('EMAIL', 'PENDING'), ('WHATSAPP', 'PENDING')})
+
+        with mock.patch('api.notification_outbox.deliver_whatsapp') as whatsapp:
+            self.assertEqual(notification_outbox.drain(), (2, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Notify', mail.outbox[0].subject)
+        whatsapp.assert_called_once()
+        self.assertFalse(NotificationLog.objects.exclude(status='SENT').exists())
+
+    def test_users_without_an_address_are_skipped_at_queue_time(self):
+        nobody = User.objects.create_user(username='unreachable', password='pw')
+        self.assertFalse(notification_outbox.queue_email(nobody, 'Hi', 'Hello'))
+        self.assertFalse(notification_outbox.queue_whatsapp(nobody, 'Hello'))
+        self.assertFalse(NotificationLog.objects.exists())
+
+    def test_email_batch_shares_smtp_connections(self):
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _StubSMTPHandler)
+        server.sessions, server.messages = [], []
+        port = self._serve(server)
+        for i in range(6):
+            attachment = ('cert.pdf', b'%PDF-1.4', 'application/pdf') if i == 0 else None
+            notification_outbox.queue_email(self.user, f'Message {i}', 'Hello', attachment)
+
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                               EMAIL_HOST='127.0.0.1', EMAIL_PORT=port, EMAIL_USE_TLS=False,
+                               EMAIL_HOST_USER=None, EMAIL_HOST_PASSWORD=None), \
+                mock.patch.object(notification_outbox, 'EMAIL_CONCURRENCY', 2):
+            self.assertEqual(notification_outbox.drain_channel('EMAIL', limit=4), (4, 0))
+            self.assertEqual(len(server.sessions), 2)
+            with mock.patch.object(notification_outbox, 'EMAIL_CONCURRENCY', 1):
+                self.assertEqual(notification_outbox.drain_channel('EMAIL'), (2, 0))
+
+        self.assertEqual(len(server.sessions), 3)
+        self.assertEqual(len(server.messages), 6)
+        self.assertIn(b'cert.pdf', b''.join(server.messages))
+        self.assertFalse(NotificationLog.objects.filter(attachment__isnull=False).exists())
+
+    def test_failed_sends_back_off_then_fail(self):
+        job = notification_outbox.queue_email(self.user, 'Flaky', 'Hello')
+        with mock.patch('api.notification_outbox.deliver_email', side_effect=OSError('connection refused')):
+            for attempt in range(1, notification_outbox.MAX_ATTEMPTS + 1):
+                self.assertEqual(notification_outbox.drain(), (0, 1))
+                self.assertEqual(notification_outbox.drain(), (0, 0))  # not due yet
+                job.refresh_from_db()
+                self.assertEqual(job.attempts, attempt)
+                NotificationLog.objects.filter(id=job.id).update(next_attempt_at=timezone.now())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(job.error_message, 'connection refused')
+
+    def test_whatsapp_goes_to_fake_twilio_over_one_client(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _StubTwilioHandler)
+        server.peers, server.posts = set(), []
+        port = self._serve(server)
+        notifications._twilio_client = None
+        self.addCleanup(setattr, notifications, '_twilio_client', None)
+        for i in range(3):
+            notification_outbox.queue_whatsapp(self.user, f'Ping {i}')
+
+        with override_settings(TWILIO_API_URL=f'http://127.0.0.1:{port}', TWILIO_ACCOUNT_SID='ACtest',
+                               TWILIO_AUTH_TOKEN='token', TWILIO_WHATSAPP_NUMBER='+15559990000'), \
+                mock.patch.object(notification_outbox, 'WHATSAPP_CONCURRENCY', 1):
+            self.assertEqual(notification_outbox.drain(), (3, 0))
+
+        self.assertEqual(len(server.posts), 3)
+        self.assertTrue(all(path == '/2010-04-01/Accounts/ACtest/Messages.json' for path, _ in server.posts))
+        self.assertIn('whatsapp%3A%2B15550001111', server.posts[0][1])
+        self.assertEqual(len(server.peers), 1)
@@ -6,12 +6,12 @@ from .views import (
     LearnerProfileView, CourseListView, CourseDetailView,
     RoadmapListCreateView, RoadmapDetailView, mark_concept_complete,
     AssessmentDetailView, submit_assessment, complete_task,
-    mark_notification_read, generate_concept_notes, generate_concept_quiz,
+    mark_notification_read, generate_concept_notes, concept_notes, generate_concept_quiz,
     LabListCreateView, LabDetailView, generate_certificate,
     study_sessions_view, study_session_stats, verify_certificate,
-    generate_roadmap_ai, DailyTaskListView, NotificationListView, 
+    generate_roadmap_ai, generate_roadmap_stream, DailyTaskListView, NotificationListView, 
     UserStatsView, ActivityLogView,
-    get_leaderboard, get_trending_topics,
+    get_leaderboard, get_leaderboard_around, get_trending_topics, runtime_stats,
     MentorListCreateView, MentorDetailView, BookingCreateView, 
     BookingListView, MentorDashboardBookingListView, update_booking_status,
     mentor_stats_view, mentor_availability_view, mentor_payments_view,
@@ -51,15 +51,19 @@ urlpatterns = [
     
     path('roadmaps/', RoadmapListCreateView.as_view(), name='roadmap_list'),
     path('roadmaps/generate/', generate_roadmap_ai, name='roadmap_generate_ai'),
+    path('roadmaps/generate/stream/', generate_roadmap_stream, name='roadmap_generate_stream'),
     path('roadmaps/<int:pk>/', RoadmapDetailView.as_view(), name='roadmap_detail'),
     path('roadmaps/<int:roadmap_id>/certificate/', generate_certificate, name='roadmap_certificate'),
     path('roadmaps/<int:roadmap_id>/mint-nft/', mint_certificate_nft, name='roadmap_mint_nft'),
     path('certificates/verify/<str:cert_id>/', verify_certificate, name='certificate_verify'),
     path('leaderboard/', get_leaderboard, name='leaderboard'),
+    path('leaderboard/around/', get_leaderboard_around, name='leaderboard_around'),
     path('trending/', get_trending_topics, name='trending_topics'),
+    path('ops/stats/', runtime_stats, name='runtime_stats'),
     
     path('concepts/<int:concept_id>/complete/', mark_concept_complete, name='concept_complete'),
     path('concepts/<int:concept_id>/generate-notes/', generate_concept_notes, name='concept_generate_notes'),
+    path('concepts/<int:concept_id>/notes/', concept_notes, name='concept_notes'),
     path('concepts/<int:concept_id>/generate-quiz/', generate_concept_quiz, name='concept_generate_quiz'),
     
     path('assessments/<int:pk>/', AssessmentDetailView.as_view(), name='assessment_detail'),
@@ -1,31 +1,90 @@
-from django.core.mail import send_mail, EmailMessage
+import threading
+
+from django.core.mail import EmailMessage
 from django.conf import settings
-from twilio.rest import Client
 from ..models import NotificationLog
 
+_twilio_client = None
+_twilio_lock = threading.Lock()
+
+
+def get_twilio_client():
+    """
+    One long-lived Twilio client per process, so its HTTP session (and the
+    TLS connection to Twilio) is reused instead of rebuilt per message.
+    Set TWILIO_API_URL to send to a fake Twilio endpoint instead.
+    """
+    global _twilio_client
+    if _twilio_client is None:
+        with _twilio_lock:
+            if _twilio_client is None:
+                from twilio.http.http_client import TwilioHttpClient
+                from twilio.rest import Client
+
+                api_url = getattr(settings, 'TWILIO_API_URL', None)
+                http_client = _redirecting_http_client(api_url) if api_url else TwilioHttpClient()
+                _twilio_client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+    return _twilio_client
+
+
+def _redirecting_http_client(api_url):
+    from twilio.http.http_client import TwilioHttpClient
+
+    class RedirectingHttpClient(TwilioHttpClient):
+        """Sends every Twilio API call to `api_url` (a local fake) instead of api.twilio.com."""
+
+        def request(self, method, url, *args, **kwargs):
+            url = url.replace('https://api.twilio.com', api_url.rstrip('/'), 1)
+            return super().request(method, url, *args, **kwargs)
+
+    return RedirectingHttpClient()
+
+
+def deliver_email(to, subject, message, attachment=None, connection=None):
+    """Send one email; raises on failure. Pass an open `connection` to reuse it."""
+    email = EmailMessage(
+        subject=subject,
+        body=message,
+        from_email=settings.EMAIL_HOST_USER,
+        to=[to],
+        connection=connection,
+    )
+    if attachment:
+        email.attach(*attachment)
+    email.send()
+
+
+def deliver_whatsapp(to, message_body):
+    """Send one WhatsApp message through the shared Twilio client; raises on failure."""
+    return get_twilio_client().messages.create(
+        from_=f"whatsapp:{settings.TWILIO_WHATSAPP_NUMBER}",
+        body=message_body,
+        to=f"whatsapp:{to}"
+    )
+
+
+def whatsapp_number(user):
+    """The user's WhatsApp number, or None if they have no profile/number."""
+    if not hasattr(user, 'profile') or not user.profile.phone_number:
+        return None
+    return str(user.profile.phone_number)
+
+
 def send_email_notification(user, subject, message, attachment=None):
     """
-    Sends an email notification via Django's SMTP backend.
-    Logs the attempt in NotificationLog.
+    Sends an email notification via Django's SMTP backend, right now.
+    Logs the attempt in NotificationLog. Views queue instead
+    (api.notification_outbox.queue_email).
     Attachment format: ('filename.pdf', content, 'application/pdf')
     """
     try:
-        email = EmailMessage(
-            subject=subject,
-            body=message,
-            from_email=settings.EMAIL_HOST_USER,
-            to=[user.email]
-        )
-        if attachment:
-            email.attach(*attachment)
-        
-        email.send()
-        
+        deliver_email(user.email, subject, message, attachment)
+
         # Log success
         NotificationLog.objects.create(
             user=user,
             notification_type='EMAIL',
-            event_name=subject,
+            event_name=subject[:100],
             recipient=user.email,
             status='SENT'
         )
@@ -36,7 +95,7 @@ def send_email_notification(user, subject, message, attachment=None):
         NotificationLog.objects.create(
             user=user,
             notification_type='EMAIL',
-            event_name=subject,
+            event_name=subject[:100],
             recipient=user.email,
             status='FAILED',
             error_message=str(e)
@@ -46,40 +105,35 @@ def send_email_notification(user, subject, message, attachment=None):
 
 def send_whatsapp_notification(user, message_body):
     """
-    Sends a WhatsApp notification via Twilio Sandbox.
-    Logs the attempt in NotificationLog.
+    Sends a WhatsApp notification via Twilio Sandbox, right now.
+    Logs the attempt in NotificationLog. Views queue instead
+    (api.notification_outbox.queue_whatsapp).
     Requires user to have a 'profile' with 'phone_number'.
     """
+    # Check if user has a profile and phone number
+    phone_number = whatsapp_number(user)
+    if not phone_number:
+        print("⚠️ User has no phone profile/number")
+        return False
+
     try:
-        # Check if user has a profile and phone number
-        if not hasattr(user, 'profile') or not user.profile.phone_number:
-            print("⚠️ User has no phone profile/number")
-            return False
-
-        # Init Twilio Client
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        
-        message = client.messages.create(
-            from_=f"whatsapp:{settings.TWILIO_WHATSAPP_NUMBER}",
-            body=message_body,
-            to=f"whatsapp:{user.profile.phone_number}"
-        )
-        
+        deliver_whatsapp(phone_number, message_body)
+
         NotificationLog.objects.create(
             user=user,
             notification_type='WHATSAPP',
             event_name="WhatsApp Message",
-            recipient=str(user.profile.phone_number),
+            recipient=phone_number,
             status='SENT'
         )
-        print(f"✅ WhatsApp sent to {user.profile.phone_number}")
+        print(f"✅ WhatsApp sent to {phone_number}")
         return True
     except Exception as e:
         NotificationLog.objects.create(
             user=user,
             notification_type='WHATSAPP',
             event_name="WhatsApp Message",
-            recipient=str(getattr(user.profile, 'phone_number', 'Unknown')),
+            recipient=phone_number,
             status='FAILED',
             error_message=str(e)
         )
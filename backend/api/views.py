@@ -1,6 +1,6 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes, parser_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -101,20 +101,26 @@ from .models import (
 from .serializers import (
     LearnerProfileSerializer, CourseSerializer, RoadmapSerializer,
     ConceptProgressSerializer, AssessmentSerializer, AssessmentResultSerializer,
-    DailyTaskSerializer, NotificationSerializer, UserProgressSerializer
+    DailyTaskSerializer, NotificationSerializer, UserProgressSerializer, ChapterSerializer,
+    completed_concept_ids
 )
-from .utils.notifications import send_email_notification, send_whatsapp_notification
 from django.utils import timezone
 from datetime import timedelta
 from django.db.models import Count, Sum, F
-from .services import ContentDiscoveryService, NotesGeneratorService, QuizGeneratorService, AlgorandService
+from .services import (
+    ContentDiscoveryService, NotesGeneratorService, algorand_configured, get_algorand_service, rewards_configured,
+)
+from . import (
+    activity, blockchain_jobs, concept_content, course_catalog, course_import, daily_planner, events, gemini_limiter,
+    llm_cache, notification_outbox, prefetch, ranking, roadmap_progress, single_flight,
+)
+from .streaming import sse_event
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
 import logging
+import os
 
-# Algorand service singleton (fail-safe — never breaks app startup)
-try:
-    _algo_service = AlgorandService()
-except Exception:
-    _algo_service = None
+logger = logging.getLogger(__name__)
 
 def _get_algo_wallet(user):
     """Get user's Algorand wallet address. Returns None if not set."""
@@ -125,6 +131,19 @@ def _get_algo_wallet(user):
         return None
 
 
+def _queue_reward(user, reason, obj):
+    """
+    Queue a $SKILL reward; the blockchain worker performs the transfer.
+    `obj` identifies the rewarded action so the same action is never paid twice.
+    """
+    try:
+        wallet = _get_algo_wallet(user)
+        if wallet and rewards_configured():
+            blockchain_jobs.enqueue_reward(user, wallet, reason, obj)
+    except Exception as e:
+        logging.error(f"Algorand {reason} reward enqueue failed: {e}")
+
+
 class LearnerProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = LearnerProfileSerializer
     permission_classes = [IsAuthenticated]
@@ -133,35 +152,56 @@ class LearnerProfileView(generics.RetrieveUpdateAPIView):
         return LearnerProfile.objects.get_or_create(user=self.request.user)[0]
 
 
-class CourseListView(generics.ListAPIView):
-    queryset = Course.objects.all()
+class CourseTreeMixin:
+    """
+    For views that serialize full Course -> Chapter -> Concept trees:
+    the user's completed concept IDs are loaded once and handed to
+    ConceptSerializer through the context instead of one query per concept.
+    """
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['completed_concept_ids'] = completed_concept_ids(self.request.user)
+        return context
+
+
+class CourseListView(CourseTreeMixin, generics.ListAPIView):
+    queryset = Course.objects.prefetch_related('chapters__concepts')
     serializer_class = CourseSerializer
     permission_classes = [AllowAny]
 
 
-class CourseDetailView(generics.RetrieveAPIView):
-    queryset = Course.objects.all()
+class CourseDetailView(CourseTreeMixin, generics.RetrieveAPIView):
+    queryset = Course.objects.prefetch_related('chapters__concepts')
     serializer_class = CourseSerializer
     permission_classes = [AllowAny]
 
 
-class RoadmapListCreateView(generics.ListCreateAPIView):
+class RoadmapListCreateView(CourseTreeMixin, generics.ListCreateAPIView):
     serializer_class = RoadmapSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Roadmap.objects.filter(user=self.request.user)
+        return Roadmap.objects.filter(user=self.request.user).select_related('course').prefetch_related(
+            'course__chapters__concepts'
+        )
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        roadmap = serializer.save(user=self.request.user)
+        events.record(self.request.user, 'roadmap_started', roadmap.course_id, roadmap.started_at)
 
 
-class RoadmapDetailView(generics.RetrieveUpdateDestroyAPIView):
+class RoadmapDetailView(CourseTreeMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = RoadmapSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Roadmap.objects.filter(user=self.request.user)
+        return Roadmap.objects.filter(user=self.request.user).select_related('course').prefetch_related(
+            'course__chapters__concepts'
+        )
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        events.record(self.request.user, 'roadmap_removed', instance.course_id)
 
 
 @api_view(['POST'])
@@ -176,92 +216,59 @@ def mark_concept_complete(request, concept_id):
             concept=concept
         )
         
-        # Check if already completed to avoid double counting
-        was_completed = progress.completed
-        
-        progress.completed = True
-        progress.completed_at = timezone.now()
-        progress.save()
+        # Check if already completed to avoid double counting: only the
+        # request whose UPDATE flips `completed` counts the completion
+        completed_at = timezone.now()
+        was_completed = not ConceptProgress.objects.filter(id=progress.id, completed=False).update(
+            completed=True, completed_at=completed_at
+        )
+
+        # --- Event log: leaderboard (+10 points), daily activity and stats (only if newly completed) ---
+        projected = {}
+        if not was_completed:
+            projected = events.record(
+                request.user, 'concept_completed', concept.id, completed_at,
+                minutes=concept.duration, course=concept.chapter.course_id,
+            )
 
         # --- Algorand: Award 1 $SKILL token for concept completion (only if newly completed) ---
+        if not was_completed:
+            _queue_reward(request.user, 'concept', concept.id)
+
+        # --- Prefetch notes/quizzes for the next lessons (background worker) ---
         if not was_completed:
             try:
-                wallet = _get_algo_wallet(request.user)
-                if _algo_service and wallet:
-                    _algo_service.reward_skill_tokens(wallet, 'concept', user=request.user)
+                prefetch.enqueue_after(concept)
             except Exception as e:
-                logging.error(f"Algorand concept reward failed: {e}")
+                logging.error(f"Prefetch enqueue failed: {e}")
 
-        # --- Update Roadmap Progress ---
+        # --- Update Roadmap Progress (counters on the roadmap, see api.roadmap_progress) ---
         course = concept.chapter.course
-        total_concepts = Concept.objects.filter(chapter__course=course).count()
-        completed_concepts_count = ConceptProgress.objects.filter(
-            user=request.user, 
-            concept__chapter__course=course, 
-            completed=True
-        ).count()
-        
-        if total_concepts > 0:
-            roadmap_progress = int((completed_concepts_count / total_concepts) * 100)
-            Roadmap.objects.filter(user=request.user, course=course).update(progress=roadmap_progress)
-
+        if not was_completed and roadmap_progress.record_completion(request.user, course.id) == 100:
             # --- Notification Trigger: Course Completion (100%) ---
-            if roadmap_progress == 100:
-                # Set the completion timestamp (Root Fix: Accurate completion date)
-                Roadmap.objects.filter(user=request.user, course=course, completed_at__isnull=True).update(completed_at=timezone.now())
-                
+            # Set the completion timestamp once; only the request that sets it notifies
+            if Roadmap.objects.filter(user=request.user, course=course, completed_at__isnull=True).update(completed_at=timezone.now()):
                 print(f"🎉 Triggering Completion Notifications for {request.user.username}")
+                # Queued; sent by the notification worker (api.notification_outbox)
                 # 1. Email
-                send_email_notification(
+                notification_outbox.queue_email(
                     user=request.user,
                     subject=f"Congratulations! You Completed {course.title} 🎓",
                     message=f"Hi {request.user.username},\n\nFantastic job completing the '{course.title}' course! You have mastered all the concepts.\n\nKeep up the great learning stride!\n\n- The SkillMeter Team"
                 )
                 # 2. WhatsApp
-                send_whatsapp_notification(
+                notification_outbox.queue_whatsapp(
                     user=request.user,
                     message_body=f"🚀 Milestone Unlocked: You just finished '{course.title}' on SkillMeter! 🎓 Good job!"
                 )
 
                 # --- Algorand: $SKILL reward for course completion ---
-                try:
-                    wallet = _get_algo_wallet(request.user)
-                    if _algo_service and wallet:
-                        _algo_service.reward_skill_tokens(wallet, 'course', user=request.user)
-                except Exception as e:
-                    logging.error(f"Algorand course reward failed: {e}")
-
-        # --- Update User Global Stats ---
-        if not was_completed:
-            user_stats, _ = UserProgress.objects.get_or_create(user=request.user)
-            user_stats.total_concepts_completed += 1
-            user_stats.total_minutes_learned += concept.duration
-            
-            # Update Streak
-            today = timezone.now().date()
-            if user_stats.last_activity_date != today:
-                one_day_ago = today - timezone.timedelta(days=1)
-                
-                if user_stats.last_activity_date == one_day_ago:
-                    user_stats.current_streak += 1
-                elif user_stats.last_activity_date is None or user_stats.last_activity_date < one_day_ago:
-                    user_stats.current_streak = 1
-                
-                user_stats.last_activity_date = today
-                
-                if user_stats.current_streak > user_stats.longest_streak:
-                    user_stats.longest_streak = user_stats.current_streak
-
-                # --- Algorand: $SKILL reward for 7-day streak milestones ---
-                if user_stats.current_streak > 0 and user_stats.current_streak % 7 == 0:
-                    try:
-                        wallet = _get_algo_wallet(request.user)
-                        if _algo_service and wallet:
-                            _algo_service.reward_skill_tokens(wallet, 'streak', user=request.user)
-                    except Exception as e:
-                        logging.error(f"Algorand streak reward failed: {e}")
-            
-            user_stats.save()
+                _queue_reward(request.user, 'course', course.id)
+
+        # --- Algorand: $SKILL reward for 7-day streak milestones ---
+        streak = projected.get('user_progress')
+        if streak and streak % 7 == 0:
+            _queue_reward(request.user, 'streak', completed_at.date().isoformat())
         
         return Response({'status': 'Concept marked as complete'})
     except Concept.DoesNotExist:
@@ -300,39 +307,26 @@ def submit_assessment(request, assessment_id):
             score=score,
             answers=answers
         )
+        events.record(
+            request.user, 'assessment_submitted', result.id, result.completed_at,
+            concept=assessment.concept_id, score=score,
+        )
 
-        # --- Algorand: Badge NFT + $SKILL rewards ---
+        # --- Algorand: Badge NFT + $SKILL rewards (queued, minted by the blockchain worker) ---
         try:
             wallet = _get_algo_wallet(request.user)
-            print(f"DEBUG badge: _algo_service={_algo_service}, enabled={getattr(_algo_service,'enabled',None)}, wallet={wallet}, score={score}")
-            if _algo_service and wallet:
+            if wallet and algorand_configured():
                 # Mint badge NFT if score >= 10 (TEMP: lowered for testing, change back to 70 for production)
                 if score >= 10:
-                    print(f"DEBUG badge: calling issue_skill_badge for concept '{assessment.concept.title}' score={score}")
-                    badge = _algo_service.issue_skill_badge(
-                        wallet, assessment.concept.title[:30], score, str(assessment.concept.id)
-                    )
-                    print(f"DEBUG badge: result = {badge}")
-                    if badge and badge.get('asset_id'):
-                        result.badge_asset_id = badge['asset_id']
-                        result.save()
-                        print(f"DEBUG badge: SAVED asset_id={badge['asset_id']} to result #{result.id}")
-                    else:
-                        print(f"DEBUG badge: badge returned no asset_id — badge={badge}")
-                else:
-                    print(f"DEBUG badge: score {score} < 10, skipping badge")
-
-                # $SKILL rewards fire for ALL completed assessments (regardless of score)
-                _algo_service.reward_skill_tokens(wallet, 'assessment', user=request.user)
-                # Bonus for perfect score
-                if score == 100:
-                    _algo_service.reward_skill_tokens(wallet, 'perfect', user=request.user)
-            else:
-                print(f"DEBUG badge: SKIPPED — service={bool(_algo_service)}, wallet={wallet}")
+                    blockchain_jobs.enqueue_badge(request.user, wallet, result)
         except Exception as e:
-            logging.error(f"Algorand assessment hook failed: {e}")
-            print(f"DEBUG badge EXCEPTION: {e}")
+            logging.error(f"Algorand badge enqueue failed: {e}")
 
+        # $SKILL rewards fire for ALL completed assessments (regardless of score)
+        _queue_reward(request.user, 'assessment', result.id)
+        # Bonus for perfect score
+        if score == 100:
+            _queue_reward(request.user, 'perfect', result.id)
 
         serializer = AssessmentResultSerializer(result)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -350,50 +344,14 @@ class DailyTaskListView(generics.ListAPIView):
         return DailyTask.objects.filter(user=self.request.user, completed=False, scheduled_date=today)
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        
-        # If no tasks exist for today, generate them from current roadmap
-        if not queryset.exists():
-            self._generate_daily_tasks(request.user)
-            queryset = self.get_queryset()
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
-
-    def _generate_daily_tasks(self, user):
-        """Generate up to 3 tasks from user's current roadmap uncompleted concepts."""
+        # Tasks are planned nightly (plan_daily_tasks); a learner the planner
+        # skipped as inactive gets today's plan on their first visit
         today = timezone.now().date()
-        
-        # Get user's roadmaps
-        roadmaps = Roadmap.objects.filter(user=user)
-        if not roadmaps.exists():
-            return
-        
-        # Get first roadmap (primary course)
-        roadmap = roadmaps.first()
-        course = roadmap.course
-        
-        # Find uncompleted concepts
-        completed_concept_ids = ConceptProgress.objects.filter(
-            user=user, completed=True
-        ).values_list('concept_id', flat=True)
-        
-        uncompleted_concepts = Concept.objects.filter(
-            chapter__course=course
-        ).exclude(id__in=completed_concept_ids).order_by('chapter__order', 'order')[:3]
-        
-        # Create tasks
-        for concept in uncompleted_concepts:
-            DailyTask.objects.get_or_create(
-                user=user,
-                concept=concept,
-                scheduled_date=today,
-                defaults={
-                    'task_type': 'video',
-                    'title': f"Complete: {concept.title}",
-                    'completed': False
-                }
-            )
+        if not DailyTask.objects.filter(user=request.user, scheduled_date=today).exists():
+            daily_planner.plan_users([request.user.id], today)
+
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return Response(serializer.data)
 
 
 @api_view(['POST'])
@@ -401,16 +359,11 @@ class DailyTaskListView(generics.ListAPIView):
 def complete_task(request, task_id):
     try:
         task = DailyTask.objects.get(id=task_id, user=request.user)
-        task.completed = True
-        task.save()
+        if DailyTask.objects.filter(id=task.id, completed=False).update(completed=True):
+            events.record(request.user, 'task_completed', task.id, concept=task.concept_id)
 
         # --- Algorand: $SKILL reward for daily task ---
-        try:
-            wallet = _get_algo_wallet(request.user)
-            if _algo_service and wallet:
-                _algo_service.reward_skill_tokens(wallet, 'daily_task', user=request.user)
-        except Exception as e:
-            logging.error(f"Algorand daily task reward failed: {e}")
+        _queue_reward(request.user, 'daily_task', task.id)
 
         return Response({'status': 'Task completed'})
     except DailyTask.DoesNotExist:
@@ -450,46 +403,9 @@ class UserStatsView(generics.RetrieveAPIView):
         data = serializer.data
         
         # Calculate Rank (Consistent with Leaderboard API)
+        # O(log N) lookup in the in-process rank index
         try:
-            from django.contrib.auth.models import User
-            # Get all users with some progress
-            users_with_progress = User.objects.filter(concept_progress__completed=True).distinct()
-            
-            leaderboard_data = [] # List of dicts {username, points}
-            
-            # 1. Calculate scores for all users
-            for user in users_with_progress:
-                concepts = ConceptProgress.objects.filter(user=user, completed=True).count()
-                roadmaps = Roadmap.objects.filter(user=user).count()
-                score = (concepts * 10) + (roadmaps * 50)
-                
-                leaderboard_data.append({
-                    'username': user.username,
-                    'points': score
-                })
-
-            # Check if current user is in the list, if not add them (score 0 or enrollment only)
-            if not any(u['username'] == request.user.username for u in leaderboard_data):
-                my_roadmaps = Roadmap.objects.filter(user=request.user).count()
-                my_score = (0 * 10) + (my_roadmaps * 50)
-                leaderboard_data.append({
-                    'username': request.user.username,
-                    'points': my_score
-                })
-
-            # 2. Deterministic Sort: Points DESC, then Username ASC
-            # We sort by (-points, username) to achieve Descending Points and Ascending Username
-            leaderboard_data.sort(key=lambda x: (-x['points'], x['username']))
-            
-            # 3. Find my rank
-            rank = 0
-            for i, entry in enumerate(leaderboard_data):
-                if entry['username'] == request.user.username:
-                    rank = i + 1
-                    break
-            
-            data['rank'] = rank
-            
+            data['rank'] = ranking.rank_of(request.user)
         except Exception as e:
             print(f"Error calculating rank: {e}")
             data['rank'] = 0
@@ -500,45 +416,11 @@ class UserStatsView(generics.RetrieveAPIView):
 @permission_classes([IsAuthenticated])
 def get_leaderboard(request):
     try:
-        from django.contrib.auth.models import User
-        
-        # Calculate leaderboard from actual data:
-        # - concepts_completed: Count of completed ConceptProgress per user
-        # - courses_progress: Sum of progress across Roadmaps
-        
-        leaderboard = []
-        
-        # Get all users who have any learning activity
-        users_with_progress = User.objects.filter(
-            concept_progress__completed=True
-        ).distinct()
-        
-        for user in users_with_progress:
-            # Count completed concepts
-            concepts_completed = ConceptProgress.objects.filter(
-                user=user, completed=True
-            ).count()
-            
-            # Calculate score: concepts * 10 + each course enrollment * 50
-            roadmaps_count = Roadmap.objects.filter(user=user).count()
-            score = (concepts_completed * 10) + (roadmaps_count * 50)
-            
-            leaderboard.append({
-                'rank': 0,
-                'name': f"{user.first_name} {user.last_name}".strip() or user.username,
-                'username': user.username, # Added for sorting stability
-                'points': score,
-                'badge': ''
-            })
-        
-        # Deterministic Sort: Points DESC, then Username ASC
-        # This matches the UserStatsView rank calculation exactly
-        leaderboard.sort(key=lambda x: (-x['points'], x['username']))
-        
-        # Take top 5 and assign ranks/badges
-        top_5 = leaderboard[:5]
-        for i, entry in enumerate(top_5):
-            entry['rank'] = i + 1
+        # Score: concepts * 10 + each course enrollment * 50, ordered by
+        # (points DESC, username ASC) in the in-process rank index
+        top_5 = _leaderboard_rows(ranking.top(5))
+        for entry in top_5:
+            i = entry['rank'] - 1
             if i == 0: entry['badge'] = '🥇'
             elif i == 1: entry['badge'] = '🥈'
             elif i == 2: entry['badge'] = '🥉'
@@ -550,6 +432,42 @@ def get_leaderboard(request):
         return Response({'error': str(e)}, status=500)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_leaderboard_around(request):
+    """
+    Returns the learners ranked just above and below the current user.
+    Optional ?radius= (default 2, max 10).
+    """
+    try:
+        radius = min(max(int(request.query_params.get('radius', 2)), 0), 10)
+    except ValueError:
+        return Response({'error': 'radius must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = _leaderboard_rows(ranking.around(request.user, radius))
+    for entry in rows:
+        entry['isMe'] = entry['username'] == request.user.username
+    return Response(rows)
+
+
+def _leaderboard_rows(ranked):
+    """Turn [(rank, username, points), ...] into leaderboard response rows."""
+    names = {
+        u.username: f"{u.first_name} {u.last_name}".strip() or u.username
+        for u in User.objects.filter(username__in=[username for _, username, _ in ranked])
+    }
+    return [
+        {
+            'rank': rank,
+            'name': names.get(username, username),
+            'username': username,
+            'points': points,
+            'badge': ''
+        }
+        for rank, username, points in ranked
+    ]
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_concept_notes(request, concept_id):
@@ -559,26 +477,47 @@ def generate_concept_notes(request, concept_id):
     """
     try:
         concept = Concept.objects.get(id=concept_id)
+
+        # Concurrent requests (and the prefetch worker) share one Gemini call
+        try:
+            notes, outcome = concept_content.get_notes(concept)
+        except (single_flight.SingleFlightTimeout, gemini_limiter.RateLimitTimeout):
+            raise
+        except Exception as e:
+            # Nothing was stored, so the next request asks Gemini again
+            logging.warning(f"Notes generation failed for concept {concept.id}: {e}")
+            return Response({'notes': NotesGeneratorService.placeholder(concept.title), 'cached': False})
+        return Response({'notes': notes, 'cached': outcome != 'leader'})
         
-        # Check if notes already exist (not placeholder)
-        if concept.notes and not concept.notes.endswith('*Notes will be generated when you start this lesson.*'):
-            return Response({'notes': concept.notes, 'cached': True})
-        
-        # Generate notes using AI
-        notes = NotesGeneratorService.generate_notes(concept.title, concept.description)
-        
-        # Save to database
-        concept.notes = notes
-        concept.save()
-        
-        return Response({'notes': notes, 'cached': False})
-        
+    except single_flight.SingleFlightTimeout:
+        return Response({'error': 'Notes are still being generated, try again shortly'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except gemini_limiter.RateLimitTimeout:
+        return Response({'error': 'AI is busy right now, try again shortly'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Concept.DoesNotExist:
         return Response({'error': 'Concept not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def concept_notes(request, concept_id):
+    """
+    Serves a concept's stored notes (course trees only carry hasNotes).
+    Responses carry an ETag; a request with a matching If-None-Match gets
+    a 304 without the notes body being read from the database.
+    """
+    etag = concept_content.stored_etag(concept_id)
+    if etag is None:
+        return Response({'error': 'Notes not generated yet', 'hasNotes': False}, status=status.HTTP_404_NOT_FOUND)
+
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+    if_none_match = request.headers.get('If-None-Match', '')
+    if any(tag.strip().removeprefix('W/') in (f'"{etag}"', '*') for tag in if_none_match.split(',')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response({'notes': concept_content.read_notes(concept_id)}, headers=headers)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_concept_quiz(request, concept_id):
@@ -588,58 +527,96 @@ def generate_concept_quiz(request, concept_id):
     """
     try:
         concept = Concept.objects.get(id=concept_id)
-        
-        # Check if quiz already exists for this concept
-        existing_assessment = Assessment.objects.filter(concept=concept).first()
-        if existing_assessment and existing_assessment.questions:
-            return Response({
-                'quiz': existing_assessment.questions, 
-                'assessment_id': existing_assessment.id,
-                'cached': True
-            })
-        
-        # Generate quiz using AI
-        quiz_data = QuizGeneratorService.generate_quiz(concept.title, concept.notes or concept.description)
-        
-        if not quiz_data:
+
+        # Concurrent requests (and the prefetch worker) share one Gemini call
+        assessment, outcome = concept_content.get_quiz(concept)
+        if assessment is None:
             return Response({'error': 'Failed to generate quiz'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        # Create or update assessment
-        assessment, created = Assessment.objects.get_or_create(
-            concept=concept,
-            defaults={'questions': quiz_data, 'time_limit': 10}
-        )
-        if not created:
-            assessment.questions = quiz_data
-            assessment.save()
-        
         return Response({
-            'quiz': quiz_data, 
+            'quiz': assessment.questions, 
             'assessment_id': assessment.id,
-            'cached': False
+            'cached': outcome != 'leader'
         })
         
+    except single_flight.SingleFlightTimeout:
+        return Response({'error': 'Quiz is still being generated, try again shortly'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except gemini_limiter.RateLimitTimeout:
+        return Response({'error': 'AI is busy right now, try again shortly'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Concept.DoesNotExist:
         return Response({'error': 'Concept not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _ai_chapter(chap_data, order):
+    """Map an AI-generated chapter onto the course_import tree format."""
+    concepts = []
+    for concept_data in chap_data.get('concepts', []):
+        # Skip inline Notes/Quiz generation for speed - generate on demand later
+        
+        # Construct Search URL for video
+        # Prioritize real video URL from YouTube API
+        if 'video_url' in concept_data and concept_data['video_url']:
+             video_url = concept_data['video_url']
+        else:
+             # Fallback to search query
+             query = concept_data.get('video_search_query', concept_data.get('title', ''))
+             video_url = f"https://www.youtube.com/results?search_query={query.replace(' ', '+')}"
+        
+        concepts.append({
+            'title': concept_data['title'],
+            'description': concept_data.get('description', ''),
+            'video_url': video_url,
+            'duration': concept_data.get('duration_minutes', 15),
+            'content_type': 'video',
+        })
+    return {'title': chap_data.get('title', f"Chapter {order}"), 'concepts': concepts}
+
+
+def _course_fields(course_data, topic, skill_level):
+    return {
+        'title': course_data.get('title', f"Learn {topic}"),
+        'description': course_data.get('description', f"AI-generated course for {topic}"),
+        'thumbnail': course_data.get('thumbnail', ''), # Use dynamic thumbnail
+        'difficulty': skill_level,
+        'estimated_hours': course_data.get('estimated_hours', 10),
+        'tags': course_data.get('tags', [topic, 'AI Generated']),
+    }
+
+
+def _force_regenerate(request):
+    return str(request.data.get('forceRegenerate', '')).lower() in ('1', 'true', 'yes')
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_roadmap_ai(request):
     """
     Generates a personalized roadmap using Gemini.
+    If a course was already generated for the same (topic, skillLevel) the
+    learner is enrolled on it instead; pass forceRegenerate=true to get a
+    freshly generated course.
     """
     topic = request.data.get('topic')
     skill_level = request.data.get('skillLevel', 'beginner')
+    force = _force_regenerate(request)
     
     if not topic:
         return Response({'error': 'Topic is required'}, status=status.HTTP_400_BAD_REQUEST)
 
     print(f"DEBUG: generate_roadmap_ai called for topic: {topic}")
+
+    # 0. Reuse the canonical course for this topic/level if there is one
+    if not force:
+        course = course_catalog.find_canonical(topic, skill_level)
+        if course:
+            logger.info(f"Reusing canonical course {course.id} for topic: {topic}")
+            roadmap, created = course_catalog.enroll(request.user, course)
+            serializer = RoadmapSerializer(roadmap)
+            return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
     
     # 1. Discover Content
-    ai_data = ContentDiscoveryService.search_videos(topic, skill_level)
+    ai_data = ContentDiscoveryService.search_videos(topic, skill_level, fresh=force)
     print(f"DEBUG: ContentDiscoveryService returned: {ai_data is not None}")
     
     if not ai_data:
@@ -653,72 +630,148 @@ def generate_roadmap_ai(request):
 
     course_data = ai_data['course']
     
-    # 2. Create Course Structure
-    course = Course.objects.create(
-        title=course_data.get('title', f"Learn {topic}"),
-        description=course_data.get('description', f"AI-generated course for {topic}"),
-        thumbnail=course_data.get('thumbnail', ''), # Use dynamic thumbnail
-        difficulty=skill_level,
-        estimated_hours=course_data.get('estimated_hours', 10),
-        tags=course_data.get('tags', [topic, 'AI Generated'])
-    )
-    
-    # 3. Create Chapters and Concepts
+    # 2-3. Create Course, Chapters and Concepts (bulk, one transaction)
     chapters_data = ai_data.get('chapters', [])
-    
-    for i, chap_data in enumerate(chapters_data):
-        chapter = Chapter.objects.create(
-            course=course,
-            title=chap_data.get('title', f"Chapter {i+1}"),
-            order=i+1
-        )
-        
-        for j, concept_data in enumerate(chap_data.get('concepts', [])):
-            # Skip inline Notes/Quiz generation for speed - generate on demand later
-            # notes = NotesGeneratorService.generate_notes(concept_data['title'], concept_data.get('description', ''))
-            
-            # Construct Search URL for video
-            # Prioritize real video URL from YouTube API
-            if 'video_url' in concept_data and concept_data['video_url']:
-                 video_url = concept_data['video_url']
-            else:
-                 # Fallback to search query
-                 query = concept_data.get('video_search_query', concept_data.get('title', ''))
-                 video_url = f"https://www.youtube.com/results?search_query={query.replace(' ', '+')}"
-            
-            concept = Concept.objects.create(
-                chapter=chapter,
-                title=concept_data['title'],
-                description=concept_data.get('description', ''),
-                video_url=video_url,
-                duration=concept_data.get('duration_minutes', 15),
-                notes=f"# {concept_data['title']}\n\n{concept_data.get('description', '')}\n\n*Notes will be generated when you start this lesson.*",
-                content_type='video',
-                order=j+1
-            )
-            
-            # Skip Quiz generation for speed - can be generated on-demand
-            # if j == 0:
-            #     quiz_data = QuizGeneratorService.generate_quiz(concept_data['title'], notes)
-            #     if quiz_data:
-            #         Assessment.objects.create(
-            #             concept=concept,
-            #             questions=quiz_data,
-            #             time_limit=10
-            #         )
+    course = course_import.import_course(
+        {'chapters': [_ai_chapter(chap_data, i + 1) for i, chap_data in enumerate(chapters_data)]},
+        canonical_key=course_catalog.canonical_key(topic, skill_level),
+        **_course_fields(course_data, topic, skill_level)
+    )
 
     # 4. Enroll User
-    roadmap = Roadmap.objects.create(
-        user=request.user,
-        course=course,
-        current_chapter=0,
-        current_concept=0
-    )
+    roadmap, _ = course_catalog.enroll(request.user, course)
     
     serializer = RoadmapSerializer(roadmap)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class _StreamedCourse:
+    """
+    Sync half of generate_roadmap_stream: saves the course as it arrives and
+    renders the SSE frames. Every method touches the DB, so the async view
+    calls them through sync_to_async.
+    """
+
+    def __init__(self, user, topic, skill_level):
+        self.user = user
+        self.topic = topic
+        self.skill_level = skill_level
+        self.course_data = {}
+        self.course = self.roadmap = None
+        self.order = 0
+
+    def reuse_canonical(self):
+        """The `done` frame for an existing canonical course, or None."""
+        course = course_catalog.find_canonical(self.topic, self.skill_level)
+        if not course:
+            return None
+        roadmap, _ = course_catalog.enroll(self.user, course)
+        return sse_event('done', RoadmapSerializer(roadmap).data)
+
+    def add(self, kind, obj):
+        """Save one streamed ('course' | 'chapter', dict) and return its frames."""
+        if kind == 'course':
+            self.course_data = obj
+            if self.course:
+                Course.objects.filter(id=self.course.id).update(**{
+                    k: v for k, v in _course_fields(obj, self.topic, self.skill_level).items() if k != 'thumbnail'
+                })
+            return [sse_event('course', _course_fields(obj, self.topic, self.skill_level))]
+
+        frames = []
+        if self.course is None:
+            # Persist on the first chapter so a stream that fails early leaves nothing behind
+            self.course = Course.objects.create(**_course_fields(
+                {**self.course_data, 'thumbnail': obj.get('thumbnail') or ''}, self.topic, self.skill_level
+            ))
+            self.roadmap, _ = course_catalog.enroll(self.user, self.course)
+            frames.append(sse_event('roadmap', {'id': self.roadmap.id, 'course_id': self.course.id}))
+        self.order += 1
+        [chapter] = course_import.add_chapters(self.course, [_ai_chapter(obj, self.order)], start_order=self.order)
+        chapter = Chapter.objects.prefetch_related('concepts').get(id=chapter.id)
+        frames.append(sse_event('chapter', ChapterSerializer(
+            chapter, context={'completed_concept_ids': set()}
+        ).data))
+        return frames
+
+    def finish(self):
+        """Publish the finished course. Returns (frame, succeeded)."""
+        if self.course is None:
+            return sse_event('error', {'error': 'AI returned invalid format. Try again.'}), False
+        # Only a fully generated course becomes the canonical one for this topic
+        Course.objects.filter(id=self.course.id).update(
+            canonical_key=course_catalog.canonical_key(self.topic, self.skill_level)
+        )
+        roadmap = Roadmap.objects.select_related('course').prefetch_related(
+            'course__chapters__concepts'
+        ).get(id=self.roadmap.id)
+        return sse_event('done', RoadmapSerializer(roadmap, context={'completed_concept_ids': set()}).data), True
+
+    def discard(self):
+        """Remove a half-built course, its roadmap and the enrollment's leaderboard points."""
+        if self.course is None:
+            return
+        course_id = self.course.id
+        self.course.delete()  # cascades to chapters, concepts and the roadmap
+        events.record(self.user, 'roadmap_removed', course_id)
+        self.course = self.roadmap = None
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def generate_roadmap_stream(request):
+    """
+    Streaming variant of generate_roadmap_ai (Server-Sent Events).
+    Events: `course` (course metadata), `roadmap` (the enrollment, sent once
+    the first chapter is saved), `chapter` (each chapter as soon as it is
+    generated and saved), then `done` with the full roadmap, or `error`.
+    A reused canonical course is sent as a single `done` event. If the
+    stream fails or the client goes away, the partial course is deleted.
+
+    The body is an async generator so ASGI (daphne) sends each frame as it
+    is produced; Gemini, YouTube and the DB run in sync_to_async.
+    """
+    topic = request.data.get('topic')
+    skill_level = request.data.get('skillLevel', 'beginner')
+    force = _force_regenerate(request)
+
+    if not topic:
+        return Response({'error': 'Topic is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    streamed = _StreamedCourse(request.user, topic, skill_level)
+
+    async def sse_events():
+        if not force:
+            frame = await sync_to_async(streamed.reuse_canonical)()
+            if frame:
+                yield frame
+                return
+
+        chunks = None
+        succeeded = False
+        try:
+            chunks = ContentDiscoveryService.stream_course(topic, skill_level, fresh=force)
+            # Each pull waits on Gemini and enriches the chapter with YouTube videos
+            while (item := await sync_to_async(next)(chunks, None)) is not None:
+                for frame in await sync_to_async(streamed.add)(*item):
+                    yield frame
+            frame, succeeded = await sync_to_async(streamed.finish)()
+            yield frame
+        except Exception as e:
+            logging.error(f"Streaming roadmap generation failed for '{topic}': {e}")
+            yield sse_event('error', {'error': f"AI Generation Failed: {e}"})
+        finally:
+            if chunks is not None:
+                await sync_to_async(chunks.close)()
+            if not succeeded:
+                await sync_to_async(streamed.discard)()
+
+    response = StreamingHttpResponse(sse_events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+
 class ActivityLogView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
@@ -726,21 +779,11 @@ class ActivityLogView(generics.ListAPIView):
         today = timezone.now().date()
         start_date = today - timezone.timedelta(days=365)
         
-        # intricate query to group by date
-        # For SQLite/Django simplicity, we can just fetch all completed items in range and process in python
-        # OR use values('completed_at__date').annotate(count=Count('id'))
-        
-        activity = ConceptProgress.objects.filter(
-            user=request.user,
-            completed=True,
-            completed_at__date__gte=start_date
-        ).values('completed_at__date').annotate(count=Count('id')).order_by('completed_at__date')
-        
-        # Convert to dictionary for easy lookup
+        # Single indexed range scan over the DailyActivity rollup
         activity_dict = {
-            item['completed_at__date'].isoformat(): item['count'] 
-            for item in activity 
-            if item['completed_at__date']
+            day.isoformat(): row.concepts_completed
+            for day, row in activity.get_range(request.user, start_date, today).items()
+            if row.concepts_completed
         }
         
         return Response(activity_dict)
@@ -820,35 +863,29 @@ def generate_certificate(request, roadmap_id):
     safe_title = roadmap.course.title.replace(' ', '_')[:30]
     response['Content-Disposition'] = f'attachment; filename="SkillMeter_Certificate_{safe_title}.pdf"'
     
-    # --- Notification Trigger: Email with Certificate ---
+    # --- Notification Trigger: Email with Certificate (queued for the notification worker) ---
     try:
-        send_email_notification(
+        notification_outbox.queue_email(
             user=request.user,
             subject=f"Your Certificate for {roadmap.course.title}",
             message="Please find attached your official certificate of completion.",
             attachment=(f'SkillMeter_Certificate_{safe_title}.pdf', pdf_content, 'application/pdf')
         )
         # WhatsApp notification for certificate
-        send_whatsapp_notification(
+        notification_outbox.queue_whatsapp(
             user=request.user,
             message_body=f"🎓 Your certificate for '{roadmap.course.title}' is ready! Check your email for the PDF. Congrats!"
         )
     except Exception as e:
-        print(f"Failed to send certificate notifications: {e}")
+        print(f"Failed to queue certificate notifications: {e}")
 
-    # --- Algorand: Mint Certificate NFT ---
+    # --- Algorand: Mint Certificate NFT (queued, minted by the blockchain worker) ---
     try:
         wallet = _get_algo_wallet(request.user)
-        if _algo_service and wallet and not roadmap.nft_asset_id:
-            nft = _algo_service.issue_certificate_nft(
-                wallet, roadmap.course.title, roadmap.progress, cert_id
-            )
-            if nft and nft.get('asset_id'):
-                roadmap.nft_asset_id = nft['asset_id']
-                roadmap.save()
-                print(f"Certificate NFT minted: ASA {nft['asset_id']}")
+        if wallet and algorand_configured() and not roadmap.nft_asset_id:
+            blockchain_jobs.enqueue_certificate(request.user, wallet, roadmap)
     except Exception as e:
-        print(f"Algorand certificate NFT failed (non-blocking): {e}")
+        print(f"Algorand certificate NFT enqueue failed (non-blocking): {e}")
 
     return response
 
@@ -875,11 +912,12 @@ def mint_certificate_nft(request, roadmap_id):
     if not wallet:
         return Response({'error': 'No Algorand wallet set in your profile. Add one first.'}, status=400)
 
-    if not _algo_service:
+    algo_service = get_algorand_service()
+    if not algo_service:
         return Response({'error': 'Algorand service is not available'}, status=503)
 
     try:
-        nft = _algo_service.issue_certificate_nft(
+        nft = algo_service.issue_certificate_nft(
             wallet, roadmap.course.title, roadmap.progress, roadmap.certificate_id
         )
         if nft and nft.get('asset_id'):
@@ -1045,6 +1083,21 @@ def get_trending_topics(request):
         return Response({'error': str(e)}, status=500)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def runtime_stats(request):
+    """
+    Staff only: the in-process counters of the web worker that served the
+    request (each process keeps its own, so `pid` says which one).
+    """
+    return Response({
+        'pid': os.getpid(),
+        'single_flight': single_flight.stats(),
+        'llm_cache': llm_cache.stats(),
+        'gemini_limiter': gemini_limiter.stats(),
+    })
+
+
 # ===== Mentor Connect API =====
 
 from .models import MentorProfile, MentorSlot, Booking
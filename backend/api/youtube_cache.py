@@ -0,0 +1,125 @@
+"""
+YouTube search result cache.
+
+Roadmaps for popular topics search for the same videos again and again
+("React hooks tutorial", "tutorial react hooks", ...). Queries are
+normalized (lowercased, punctuation stripped, words sorted) and the result
+is stored in YouTubeSearchCache, so repeated searches cost no API quota.
+
+- Results are fresh for YOUTUBE_CACHE_TTL_DAYS. Queries with no results
+  are cached too (negative entries) for YOUTUBE_NEGATIVE_TTL_HOURS.
+- An expired result is not deleted: if the API call to refresh it fails
+  (quota exhausted, timeout) the stale video is served instead of the
+  search-URL fallback. Only the least recently used entries beyond
+  YOUTUBE_CACHE_MAX_ENTRIES, and expired negative entries, are evicted.
+"""
+import re
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import YouTubeSearchCache
+
+TTL = timedelta(days=getattr(settings, 'YOUTUBE_CACHE_TTL_DAYS', 30))
+NEGATIVE_TTL = timedelta(hours=getattr(settings, 'YOUTUBE_NEGATIVE_TTL_HOURS', 24))
+MAX_ENTRIES = getattr(settings, 'YOUTUBE_CACHE_MAX_ENTRIES', 20_000)
+
+_WORD_RE = re.compile(r'\w+')
+
+_lock = threading.Lock()
+_counters = {'hits': 0, 'negative_hits': 0, 'stale': 0, 'misses': 0}
+
+
+def normalize(query):
+    words = sorted(set(_WORD_RE.findall(query.lower())))
+    return ' '.join(words)[:255]
+
+
+def _count(**deltas):
+    with _lock:
+        for name, delta in deltas.items():
+            _counters[name] += delta
+
+
+def lookup(queries):
+    """
+    Cached results for `queries`, in one query.
+    Returns (fresh, stale): fresh maps query -> result dict, or None for a
+    cached "no results"; stale maps query -> an expired result that may
+    be served if the API cannot be reached.
+    """
+    keys = {query: normalize(query) for query in queries}
+    rows = {row.query: row for row in YouTubeSearchCache.objects.filter(query__in=set(keys.values()))}
+    now = timezone.now()
+
+    fresh, stale = {}, {}
+    for query, key in keys.items():
+        row = rows.get(key)
+        if row is None:
+            continue
+        result = {'video_url': row.video_url, 'thumbnail': row.thumbnail} if row.video_url else None
+        ttl = TTL if result else NEGATIVE_TTL
+        if now - row.fetched_at < ttl:
+            fresh[query] = result
+        elif result:
+            stale[query] = result
+
+    negative = sum(1 for result in fresh.values() if result is None)
+    _count(hits=len(fresh) - negative, negative_hits=negative, misses=len(keys) - len(fresh))
+    used = {keys[query] for query in fresh}
+    if used:
+        YouTubeSearchCache.objects.filter(query__in=used).update(last_used_at=now, hits=F('hits') + 1)
+    return fresh, stale
+
+
+def record_stale_served(count):
+    _count(stale=count)
+
+
+def store(results):
+    """Save API results: {query: result dict, or None for no results}."""
+    now = timezone.now()
+    for query, result in results.items():
+        values = {
+            'video_url': result['video_url'] if result else '',
+            'thumbnail': result['thumbnail'] if result else '',
+            'fetched_at': now,
+            'last_used_at': now,
+        }
+        key = normalize(query)
+        try:
+            with transaction.atomic():
+                YouTubeSearchCache.objects.update_or_create(query=key, defaults=values)
+        except IntegrityError:
+            # A concurrent roadmap cached the same query first
+            YouTubeSearchCache.objects.filter(query=key).update(**values)
+    if results:
+        evict()
+
+
+def evict(max_entries=None):
+    """Drop expired negative entries and the LRU tail beyond `max_entries`. Returns the count."""
+    max_entries = MAX_ENTRIES if max_entries is None else max_entries
+    deleted, _ = YouTubeSearchCache.objects.filter(
+        video_url='', fetched_at__lt=timezone.now() - NEGATIVE_TTL
+    ).delete()
+    overflow = YouTubeSearchCache.objects.count() - max_entries
+    if overflow > 0:
+        oldest = YouTubeSearchCache.objects.order_by('last_used_at').values_list('id', flat=True)[:overflow]
+        deleted += YouTubeSearchCache.objects.filter(id__in=list(oldest)).delete()[0]
+    return deleted
+
+
+def stats():
+    """Hit/miss counters for this process plus the size of the cache table."""
+    with _lock:
+        counters = dict(_counters)
+    lookups = counters['hits'] + counters['negative_hits'] + counters['misses']
+    counters['hit_rate'] = round((counters['hits'] + counters['negative_hits']) / lookups, 3) if lookups else 0.0
+    counters['entries'] = YouTubeSearchCache.objects.count()
+    counters['negative_entries'] = YouTubeSearchCache.objects.filter(video_url='').count()
+    return counters
@@ -7,7 +7,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
 from api.models import Course, Chapter, Concept, Assessment
+from api.course_import import import_course
+from django.db import transaction
 
+@transaction.atomic
 def seed_data():
     print("🌱 Seeding database...")
 
@@ -18,88 +21,81 @@ def seed_data():
     Course.objects.all().delete()
 
     # --- Course 1: React ---
-    react_course = Course.objects.create(
-        title='Master React Development',
-        description='Learn React from the ground up. Build modern web applications with hooks, state management, and best practices.',
-        thumbnail='https://images.unsplash.com/photo-1633356122544-f134324a6cee?w=400&h=250&fit=crop',
-        difficulty='intermediate',
-        estimated_hours=24,
-        tags=['React', 'JavaScript', 'Frontend', 'Web Development']
-    )
-    print(f"Created Course: {react_course.title}")
-
-    # Chapter 1
-    ch1 = Chapter.objects.create(
-        course=react_course,
-        title='Getting Started with React',
-        description='Introduction to React and setting up your development environment',
-        order=1
-    )
-    
-    c1 = Concept.objects.create(
-        chapter=ch1,
-        title='What is React?',
-        description='Understanding React and its core philosophy',
-        duration=15,
-        video_url='https://www.youtube.com/embed/SqcY0GlETPk',
-        notes='# What is React?\n\nReact is a JavaScript library for building user interfaces...',
-        content_type='video',
-        order=1
-    )
-    
-    # Assessment for Concept 1
-    Assessment.objects.create(
-        concept=c1,
-        time_limit=10,
-        questions=[
+    react_course = import_course({
+        'course': {
+            'title': 'Master React Development',
+            'description': 'Learn React from the ground up. Build modern web applications with hooks, state management, and best practices.',
+            'thumbnail': 'https://images.unsplash.com/photo-1633356122544-f134324a6cee?w=400&h=250&fit=crop',
+            'difficulty': 'intermediate',
+            'estimated_hours': 24,
+            'tags': ['React', 'JavaScript', 'Frontend', 'Web Development'],
+        },
+        'chapters': [
             {
-                "id": "q-1",
-                "type": "mcq",
-                "question": "What is React primarily used for?",
-                "options": ["Backend", "Building UI", "Database", "Server"],
-                "correctAnswer": "Building UI"
-            }
-        ]
-    )
-
-    c2 = Concept.objects.create(
-        chapter=ch1,
-        title='JSX Fundamentals',
-        description='Learn the syntax that powers React components',
-        duration=25,
-        video_url='https://www.youtube.com/embed/7fPXI_MnBOY',
-        content_type='video',
-        order=2
-    )
+                'title': 'Getting Started with React',
+                'description': 'Introduction to React and setting up your development environment',
+                'concepts': [
+                    {
+                        'title': 'What is React?',
+                        'description': 'Understanding React and its core philosophy',
+                        'duration': 15,
+                        'video_url': 'https://www.youtube.com/embed/SqcY0GlETPk',
+                        'notes': '# What is React?\n\nReact is a JavaScript library for building user interfaces...',
+                        'content_type': 'video',
+                        'assessments': [{
+                            'time_limit': 10,
+                            'questions': [
+                                {
+                                    "id": "q-1",
+                                    "type": "mcq",
+                                    "question": "What is React primarily used for?",
+                                    "options": ["Backend", "Building UI", "Database", "Server"],
+                                    "correctAnswer": "Building UI"
+                                }
+                            ],
+                        }],
+                    },
+                    {
+                        'title': 'JSX Fundamentals',
+                        'description': 'Learn the syntax that powers React components',
+                        'duration': 25,
+                        'video_url': 'https://www.youtube.com/embed/7fPXI_MnBOY',
+                        'content_type': 'video',
+                    },
+                ],
+            },
+        ],
+    })
+    print(f"Created Course: {react_course.title}")
 
     # --- Course 2: Python DSA ---
-    python_course = Course.objects.create(
-        title='Python Data Structures & Algorithms',
-        description='Master DSA concepts with Python. Prepare for coding interviews.',
-        thumbnail='https://images.unsplash.com/photo-1526374965328-7f61d4dc18c5?w=400&h=250&fit=crop',
-        difficulty='intermediate',
-        estimated_hours=32,
-        tags=['Python', 'DSA', 'Algorithms']
-    )
+    python_course = import_course({
+        'course': {
+            'title': 'Python Data Structures & Algorithms',
+            'description': 'Master DSA concepts with Python. Prepare for coding interviews.',
+            'thumbnail': 'https://images.unsplash.com/photo-1526374965328-7f61d4dc18c5?w=400&h=250&fit=crop',
+            'difficulty': 'intermediate',
+            'estimated_hours': 32,
+            'tags': ['Python', 'DSA', 'Algorithms'],
+        },
+        'chapters': [
+            {
+                'title': 'Arrays & Strings',
+                'description': 'Fundamental operations on arrays',
+                'concepts': [
+                    {
+                        'title': 'Array Operations',
+                        'description': 'Understanding arrays and common operations',
+                        'duration': 25,
+                        'video_url': 'https://www.youtube.com/embed/D6xkbGLQesk',
+                        'content_type': 'video',
+                    },
+                ],
+            },
+        ],
+    })
     print(f"Created Course: {python_course.title}")
 
-    ch2 = Chapter.objects.create(
-        course=python_course,
-        title='Arrays & Strings',
-        description='Fundamental operations on arrays',
-        order=1
-    )
-    
-    Concept.objects.create(
-        chapter=ch2,
-        title='Array Operations',
-        description='Understanding arrays and common operations',
-        duration=25,
-        video_url='https://www.youtube.com/embed/D6xkbGLQesk',
-        content_type='video',
-        order=1
-    )
-
     print("✅ Database seeded successfully!")
 
 if __name__ == '__main__':
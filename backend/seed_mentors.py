@@ -7,7 +7,9 @@ django.setup()
 import random
 from django.contrib.auth.models import User
 from api.models import MentorProfile
+from django.db import transaction
 
+@transaction.atomic
 def create_mentors():
     mentors_data = [
         {
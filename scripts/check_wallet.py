@@ -1,10 +1,11 @@
 """Check admin wallet ALGO balance on TestNet."""
 import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'backend', '.env'))
-from algosdk.v2client import algod
+from api.algorand_client import get_algod_client
 
-client = algod.AlgodClient('', 'https://testnet-api.algonode.cloud')
+client = get_algod_client()
 addr = 'IGKF6PEEDZXTHPT35WBBXVCWBESHGJOHYJVONSUYO4NRSSPKPENRAO6NWU'
 
 info = client.account_info(addr)
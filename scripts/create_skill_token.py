@@ -4,17 +4,17 @@ Run: python scripts/create_skill_token.py
 Save the output ASA ID to .env as ALGORAND_SKILL_TOKEN_ID
 """
 
-from algosdk.v2client import algod
 from algosdk import transaction, mnemonic, account
-import os
+import sys, os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+from api.algorand_client import get_algod_client, get_params_cache
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'backend', '.env'))
 
-algod_client = algod.AlgodClient(
-    '', 'https://testnet-api.algonode.cloud'
-)
+algod_client = get_algod_client()
 
 algo_mnemonic = os.environ.get('ALGORAND_MNEMONIC', '')
 if not algo_mnemonic or algo_mnemonic.startswith('word1'):
@@ -29,7 +29,7 @@ sender = account.address_from_private_key(private_key)
 print(f'Admin wallet: {sender}')
 print('Creating $SKILL token on TestNet...')
 
-params = algod_client.suggested_params()
+params = get_params_cache(algod_client).get()
 
 txn = transaction.AssetCreateTxn(
     sender=sender,
@@ -4,9 +4,11 @@ Run: python scripts/deploy_cert_contract.py
 Save the output App ID to .env as ALGORAND_CERT_APP_ID
 """
 
-from algosdk.v2client import algod
 from algosdk import transaction, mnemonic, account
-import os, base64
+import sys, os, base64
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+from api.algorand_client import get_algod_client, get_params_cache
 from dotenv import load_dotenv
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'backend', '.env'))
@@ -108,7 +110,7 @@ CLEAR_TEAL = """
 int 1
 """
 
-algod_client = algod.AlgodClient('', 'https://testnet-api.algonode.cloud')
+algod_client = get_algod_client()
 
 algo_mnemonic = os.environ.get('ALGORAND_MNEMONIC', '')
 if not algo_mnemonic or algo_mnemonic.startswith('word1'):
@@ -128,7 +130,7 @@ clear_result = algod_client.compile(CLEAR_TEAL.strip())
 approval_program = base64.b64decode(approval_result['result'])
 clear_program = base64.b64decode(clear_result['result'])
 
-params = algod_client.suggested_params()
+params = get_params_cache(algod_client).get()
 
 # Global schema: 1 bytes (admin address)
 # Local schema: none
@@ -9,9 +9,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'backend', '.env'))
 
-from algosdk.v2client import algod
+from api.algorand_client import get_algod_client
 
-client = algod.AlgodClient('', 'https://testnet-api.algonode.cloud')
+client = get_algod_client()
 
 cert_app_id   = int(os.environ.get('ALGORAND_CERT_APP_ID', 0))
 badge_app_id  = int(os.environ.get('ALGORAND_BADGE_APP_ID', 0))
@@ -62,13 +62,14 @@ export function LearningProvider({ children }) {
         }
     };
 
-    const generateRoadmap = async (topic, skillLevel = 'beginner') => {
+    const generateRoadmap = async (topic, skillLevel = 'beginner', forceRegenerate = false) => {
         try {
             const response = await authFetch(`${API_URL}/roadmaps/generate/`, {
                 method: 'POST',
                 body: JSON.stringify({
                     topic,
-                    skillLevel
+                    skillLevel,
+                    forceRegenerate
                 }),
             });
 
@@ -78,7 +79,8 @@ export function LearningProvider({ children }) {
             }
 
             const newRoadmap = await response.json();
-            setRoadmaps(prev => [newRoadmap, ...prev]);
+            // An existing course may be reused, so the learner can already be enrolled
+            setRoadmaps(prev => [newRoadmap, ...prev.filter(r => r.id !== newRoadmap.id)]);
             setCurrentRoadmap(newRoadmap);
             return newRoadmap;
         } catch (error) {
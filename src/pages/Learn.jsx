@@ -53,18 +53,21 @@ export default function Learn() {
 
   const API_URL = (import.meta.env.VITE_API_URL || 'http://localhost:8001/api');
 
-  // Generate notes on-demand when Notes tab is clicked
-  const handleGenerateNotes = async (conceptId) => {
+  // Load notes when Notes tab is clicked: stored notes come from the
+  // (ETag-cached) notes endpoint, otherwise they are generated on-demand
+  const handleGenerateNotes = async (conceptId, hasNotes = false) => {
     if (notes || notesLoading) return; // Already loaded or loading
     setNotesLoading(true);
     try {
-      const response = await authFetch(`${API_URL}/concepts/${conceptId}/generate-notes/`, {
-        method: 'POST',
-      });
+      const response = hasNotes
+        ? await authFetch(`${API_URL}/concepts/${conceptId}/notes/`)
+        : await authFetch(`${API_URL}/concepts/${conceptId}/generate-notes/`, {
+          method: 'POST',
+        });
       if (response.ok) {
         const data = await response.json();
         setNotes(data.notes);
-        if (!data.cached) {
+        if (!hasNotes && !data.cached) {
           toast({ title: 'Notes Generated! 📝', description: 'AI-powered notes are ready.' });
         }
       } else {
@@ -108,7 +111,7 @@ export default function Learn() {
   const handleTabChange = (tab) => {
     setCurrentTab(tab);
     if (tab === 'notes' && currentConcept) {
-      handleGenerateNotes(currentConcept.id);
+      handleGenerateNotes(currentConcept.id, currentConcept.hasNotes);
     } else if (tab === 'assessment' && currentConcept) {
       handleGenerateQuiz(currentConcept.id);
     }
@@ -297,10 +300,6 @@ export default function Learn() {
                 <div className="prose prose-sm max-w-none dark:prose-invert">
                   <ReactMarkdown>{notes}</ReactMarkdown>
                 </div>
-              ) : currentConcept.notes && !currentConcept.notes.includes('*Notes will be generated') ? (
-                <div className="prose prose-sm max-w-none dark:prose-invert">
-                  <ReactMarkdown>{currentConcept.notes}</ReactMarkdown>
-                </div>
               ) : (
                 <div className="text-center py-8">
                   <p className="text-muted-foreground mb-4">Notes not generated yet</p>